@@ -1,6 +1,7 @@
 import streamlit as st
 from auth import is_authenticated, check_session_cookie, get_cookie_manager, logout
-from db_manager import init_db
+from db_manager import bootstrap_db
+import query_stats
 import time
 
 # --- Global Config ---
@@ -11,7 +12,8 @@ st.set_page_config(
 )
 
 # --- Init DB ---
-init_db()
+# Creates/upgrades the schema once per process; later reruns skip it
+bootstrap_db()
 
 import pandas as pd
 from db_manager import get_connection
@@ -109,8 +111,17 @@ def main():
         
         pg = st.navigation([pg_login, pg_signup, pg_manual, pg_about])
 
-    # Run the selected page
+    # Run the selected page (its queries are attributed to it when QUERY_STATS is on)
+    query_stats.start_rerun(pg.title)
     pg.run()
 
+    # Totals of this rerun for admins (pages that call st.rerun/st.stop end before this)
+    rerun = query_stats.current_rerun()
+    if query_stats.is_enabled() and rerun and (st.session_state.get('user') or {}).get('IS_ADMIN') == 'S':
+        st.sidebar.caption(
+            f"🐢 Este rerun: {rerun['queries']} consulta(s), "
+            f"{rerun['seconds'] * 1000:.1f} ms, {rerun['rows']} linha(s)"
+        )
+
 if __name__ == "__main__":
     main()
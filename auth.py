@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 import uuid
 import extra_streamlit_components as stx
 from db_manager import get_connection
+from dashboard_service import bump_data_version
 
 
 def hash_password(password: str) -> str:
@@ -284,7 +285,7 @@ def get_all_users() -> list:
         # Convert to dict list
         columns = [col[0] for col in cursor.description]
         results = []
-        for row in cursor.fetchall():
+        for row in cursor: # Streamed, no intermediate list
             results.append(dict(zip(columns, row)))
         return results
     except Exception:
@@ -702,9 +703,9 @@ def delete_user(user_id: int) -> dict:
         # but if we are careful, we delete children via their parents logic or assume
         # the migration added COD_USUARIO to everything.
         # Let's verify DB Schema in db_manager?
-        # The migration logic in db_manager.py tried to add COD_USUARIO to:
+        # The migrations in db_manager.py (step 2) add COD_USUARIO to:
         # ['EST_AREA', 'EST_MATERIA', 'EST_PROJETO', 'EST_CICLO', 'EST_GRADE_SEMANAL', 'EST_ESTUDOS', 'EST_PROGRAMACAO']
-        # It did NOT add to EST_CICLO_ITEM, EST_GRADE_ITEM, EST_CONTEUDO_CICLO explicitly in the list 'tables_to_migrate'.
+        # It did NOT add to EST_CICLO_ITEM, EST_GRADE_ITEM, EST_CONTEUDO_CICLO explicitly in the list 'USER_OWNED_TABLES'.
         # However, deleting the PARENT (Estudos, Projetos, Ciclos) technically orphans them if no cascade.
         # Ideally we should delete them.
         
@@ -731,8 +732,8 @@ def delete_user(user_id: int) -> dict:
         
         # Now delete main tables
         main_tables = [
-            'EST_SESSAO', 'EST_CONFIGURACAO', 'EST_ESTUDOS', 'EST_PROGRAMACAO', 
-            'EST_PROJETO', 'EST_GRADE_SEMANAL', 'EST_CICLO', 
+            'EST_SESSAO', 'EST_CONFIGURACAO', 'EST_RESUMO_DIARIO', 'EST_ESTUDOS', 'EST_PROGRAMACAO', 
+            'EST_CURSOR_CICLO', 'EST_PROJETO', 'EST_GRADE_SEMANAL', 'EST_CICLO', 
             'EST_MATERIA', 'EST_AREA'
         ]
         
@@ -746,6 +747,7 @@ def delete_user(user_id: int) -> dict:
             return {'success': False, 'message': 'Usuário não encontrado.'}
             
         conn.commit()
+        bump_data_version()
         return {'success': True, 'message': f'Usuário e dados vinculados removidos com sucesso!'}
         
     except Exception as e:
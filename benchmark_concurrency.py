@@ -0,0 +1,186 @@
+"""
+Benchmark of concurrent reads and writes on the local SQLite database, with and
+without the pragma profile of db_manager (SQLITE_PRAGMAS).
+
+Builds a throw-away database with benchmark_schedule.build_dataset, then for each
+profile runs reader threads (the Home dashboard queries) next to writer threads (the
+finish step of the study timer: insert into EST_ESTUDOS, mark the task done and
+refresh the day in EST_RESUMO_DIARIO) for a fixed time. Never touches estudos.db or Turso.
+
+Usage:
+    python -m benchmark_concurrency
+    python -m benchmark_concurrency --readers 8 --writers 2 --seconds 10
+
+For every profile it reports reads/sec, writes/sec, read latency (median and p95) and
+"database is locked" errors. Results are saved as JSON in bench_results/.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import db_manager
+from benchmark_schedule import RESULTS_DIR, _git_commit, build_dataset
+from daily_rollup import refresh_daily_rollup
+
+# Profiles compared: sqlite3 defaults (rollback journal) vs the db_manager profile
+PROFILES = {
+    'padrão': {},
+    'perfil': db_manager.SQLITE_PRAGMAS,
+}
+
+READ_QUERIES = [
+    "SELECT SUM(CASE WHEN DATA = ? THEN HL_REALIZADA END), SUM(HL_REALIZADA), SUM(HL_PREVISTA) "
+    "FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ?",
+    "SELECT DATA, SUM(HL_PREVISTA), SUM(HL_REALIZADA) FROM EST_RESUMO_DIARIO "
+    "WHERE COD_PROJETO = ? AND DATA BETWEEN ? AND ? GROUP BY DATA",
+    "SELECT DISTINCT DATA FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ? AND QTDE_ESTUDOS > 0",
+    "SELECT * FROM EST_PROGRAMACAO WHERE DATA = ? AND COD_PROJETO = ? ORDER BY HR_INICIAL_PREVISTA",
+]
+
+
+def _reader(path, pragmas, project_id, today, stop, stats):
+    conn = db_manager._connect_sqlite(path, pragmas)
+    week_start = (today - timedelta(days=6)).isoformat()
+    params = [
+        (today.isoformat(), project_id),
+        (project_id, week_start, today.isoformat()),
+        (project_id,),
+        (today.isoformat(), project_id),
+    ]
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                for sql, args in zip(READ_QUERIES, params):
+                    conn.execute(sql, args).fetchall()
+            except sqlite3.OperationalError:
+                stats['locked'] += 1
+                continue
+            stats['latencies'].append(time.perf_counter() - started)
+            stats['reads'] += 1
+    finally:
+        conn.close()
+
+
+def _writer(path, pragmas, project_id, today, stop, stats):
+    conn = db_manager._connect_sqlite(path, pragmas)
+    try:
+        while not stop.is_set():
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO EST_ESTUDOS (COD_PROJETO, DATA, HL_REALIZADA, DESC_AULA, TIPO)
+                    VALUES (?, ?, 0.5, 'Benchmark', 4)
+                """, (project_id, today.isoformat()))
+                cursor.execute("""
+                    UPDATE EST_PROGRAMACAO SET STATUS = 'CONCLUIDO'
+                    WHERE CODIGO = (SELECT MAX(CODIGO) FROM EST_PROGRAMACAO WHERE COD_PROJETO = ?)
+                """, (project_id,))
+                refresh_daily_rollup(cursor, project_id, [today])
+                conn.commit()
+                stats['writes'] += 1
+            except sqlite3.OperationalError:
+                conn.rollback()
+                stats['locked'] += 1
+    finally:
+        conn.close()
+
+
+def _run_profile(seed_path, work_dir, name, pragmas, project_id, today, readers, writers, seconds):
+    path = os.path.join(work_dir, f"run_{len(os.listdir(work_dir))}.db")
+    shutil.copyfile(seed_path, path)
+
+    stop = threading.Event()
+    reader_stats = [{'reads': 0, 'locked': 0, 'latencies': []} for _ in range(readers)]
+    writer_stats = [{'writes': 0, 'locked': 0} for _ in range(writers)]
+    threads = [
+        threading.Thread(target=_reader, args=(path, pragmas, project_id, today, stop, s)) for s in reader_stats
+    ] + [
+        threading.Thread(target=_writer, args=(path, pragmas, project_id, today, stop, s)) for s in writer_stats
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies = sorted(l for s in reader_stats for l in s['latencies'])
+    reads = sum(s['reads'] for s in reader_stats)
+    writes = sum(s['writes'] for s in writer_stats)
+    return {
+        'profile': name,
+        'pragmas': dict(pragmas),
+        'reads_per_sec': round(reads / seconds, 1),
+        'writes_per_sec': round(writes / seconds, 1),
+        'read_ms_median': round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        'read_ms_p95': round(latencies[int(len(latencies) * 0.95)] * 1000, 3) if latencies else None,
+        'locked_errors': sum(s['locked'] for s in reader_stats + writer_stats),
+    }
+
+
+def run_benchmark(readers=4, writers=1, seconds=5.0, history_days=365):
+    """
+    Builds the dataset once and runs the read/write mix on a fresh copy per profile.
+    Returns a dict ready to be saved as JSON.
+    """
+    work_dir = tempfile.mkdtemp(prefix="bench_concorrencia_")
+    try:
+        seed_path = os.path.join(work_dir, "seed.db")
+        project_id, today = build_dataset(seed_path, history_days=history_days, start_date=date.today())
+        results = [
+            _run_profile(seed_path, work_dir, name, pragmas, project_id, today, readers, writers, seconds)
+            for name, pragmas in PROFILES.items()
+        ]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'commit': _git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'readers': readers,
+        'writers': writers,
+        'seconds': seconds,
+        'history_days': history_days,
+        'results': results,
+    }
+
+
+def print_report(report):
+    print(f"commit {report['commit']} | {report['readers']} leitores, {report['writers']} escritores, "
+          f"{report['seconds']}s, {report['history_days']} dias de histórico")
+    print(f"{'perfil':>8} {'leituras/s':>11} {'escritas/s':>11} {'leit. ms':>9} {'p95 ms':>8} {'locked':>7}")
+    for r in report['results']:
+        print(f"{r['profile']:>8} {r['reads_per_sec']:>11.0f} {r['writes_per_sec']:>11.0f} "
+              f"{r['read_ms_median'] or 0:>9.3f} {r['read_ms_p95'] or 0:>8.3f} {r['locked_errors']:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de leituras/escritas concorrentes no SQLite local.")
+    parser.add_argument('--readers', type=int, default=4, help="Threads lendo (consultas da Home)")
+    parser.add_argument('--writers', type=int, default=1, help="Threads gravando (fim do cronômetro)")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Duração de cada perfil")
+    parser.add_argument('--history-days', type=int, default=365)
+    parser.add_argument('--output', help=f"Arquivo JSON (padrão: {RESULTS_DIR}/concurrency_<commit>.json)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.readers, args.writers, args.seconds, args.history_days)
+    print_report(report)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"concurrency_{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Benchmark of the schedule generator (study_engine.generate_schedule) on synthetic data.
+
+Builds a throw-away SQLite database with one synthetic user (subjects, cycle items,
+weekly slots and some days of study history), then times generation for several
+horizons on a fresh copy of it. Never touches estudos.db or Turso.
+
+Usage:
+    python -m benchmark_schedule
+    python -m benchmark_schedule --horizons 7 30 90 365 --subjects 12 --history-days 365
+    python -m benchmark_schedule --compare bench_results/schedule_<commit>.json
+
+For every horizon it reports rows written, rows/sec, database calls (execute/executemany
+round-trips, what costs latency on Turso), SQL statements run by SQLite and peak Python
+memory. Results are saved as JSON (named after the current git commit) so runs from
+different commits can be compared with --compare.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+
+import db_manager
+from daily_rollup import refresh_daily_rollup
+from study_engine import ScheduleStore, generate_schedule, rebuild_cycle_cursor
+
+DEFAULT_HORIZONS = (7, 30, 90, 365)
+RESULTS_DIR = 'bench_results'
+
+
+class CountingCursor:
+    """sqlite3 cursor proxy that counts execute/executemany calls."""
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, sql, params=()):
+        self._counter['calls'] += 1
+        self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, params):
+        self._counter['calls'] += 1
+        self._cursor.executemany(sql, params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    """sqlite3 connection proxy handing out CountingCursor objects."""
+    def __init__(self, conn):
+        self._conn = conn
+        self.counter = {'calls': 0, 'statements': 0}
+        conn.set_trace_callback(self._on_statement)
+
+    def _on_statement(self, _sql):
+        self.counter['statements'] += 1
+
+    def cursor(self):
+        return CountingCursor(self._conn.cursor(), self.counter)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def build_dataset(path, subjects=10, cycle_items=14, slots_per_day=2, study_weekdays=6,
+                  history_days=180, start_date=None):
+    """
+    Creates the schema and one synthetic user in the SQLite file at path.
+    Returns (project_id, start_date) for the benchmark runs.
+
+    subjects: number of EST_MATERIA rows (one of them flagged as Revision)
+    cycle_items: EST_CICLO_ITEM rows, rotating over the subjects
+    slots_per_day / study_weekdays: EST_GRADE_ITEM slots (Mon..Sat first, then Sun)
+    history_days: days of past plan + study history before start_date
+    """
+    start_date = start_date or date.today()
+    conn = _connect(path)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        db_manager.apply_migrations(conn=conn)  # quiet: it announces every step
+    cursor = conn.cursor()
+    now = datetime.now().isoformat()
+    cursor.execute("""
+        INSERT INTO EST_USUARIO (NOME, EMAIL, SENHA_HASH, ATIVO, IS_ADMIN, DATA_CRIACAO, ULTIMO_ACESSO)
+        VALUES ('Benchmark', 'bench@estudos.local', '-', 'S', 'N', ?, ?)
+    """, (now, now))
+    user_id = cursor.lastrowid
+
+    cursor.execute("INSERT INTO EST_AREA (NOME, COD_USUARIO) VALUES ('Geral', ?)", (user_id,))
+    area_id = cursor.lastrowid
+    materias = []
+    for i in range(subjects):
+        cursor.execute(
+            "INSERT INTO EST_MATERIA (NOME, COD_AREA, REVISAO, COD_USUARIO) VALUES (?, ?, ?, ?)",
+            ("REVISÃO" if i == 0 else f"MATÉRIA {i:02d}", area_id, 'S' if i == 0 else 'N', user_id)
+        )
+        materias.append(cursor.lastrowid)
+
+    cursor.execute("INSERT INTO EST_CICLO (NOME, PADRAO, COD_USUARIO) VALUES ('Ciclo Benchmark', 'S', ?)", (user_id,))
+    ciclo_id = cursor.lastrowid
+    cursor.executemany(
+        "INSERT INTO EST_CICLO_ITEM (COD_CICLO, INDICE, COD_MATERIA, QTDE_MINUTOS) VALUES (?, ?, ?, ?)",
+        [(ciclo_id, i + 1, materias[i % subjects], 30 + 30 * (i % 3)) for i in range(cycle_items)]
+    )
+
+    cursor.execute("INSERT INTO EST_GRADE_SEMANAL (NOME, PADRAO, COD_USUARIO) VALUES ('Grade Benchmark', 'S', ?)", (user_id,))
+    grade_id = cursor.lastrowid
+    weekdays = [2, 3, 4, 5, 6, 7, 1][:study_weekdays]  # Seg..Sáb, then Dom
+    slots = []
+    for dia in weekdays:
+        for s in range(slots_per_day):
+            hour = 8 + 5 * s
+            slots.append((grade_id, dia, f"{hour:02d}:00:00", f"{hour + 2:02d}:00:00"))
+    cursor.executemany(
+        "INSERT INTO EST_GRADE_ITEM (COD_GRADE, DIA_SEMANA, HORA_INICIAL, HORA_FINAL) VALUES (?, ?, ?, ?)", slots
+    )
+
+    history_start = start_date - timedelta(days=history_days)
+    cursor.execute(
+        "INSERT INTO EST_PROJETO (NOME, DATA_INICIAL, DATA_FINAL, PADRAO, COD_USUARIO) VALUES (?, ?, ?, 'S', ?)",
+        ('Projeto Benchmark', history_start.isoformat(), (start_date + timedelta(days=730)).isoformat(), user_id)
+    )
+    project_id = cursor.lastrowid
+    conn.commit()
+
+    if history_days:
+        # History = a generated plan that was studied: done in EST_PROGRAMACAO and copied to EST_ESTUDOS
+        msg = generate_schedule(project_id, history_start, history_days, store=ScheduleStore(conn))
+        if "Sucesso" not in msg:
+            raise RuntimeError(msg)
+        cursor.execute("UPDATE EST_PROGRAMACAO SET STATUS = 'CONCLUIDO' WHERE COD_PROJETO = ?", (project_id,))
+        cursor.execute("""
+            INSERT INTO EST_ESTUDOS (COD_USUARIO, COD_GRADE, COD_PROJETO, COD_CICLO, COD_CICLO_ITEM, COD_MATERIA,
+                                     DATA, DIA, HR_INICIAL_PREVISTA, HL_PREVISTA, HL_REALIZADA, DESC_AULA, TIPO)
+            SELECT COD_USUARIO, COD_GRADE, COD_PROJETO, COD_CICLO, COD_CICLO_ITEM, COD_MATERIA,
+                   DATA, DIA, HR_INICIAL_PREVISTA, HL_PREVISTA, HL_PREVISTA, DESC_AULA, TIPO
+            FROM EST_PROGRAMACAO WHERE COD_PROJETO = ?
+        """, (project_id,))
+        rebuild_cycle_cursor(cursor, project_id)
+        refresh_daily_rollup(cursor, project_id)
+        conn.commit()
+    conn.close()
+    return project_id, start_date
+
+
+def _run_once(seed_path, work_dir, project_id, start_date, days, trace_memory=False):
+    path = os.path.join(work_dir, f"run_{days}.db")
+    shutil.copyfile(seed_path, path)
+    conn = CountingConnection(_connect(path))
+    before = conn.execute("SELECT COUNT(*) FROM EST_PROGRAMACAO").fetchone()[0]
+    conn.counter.update(calls=0, statements=0)
+
+    # tracemalloc slows Python down, so memory is measured on a separate, untimed run
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    msg = generate_schedule(project_id, start_date, days, store=ScheduleStore(conn))
+    elapsed = time.perf_counter() - started
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    counts = dict(conn.counter)
+
+    if "Sucesso" not in msg:
+        raise RuntimeError(msg)
+    rows = conn.execute("SELECT COUNT(*) FROM EST_PROGRAMACAO").fetchone()[0] - before
+    conn.close()
+    os.remove(path)
+    return {'seconds': elapsed, 'rows': rows, 'peak_kb': peak / 1024, **counts}
+
+
+def run_benchmark(horizons=DEFAULT_HORIZONS, repeat=3, **dataset):
+    """
+    Builds the dataset once and times generate_schedule for each horizon.
+    Each repetition runs on a fresh copy; times are the median of the repetitions.
+    Returns a dict ready to be saved as JSON.
+    """
+    work_dir = tempfile.mkdtemp(prefix="bench_estudos_")
+    try:
+        seed_path = os.path.join(work_dir, "seed.db")
+        project_id, start_date = build_dataset(seed_path, **dataset)
+
+        results = []
+        for days in horizons:
+            runs = [_run_once(seed_path, work_dir, project_id, start_date, days) for _ in range(repeat)]
+            memory_run = _run_once(seed_path, work_dir, project_id, start_date, days, trace_memory=True)
+            seconds = statistics.median(r['seconds'] for r in runs)
+            rows = runs[0]['rows']
+            results.append({
+                'days': days,
+                'rows': rows,
+                'seconds': round(seconds, 6),
+                'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+                'db_calls': runs[0]['calls'],
+                'sql_statements': runs[0]['statements'],
+                'peak_kb': round(memory_run['peak_kb'], 1),
+            })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'commit': _git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'dataset': dataset,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_report(report, baseline=None):
+    base = {r['days']: r for r in baseline['results']} if baseline else {}
+    print(f"commit {report['commit']} | dataset {report['dataset']} | repeat {report['repeat']}")
+    header = f"{'dias':>5} {'linhas':>7} {'seg':>9} {'linhas/s':>10} {'chamadas':>9} {'stmts':>7} {'pico KB':>9}"
+    if base:
+        header += f" {'vs base':>8}"
+    print(header)
+    for r in report['results']:
+        line = (f"{r['days']:>5} {r['rows']:>7} {r['seconds']:>9.4f} {r['rows_per_sec'] or 0:>10.0f} "
+                f"{r['db_calls']:>9} {r['sql_statements']:>7} {r['peak_kb']:>9.1f}")
+        if r['days'] in base and base[r['days']]['seconds']:
+            line += f" {r['seconds'] / base[r['days']]['seconds']:>7.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do gerador de programação com dados sintéticos.")
+    parser.add_argument('--horizons', type=int, nargs='+', default=list(DEFAULT_HORIZONS), help="Dias a gerar (um teste por valor)")
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--cycle-items', type=int, default=14)
+    parser.add_argument('--slots-per-day', type=int, default=2)
+    parser.add_argument('--study-weekdays', type=int, default=6, choices=range(1, 8))
+    parser.add_argument('--history-days', type=int, default=180)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help=f"Arquivo JSON (padrão: {RESULTS_DIR}/schedule_<commit>.json)")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparar os tempos")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        horizons=args.horizons, repeat=args.repeat,
+        subjects=args.subjects, cycle_items=args.cycle_items, slots_per_day=args.slots_per_day,
+        study_weekdays=args.study_weekdays, history_days=args.history_days,
+    )
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"schedule_{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {output}")
+
+
+if __name__ == '__main__':
+    main()
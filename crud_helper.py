@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 import time
-from db_manager import get_connection
+from db_manager import get_connection, get_table_columns
 from auth import get_current_user
+from dashboard_service import bump_data_version
 
 def create_crud_interface(table_name, model_config, custom_title=None):
     """
@@ -50,10 +51,7 @@ def create_crud_interface(table_name, model_config, custom_title=None):
     conn = get_connection()
     
     # Check if table has COD_USUARIO column
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [col[1] for col in cursor.fetchall()]
-    has_user_column = 'COD_USUARIO' in columns
+    has_user_column = 'COD_USUARIO' in get_table_columns(table_name)
     
     # Build query with user filter if applicable
     if has_user_column and user_id:
@@ -105,9 +103,7 @@ def create_crud_interface(table_name, model_config, custom_title=None):
             if field['type'] == 'select' and field['name'] in display_cols:
                 conn_lkp = get_connection()
                 # Check for user column in source
-                cursor_lkp = conn_lkp.cursor()
-                cursor_lkp.execute(f"PRAGMA table_info({field['source']})")
-                cols_src = [c[1] for c in cursor_lkp.fetchall()]
+                cols_src = get_table_columns(field['source'])
                 
                 if 'COD_USUARIO' in cols_src and user_id:
                     df_lkp = pd.read_sql_query(f"SELECT CODIGO, NOME FROM {field['source']} WHERE COD_USUARIO = ?", conn_lkp, params=(user_id,))
@@ -166,6 +162,7 @@ def create_crud_interface(table_name, model_config, custom_title=None):
                     cursor = conn.cursor()
                     cursor.execute(f"DELETE FROM {table_name} WHERE CODIGO = ?", (st.session_state[state_key_confirm_delete],))
                     conn.commit()
+                    bump_data_version()
                     conn.close()
                     
                     # Reset states
@@ -217,9 +214,7 @@ def create_crud_interface(table_name, model_config, custom_title=None):
                     conn = get_connection()
                     
                     # Check if source table has COD_USUARIO
-                    cursor = conn.cursor()
-                    cursor.execute(f"PRAGMA table_info({field['source']})")
-                    src_cols = [col[1] for col in cursor.fetchall()]
+                    src_cols = get_table_columns(field['source'])
                     
                     if 'COD_USUARIO' in src_cols and user_id:
                         opts = pd.read_sql_query(f"SELECT CODIGO, NOME FROM {field['source']} WHERE COD_USUARIO = ?", conn, params=(user_id,))
@@ -297,6 +292,7 @@ def create_crud_interface(table_name, model_config, custom_title=None):
                         st.toast("✅ Registro criado!", icon="✅")
                     
                     conn.commit()
+                    bump_data_version()
                     
                     # [FEATURE] Auto-switch to the new Default Project
                     if table_name == 'EST_PROJETO' and form_data.get('PADRAO') == 'S':
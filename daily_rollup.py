@@ -0,0 +1,99 @@
+"""
+Materialised daily totals (EST_RESUMO_DIARIO) per user, project, subject and day.
+
+Home, the admin dashboard and the evolution chart read these O(days) rows instead of
+summing every EST_ESTUDOS / EST_PROGRAMACAO row on each rerun. The table is derived
+data: every write to those two tables refreshes the affected days of the project in
+the same transaction (refresh_daily_rollup), and rebuild_daily_rollup recreates it
+from scratch (migration 8, backup restore, `python db_manager.py rollup`).
+
+Days are the first 10 characters of DATA (older timer rows store a full timestamp), the
+subject is COD_MATERIA with the cycle item's subject as fallback (0 when unknown) and
+the user is the owner of the project. No database connection is opened here; callers
+pass their cursor and commit.
+"""
+
+from datetime import date, timedelta
+
+ROLLUP_TABLE = 'EST_RESUMO_DIARIO'
+
+# Recomputes the rollup rows of the source rows matching {where} (applied to both tables)
+_ROLLUP_SELECT = """
+    SELECT COALESCE(p.COD_USUARIO, 0), x.COD_PROJETO, x.COD_MATERIA, x.DATA,
+           COALESCE(SUM(x.HL_PREVISTA), 0), COALESCE(SUM(x.HL_REALIZADA), 0),
+           SUM(x.PROGRAMADA), SUM(x.ESTUDO),
+           COALESCE(SUM(x.QUESTOES), 0), COALESCE(SUM(x.CERTAS), 0), COALESCE(SUM(x.ERRADAS), 0)
+    FROM (
+        SELECT s.COD_PROJETO, COALESCE(s.COD_MATERIA, ci.COD_MATERIA, 0) AS COD_MATERIA,
+               substr(s.DATA, 1, 10) AS DATA, s.HL_PREVISTA, NULL AS HL_REALIZADA,
+               1 AS PROGRAMADA, 0 AS ESTUDO, NULL AS QUESTOES, NULL AS CERTAS, NULL AS ERRADAS
+        FROM EST_PROGRAMACAO s
+        LEFT JOIN EST_CICLO_ITEM ci ON ci.CODIGO = s.COD_CICLO_ITEM
+        WHERE s.COD_PROJETO IS NOT NULL AND s.DATA IS NOT NULL {where}
+        UNION ALL
+        SELECT s.COD_PROJETO, COALESCE(s.COD_MATERIA, ci.COD_MATERIA, 0),
+               substr(s.DATA, 1, 10), NULL, s.HL_REALIZADA,
+               0, 1, s.QUESTOES, s.CERTAS, s.ERRADAS
+        FROM EST_ESTUDOS s
+        LEFT JOIN EST_CICLO_ITEM ci ON ci.CODIGO = s.COD_CICLO_ITEM
+        WHERE s.COD_PROJETO IS NOT NULL AND s.DATA IS NOT NULL {where}
+    ) x
+    LEFT JOIN EST_PROJETO p ON p.CODIGO = x.COD_PROJETO
+    GROUP BY x.COD_PROJETO, x.DATA, x.COD_MATERIA
+"""
+
+_ROLLUP_COLUMNS = (
+    'COD_USUARIO, COD_PROJETO, COD_MATERIA, DATA, HL_PREVISTA, HL_REALIZADA, '
+    'QTDE_PROGRAMADA, QTDE_ESTUDOS, QUESTOES, CERTAS, ERRADAS'
+)
+
+
+def _day(value):
+    # date, datetime, pandas Timestamp or ISO text -> 'YYYY-MM-DD'
+    return str(value)[:10]
+
+
+def _write(cursor, delete_where, delete_params, source_where, source_params):
+    cursor.execute(f"DELETE FROM {ROLLUP_TABLE} {delete_where}", delete_params)
+    # The source filter appears once per table in the UNION
+    cursor.execute(
+        f"INSERT INTO {ROLLUP_TABLE} ({_ROLLUP_COLUMNS}) " + _ROLLUP_SELECT.format(where=source_where),
+        tuple(source_params) * 2
+    )
+    return cursor.rowcount
+
+
+def refresh_daily_rollup(cursor, project_id, dates=None):
+    """
+    Recomputes the rollup of a project for the days from min(dates) to max(dates).
+    dates: dates or ISO strings touched by the write (old and new date of an edit);
+    None recomputes the whole project. Does not commit.
+    """
+    if dates is None:
+        return _write(cursor, "WHERE COD_PROJETO = ?", (project_id,), "AND s.COD_PROJETO = ?", (project_id,))
+
+    days = sorted(_day(d) for d in dates if d)
+    if not days:
+        return 0
+    first, last = days[0], days[-1]
+    # Half-open range on the stored text so timestamps of the last day are included
+    after_last = (date.fromisoformat(last) + timedelta(days=1)).isoformat()
+    return _write(
+        cursor,
+        "WHERE COD_PROJETO = ? AND DATA BETWEEN ? AND ?", (project_id, first, last),
+        "AND s.COD_PROJETO = ? AND s.DATA >= ? AND s.DATA < ?", (project_id, first, after_last),
+    )
+
+
+def rebuild_daily_rollup(cursor, user_id=None):
+    """
+    Recreates the rollup from EST_ESTUDOS and EST_PROGRAMACAO, for every project or only
+    for the projects of user_id. Returns the number of rollup rows written. Does not commit.
+    """
+    if user_id is None:
+        return _write(cursor, "", (), "", ())
+    return _write(
+        cursor,
+        "WHERE COD_USUARIO = ?", (user_id,),
+        "AND s.COD_PROJETO IN (SELECT CODIGO FROM EST_PROJETO WHERE COD_USUARIO = ?)", (user_id,),
+    )
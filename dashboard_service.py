@@ -0,0 +1,271 @@
+"""
+Dados do painel da Home (KPIs, semana e evolução do projeto) em duas consultas agregadas
+sobre EST_RESUMO_DIARIO (daily_rollup). Antes cada indicador era um pd.read_sql_query
+separado sobre EST_ESTUDOS/EST_PROGRAMACAO; no Turso a latência da página inicial era
+dominada por essas idas ao banco.
+
+load_home_frames reúne tudo o que a Home exibe (agenda, progresso, horas por disciplina,
+previsto x realizado) em cache por projeto e versão dos dados. Cada gravação nas páginas
+chama bump_data_version, e a próxima leitura do projeto volta ao banco.
+
+A invalidação só vale dentro de um processo: versões e cache ficam na memória dele.
+Gravações feitas por outro processo (outra instância do app, os scripts avulsos, o CLI
+do db_manager) não chamam bump_data_version aqui e só aparecem na Home quando o cache
+expira (FRAMES_TTL_SECONDS).
+"""
+
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+import pandas as pd
+import streamlit as st
+from db_manager import get_connection
+from study_streak import invalidate_streak
+
+# Cache dos quadros da Home: validade máxima (segundos) e entradas guardadas
+FRAMES_TTL_SECONDS = 600
+FRAMES_MAX_ENTRIES = 200
+
+# Resultado de load_dashboard (horas em float; datas como date)
+DashboardData = namedtuple('DashboardData', [
+    'project_id',
+    'today',
+    'horas_hoje',     # HL_REALIZADA do dia
+    'total_real',     # HL_REALIZADA do projeto
+    'total_plan',     # HL_PREVISTA do projeto
+    'data_inicial',   # DATA_INICIAL do projeto (None se o projeto não existir)
+    'week_start',     # Domingo da semana de today
+    'week_plan',      # HL_PREVISTA por dia, Domingo..Sábado
+    'week_real',      # HL_REALIZADA por dia, Domingo..Sábado
+])
+
+# Tudo o que a Home exibe de um projeto; filtros da página atuam só em memória
+HomeFrames = namedtuple('HomeFrames', [
+    'dashboard',      # DashboardData
+    'agenda',         # Programação do dia (Descrição, horários, minutos, horas)
+    'progress',       # Conteúdos concluídos por matéria (MATERIA, TOTAL, CONCLUIDO, PERCENT)
+    'subject_hours',  # Horas estudadas por disciplina, com a linha TOTAL
+    'plan',           # Horas previstas por dia e matéria (DATA, HL_PREVISTA, MATERIA)
+    'real',           # Horas realizadas por dia e matéria (DATA, HL_REALIZADA, MATERIA)
+])
+
+_lock = threading.Lock()
+_global_version = 0
+_versions = {}  # project_id -> contador de gravações
+
+# Uma linha: somas condicionais sobre o resumo diário do projeto (daily_rollup)
+_TOTALS_SQL = """
+    WITH resumo AS (
+        SELECT SUM(HL_REALIZADA) AS TOTAL_REAL,
+               SUM(HL_PREVISTA) AS TOTAL_PLAN,
+               SUM(CASE WHEN DATA = ? THEN HL_REALIZADA END) AS HORAS_HOJE
+        FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ?
+    )
+    SELECT resumo.TOTAL_REAL, resumo.HORAS_HOJE, resumo.TOTAL_PLAN,
+           (SELECT DATA_INICIAL FROM EST_PROJETO WHERE CODIGO = ?) AS DATA_INICIAL
+    FROM resumo
+"""
+
+# Horas por dia da semana
+_DAILY_SQL = """
+    SELECT DATA, SUM(HL_PREVISTA) AS HL_PREVISTA, SUM(HL_REALIZADA) AS HL_REALIZADA
+    FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ? AND DATA BETWEEN ? AND ?
+    GROUP BY DATA
+"""
+
+
+def week_bounds(day):
+    """Domingo e sábado da semana de day."""
+    start = day - timedelta(days=(day.weekday() + 1) % 7)
+    return start, start + timedelta(days=6)
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def load_dashboard(project_id: int, today=None, cursor=None) -> DashboardData:
+    """
+    Carrega os indicadores da Home para um projeto.
+
+    Args:
+        project_id: Código do projeto
+        today: Data de referência (padrão: hoje)
+        cursor: Cursor já aberto (opcional; sem ele usa uma conexão do pool)
+
+    Returns:
+        DashboardData
+    """
+    today = today or date.today()
+    today_str = today.isoformat()
+    week_start, week_end = week_bounds(today)
+    week_start_str, week_end_str = week_start.isoformat(), week_end.isoformat()
+
+    conn = None
+    if cursor is None:
+        conn = get_connection()
+        cursor = conn.cursor()
+    try:
+        totals = cursor.execute(_TOTALS_SQL, (today_str, project_id, project_id)).fetchone()
+        daily = cursor.execute(_DAILY_SQL, (project_id, week_start_str, week_end_str)).fetchall()
+    finally:
+        if conn is not None:
+            conn.close()
+
+    week_plan = [0.0] * 7
+    week_real = [0.0] * 7
+    for row in daily:
+        day = _parse_date(row['DATA'])
+        if day is None:
+            continue
+        idx = (day - week_start).days
+        week_plan[idx] += float(row['HL_PREVISTA'] or 0.0)
+        week_real[idx] += float(row['HL_REALIZADA'] or 0.0)
+
+    return DashboardData(
+        project_id=project_id,
+        today=today,
+        horas_hoje=float(totals['HORAS_HOJE'] or 0.0),
+        total_real=float(totals['TOTAL_REAL'] or 0.0),
+        total_plan=float(totals['TOTAL_PLAN'] or 0.0),
+        data_inicial=_parse_date(totals['DATA_INICIAL']),
+        week_start=week_start,
+        week_plan=week_plan,
+        week_real=week_real,
+    )
+
+
+def data_version(project_id: int) -> tuple:
+    """Versão atual dos dados do projeto (muda a cada bump_data_version)."""
+    with _lock:
+        return (_global_version, _versions.get(project_id, 0))
+
+
+def bump_data_version(project_id: int = None):
+    """
+    Marca os dados do projeto como alterados (ou de todos, se project_id for None):
+    a próxima leitura da Home ignora os quadros em cache e a sequência é recalculada.
+    Chamado pelas páginas depois de cada gravação.
+    """
+    global _global_version
+    with _lock:
+        if project_id is None:
+            _global_version += 1
+        else:
+            _versions[project_id] = _versions.get(project_id, 0) + 1
+    invalidate_streak(project_id)
+
+
+def _agenda_frame(conn, project_id, today):
+    df = pd.read_sql_query("""
+        SELECT 
+            p.DESC_AULA as Descrição,
+            p.HR_INICIAL_PREVISTA as 'Hr. Inicial',
+            p.HL_PREVISTA as 'Qtde Horas'
+        FROM EST_PROGRAMACAO p
+        WHERE p.DATA = ? AND p.COD_PROJETO = ?
+        ORDER BY p.HR_INICIAL_PREVISTA
+    """, conn, params=(today.isoformat(), project_id))
+    if df.empty:
+        return df
+
+    # Calculate End Time and Minutes
+    df['Qtde Minutos'] = df['Qtde Horas'] * 60
+
+    def calc_end_time(row):
+        try:
+            start = pd.to_datetime(row['Hr. Inicial'], format='%H:%M:%S')
+            end = start + pd.Timedelta(hours=row['Qtde Horas'])
+            return end.strftime('%H:%M:%S')
+        except: return "-"
+
+    df['Hr. Final'] = df.apply(calc_end_time, axis=1)
+    return df[['Descrição', 'Hr. Inicial', 'Hr. Final', 'Qtde Minutos', 'Qtde Horas']]
+
+
+def _progress_frame(conn, project_id):
+    df = pd.read_sql_query("""
+        SELECT 
+            m.NOME as MATERIA,
+            COUNT(cc.CODIGO) as TOTAL,
+            SUM(CASE WHEN cc.FINALIZADO = 'S' THEN 1 ELSE 0 END) as CONCLUIDO
+        FROM EST_CONTEUDO_CICLO cc
+        JOIN EST_CICLO_ITEM ci ON cc.COD_CICLO_ITEM = ci.CODIGO
+        JOIN EST_MATERIA m ON ci.COD_MATERIA = m.CODIGO
+        WHERE ci.COD_CICLO IN (
+            SELECT DISTINCT COD_CICLO FROM EST_PROGRAMACAO WHERE COD_PROJETO = ?
+            UNION
+            SELECT DISTINCT COD_CICLO FROM EST_ESTUDOS WHERE COD_PROJETO = ?
+        )
+        GROUP BY m.NOME
+        HAVING TOTAL > 0
+        ORDER BY (CAST(CONCLUIDO AS FLOAT) / TOTAL) DESC
+    """, conn, params=(project_id, project_id))
+    df['PERCENT'] = (df['CONCLUIDO'] / df['TOTAL']) * 100
+    return df
+
+
+def _subject_hours_frame(conn, project_id):
+    # Grouped by COD_MATERIA in SQL; rows without a subject fall under 'Outros'
+    grouped = pd.read_sql_query("""
+        SELECT COALESCE(m.NOME, 'Outros') as Disciplina, SUM(r.HL_REALIZADA) as 'Hrs. Estudadas'
+        FROM EST_RESUMO_DIARIO r
+        LEFT JOIN EST_MATERIA m ON r.COD_MATERIA = m.CODIGO
+        WHERE r.COD_PROJETO = ? AND r.QTDE_ESTUDOS > 0
+        GROUP BY r.COD_MATERIA
+        ORDER BY 2 DESC
+    """, conn, params=(project_id,))
+    if grouped.empty:
+        return grouped
+
+    # Add Total Row
+    total = pd.DataFrame([{'Disciplina': 'TOTAL', 'Hrs. Estudadas': grouped['Hrs. Estudadas'].sum()}])
+    return pd.concat([grouped, total], ignore_index=True)
+
+
+def _evolution_frames(conn, project_id):
+    # Planned and realized hours per day and subject, in one pass over the rollup
+    df = pd.read_sql_query("""
+        SELECT r.DATA, r.HL_PREVISTA, r.HL_REALIZADA, r.QTDE_PROGRAMADA, r.QTDE_ESTUDOS,
+               COALESCE(m.NOME, 'Outros') as MATERIA
+        FROM EST_RESUMO_DIARIO r
+        LEFT JOIN EST_MATERIA m ON r.COD_MATERIA = m.CODIGO
+        WHERE r.COD_PROJETO = ?
+    """, conn, params=(project_id,))
+    df['DATA'] = pd.to_datetime(df['DATA'], errors='coerce')
+    df = df.dropna(subset=['DATA'])
+
+    plan = df.loc[df['QTDE_PROGRAMADA'] > 0, ['DATA', 'HL_PREVISTA', 'MATERIA']].reset_index(drop=True)
+    real = df.loc[df['QTDE_ESTUDOS'] > 0, ['DATA', 'HL_REALIZADA', 'MATERIA']].reset_index(drop=True)
+    return plan, real
+
+
+@st.cache_data(ttl=FRAMES_TTL_SECONDS, max_entries=FRAMES_MAX_ENTRIES, show_spinner=False)
+def _load_home_frames(project_id, today, version):
+    # version only takes part in the cache key: a write bumps it and the old entry is skipped
+    conn = get_connection()
+    try:
+        dashboard = load_dashboard(project_id, today, conn.cursor())
+        plan, real = _evolution_frames(conn, project_id)
+        return HomeFrames(
+            dashboard=dashboard,
+            agenda=_agenda_frame(conn, project_id, today),
+            progress=_progress_frame(conn, project_id),
+            subject_hours=_subject_hours_frame(conn, project_id),
+            plan=plan,
+            real=real,
+        )
+    finally:
+        conn.close()
+
+
+def load_home_frames(project_id: int, today=None) -> HomeFrames:
+    """
+    Quadros da Home do projeto, em cache por (projeto, dia, versão dos dados).
+    Reruns sem gravação (trocar de aba, filtrar o gráfico) não vão ao banco.
+    """
+    today = today or date.today()
+    return _load_home_frames(project_id, today, data_version(project_id))
@@ -1,6 +1,14 @@
 import sqlite3
 import os
+import re
+import gc
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 import streamlit as st
+import query_stats
 
 try:
     import libsql_experimental as libsql
@@ -9,8 +17,36 @@ except ImportError:
 
 DB_NAME = 'estudos.db'
 
+logger = logging.getLogger('estudos.db')
+
+# Connection pool settings (one pool per database, shared by all sessions of the process)
+POOL_SIZE = 5                   # Idle connections kept open for reuse
+POOL_MAX_OVERFLOW = 10          # Extra connections allowed under load (closed when returned)
+POOL_TIMEOUT = 30               # Seconds to wait for a free connection before giving up
+POOL_MAX_IDLE_SECONDS = 300     # Idle connections older than this are closed
+POOL_HEALTH_CHECK_AFTER = 30    # Idle connections older than this are pinged before reuse
+
+# Embedded replica (DB_MODE = "replica"): defaults for the secrets.toml settings
+REPLICA_PATH = 'estudos_replica.db'  # REPLICA_PATH: local copy of the Turso database
+REPLICA_SYNC_INTERVAL = 60           # REPLICA_SYNC_INTERVAL: seconds between pulls from the primary
+REPLICA_SYNC_ON_WRITE = True         # REPLICA_SYNC_ON_WRITE: pull right after each commit (read-your-writes)
+
+# SQLite pragmas applied to every new local connection. Any of them can be overridden
+# in secrets.toml under [SQLITE_PRAGMAS] (e.g. synchronous = "FULL").
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',      # Readers and the writer don't block each other
+    'busy_timeout': 5000,       # ms to wait for a lock before "database is locked"
+    'synchronous': 'NORMAL',    # Safe with WAL: fsync at checkpoints, not on every commit
+    'mmap_size': 268435456,     # 256 MB of the file read through memory mapping
+    'cache_size': -16000,       # Page cache per connection (negative = KiB, so 16 MB)
+    'temp_store': 'MEMORY',     # Sorts and temp tables in memory
+}
+
+# Rows per batch when a large result is streamed (cursor iteration, fetchmany, read_sql chunksize)
+FETCH_ARRAYSIZE = 500
+
 def get_connection():
-    # Configuration: "online" (default) or "local"
+    # Configuration: "online" (default), "replica" or "local"
     # Add DB_MODE = "local" in secrets.toml to force local DB
     try:
         db_mode = st.secrets.get("DB_MODE", "online").lower()
@@ -42,6 +78,9 @@ def get_connection():
 
 # Helper class to mimic sqlite3.Row (supports both index and name access)
 class LibsqlRow:
+    # Rows of one result set share the same col_map (name -> index), built once per query
+    __slots__ = ('_data', '_col_map')
+
     def __init__(self, data, col_map):
         self._data = data
         self._col_map = col_map
@@ -68,18 +107,41 @@ class LibsqlRow:
     def __len__(self):
         return len(self._data)
 
+    def __repr__(self):
+        return f"LibsqlRow({dict(zip(self._col_map, self._data))!r})"
+
 class LibsqlConnectionWrapper:
+    _pool = None
+    cursor_class = None # LibsqlCursorWrapper unless instrumented (set per connection)
+
     def __init__(self, conn):
         self.conn = conn
         
     def cursor(self):
-        return LibsqlCursorWrapper(self.conn.cursor())
+        return (self.cursor_class or LibsqlCursorWrapper)(self.conn.cursor())
         
     def commit(self):
         self.conn.commit()
         
     def close(self):
+        # Pooled connections go back to the pool; the pool closes them for real
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            self.conn.close()
+
+    def _close_raw(self):
         self.conn.close()
+
+    def _reset(self):
+        # Discard anything the borrower left uncommitted (no-op outside a transaction)
+        try:
+            self.conn.rollback()
+        except Exception:
+            pass
+
+    def _ping(self):
+        self.conn.execute("SELECT 1")
         
     def rollback(self):
         self.conn.rollback()
@@ -87,39 +149,267 @@ class LibsqlConnectionWrapper:
     def execute(self, sql, params=()):
         return self.cursor().execute(sql, params)
 
+class ReplicaSync:
+    """
+    Sync schedule of one embedded replica, shared by all its pooled connections:
+    pulls from the primary at most every `interval` seconds, and after commits if on_write.
+    """
+    def __init__(self, interval, on_write):
+        self.interval = interval
+        self.on_write = on_write
+        self._last_sync = None
+        self._lock = threading.Lock()
+
+    def due(self):
+        return self._last_sync is None or time.monotonic() - self._last_sync >= self.interval
+
+    def sync(self, conn):
+        with self._lock:
+            conn.sync()
+            self._last_sync = time.monotonic()
+
+class ReplicaConnectionWrapper(LibsqlConnectionWrapper):
+    """
+    Connection to a libsql embedded replica: reads are served by the local file,
+    writes are forwarded by libsql to the Turso primary.
+    """
+    def __init__(self, conn, replica_sync):
+        super().__init__(conn)
+        self._replica_sync = replica_sync
+
+    def commit(self):
+        self.conn.commit()
+        if self._replica_sync.on_write:
+            # Bring the write back into the local file so the next read sees it
+            self._sync_quietly()
+
+    def sync_if_due(self):
+        if self._replica_sync.due():
+            self._sync_quietly()
+
+    def _sync_quietly(self):
+        try:
+            self._replica_sync.sync(self.conn)
+        except Exception as e:
+            # Primary unreachable: keep serving the (possibly stale) local copy
+            logger.warning("Replica sync failed: %s", e)
+
+class PooledSqliteConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to its ConnectionPool."""
+    _pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.release(self)
+        else:
+            super().close()
+
+    def _close_raw(self):
+        super().close()
+
+    def _reset(self):
+        # Discard anything the borrower left uncommitted and restore the row factory
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = sqlite3.Row
+
+    def _ping(self):
+        super().execute("SELECT 1").fetchone()
+
+class PoolTimeoutError(Exception):
+    """No connection became free within POOL_TIMEOUT seconds."""
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of database connections.
+
+    Connections are handed out by acquire() and come back when the borrower calls
+    conn.close(), so existing "get_connection() ... conn.close()" code reuses them
+    without changes. Up to `size` idle connections are kept; under load up to
+    `max_overflow` extra ones are opened and closed on return. Idle connections are
+    pinged before reuse once they are older than health_check_after, and closed once
+    they are older than max_idle. Connections the borrower never closes are
+    forgotten when garbage-collected (tracked in a WeakSet), so they do not leak slots.
+    """
+    def __init__(self, connect, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW, timeout=POOL_TIMEOUT,
+                 max_idle=POOL_MAX_IDLE_SECONDS, health_check_after=POOL_HEALTH_CHECK_AFTER):
+        self._connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self._idle = []  # (conn, released_at), most recently used last
+        self._in_use = weakref.WeakSet()
+        self._opening = 0
+        self._cond = threading.Condition()
+
+    def _evict_idle(self, now):
+        # Called with the lock held; returns the connections to close outside it
+        expired = [conn for conn, released_at in self._idle if now - released_at > self.max_idle]
+        if expired:
+            self._idle = [(conn, released_at) for conn, released_at in self._idle if now - released_at <= self.max_idle]
+        return expired
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        collected = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    self._in_use.add(conn)
+                    break
+                if len(self._in_use) + self._opening < self.size + self.max_overflow:
+                    conn, released_at = None, None
+                    self._opening += 1
+                    break
+                if not collected:
+                    # sqlite3 connections sit in reference cycles: collect the ones borrowers dropped
+                    collected = True
+                    gc.collect()
+                    continue
+                if now >= deadline:
+                    raise PoolTimeoutError(f"Nenhuma conexão livre após {self.timeout}s")
+                # Short waits: slots freed by garbage collection do not notify
+                self._cond.wait(min(deadline - now, 0.1))
+
+        for old in expired:
+            _close_quietly(old)
+
+        if conn is not None and now - released_at > self.health_check_after:
+            try:
+                conn._ping()
+            except Exception:
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._opening += 1
+                _close_quietly(conn)
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+                conn._pool = self
+            finally:
+                with self._cond:
+                    self._opening -= 1
+                    if conn is not None:
+                        self._in_use.add(conn)
+                    self._cond.notify()
+        return conn
+
+    def release(self, conn):
+        with self._cond:
+            if conn not in self._in_use:
+                return  # Already returned (double close)
+            self._in_use.discard(conn)
+
+        try:
+            conn._reset()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            keep = healthy and len(self._idle) < self.size
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            _close_quietly(conn)
+
+    def close_all(self):
+        """Closes the idle connections (borrowed ones are closed when returned)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self.size = 0
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {'idle': len(self._idle), 'in_use': len(self._in_use)}
+
+def _close_quietly(conn):
+    try:
+        conn._close_raw()
+    except Exception:
+        pass
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(key, connect):
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect)
+        return pool
+
+def close_all_pools():
+    """Closes every pooled connection of the process (e.g. before replacing the database file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
 class LibsqlCursorWrapper:
     def __init__(self, cursor):
         self.cursor = cursor
+        self._col_map = None
+        self.arraysize = FETCH_ARRAYSIZE # Default fetchmany() size, as in DB-API cursors
         
     def execute(self, sql, params=()):
         self.cursor.execute(sql, params)
+        self._col_map = None # New result set
         return self
         
     def executemany(self, sql, params):
         self.cursor.executemany(sql, params)
+        self._col_map = None
         return self
 
     def close(self):
         # Some implementations might not have close, or it might be a no-op
         if hasattr(self.cursor, 'close'):
             self.cursor.close()
+
+    def _column_map(self):
+        # Built once per result set (description is available after execute)
+        if self._col_map is None:
+            self._col_map = {d[0]: idx for idx, d in enumerate(self.cursor.description or ())}
+        return self._col_map
+
+    def _wrap_rows(self, rows):
+        col_map = self._column_map()
+        return [LibsqlRow(row, col_map) for row in rows]
         
     def fetchone(self):
         row = self.cursor.fetchone()
         if row is None: return None
-        return self._wrap_row(row)
+        return LibsqlRow(row, self._column_map())
+
+    def fetchmany(self, size=None):
+        rows = self.cursor.fetchmany(self.arraysize if size is None else size)
+        if not rows: return []
+        return self._wrap_rows(rows)
         
     def fetchall(self):
         rows = self.cursor.fetchall()
         if not rows: return []
-        return [self._wrap_row(row) for row in rows]
-    
-    def _wrap_row(self, row):
-        # Create col_map only once per query ideally, but here per row is okay for now or optimize later
-        # Actually description is available after execute
-        col_names = [d[0] for d in self.cursor.description]
-        col_map = {name: idx for idx, name in enumerate(col_names)}
-        return LibsqlRow(row, col_map)
+        return self._wrap_rows(rows)
+
+    def __iter__(self):
+        # Streams the result set in batches of arraysize instead of materialising it with fetchall
+        while True:
+            rows = self.fetchmany()
+            if not rows:
+                return
+            yield from rows
         
     @property
     def lastrowid(self):
@@ -136,30 +426,340 @@ class LibsqlCursorWrapper:
             return self.cursor.rowcount
         return -1
 
-# Redefine get_connection to use wrapper
-def get_connection():
-    # ... (config logic) ...
+# ===== QUERY INSTRUMENTATION =====
+# With QUERY_STATS = true in secrets.toml, connections hand out cursors that report
+# every query (normalised SQL, parameter count, time, rows) to query_stats.
+
+def _params_count(params):
+    return len(params) if hasattr(params, '__len__') else 0
+
+class InstrumentedSqliteCursor(sqlite3.Cursor):
+    _record = None
+
+    def execute(self, sql, params=()):
+        self._record = query_stats.start_query(sql, _params_count(params))
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            query_stats.add(self._record, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, sql, params):
+        self._record = query_stats.start_query(sql, _params_count(params))
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, params)
+        finally:
+            query_stats.add(self._record, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def _fetched(self, started, rows):
+        if self._record is not None:
+            query_stats.add(self._record, time.perf_counter() - started, rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0)
+            raise
+        self._fetched(started, 1)
+        return row
+
+class InstrumentedSqliteConnection(PooledSqliteConnection):
+    """Pooled sqlite3 connection whose cursors (including conn.execute) are instrumented."""
+    def cursor(self, factory=InstrumentedSqliteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, params):
+        return self.cursor().executemany(sql, params)
+
+class InstrumentedLibsqlCursor(LibsqlCursorWrapper):
+    _record = None
+
+    def execute(self, sql, params=()):
+        self._record = query_stats.start_query(sql, _params_count(params))
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            query_stats.add(self._record, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, sql, params):
+        self._record = query_stats.start_query(sql, _params_count(params))
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, params)
+        finally:
+            query_stats.add(self._record, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def _fetched(self, started, rows):
+        if self._record is not None:
+            query_stats.add(self._record, time.perf_counter() - started, rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+def _instrumented(connect, slow_ms, slow_log):
+    # Wraps a connect function so the connections it opens report to query_stats
+    def connect_instrumented():
+        query_stats.configure(slow_ms, slow_log)
+        conn = connect()
+        if isinstance(conn, LibsqlConnectionWrapper):
+            conn.cursor_class = InstrumentedLibsqlCursor
+        return conn
+    return connect_instrumented
+
+def _sqlite_pragmas():
+    """SQLITE_PRAGMAS with the overrides of secrets.toml ([SQLITE_PRAGMAS]) applied."""
+    pragmas = dict(SQLITE_PRAGMAS)
+    try:
+        overrides = dict(st.secrets.get("SQLITE_PRAGMAS", {}))
+    except FileNotFoundError:
+        overrides = {}
+    for name, value in overrides.items():
+        name = name.lower()
+        # Values end up in the PRAGMA statement: only known names and plain words/numbers
+        if name not in SQLITE_PRAGMAS or not re.fullmatch(r'-?[A-Za-z0-9_]+', str(value)):
+            raise ValueError(f"SQLITE_PRAGMAS inválido: {name} = {value!r}")
+        pragmas[name] = value
+    return pragmas
+
+# Spellings accepted for the on/off settings of secrets.toml, besides TOML booleans
+_FLAG_VALUES = {
+    'true': True, '1': True, 'yes': True, 'on': True,
+    'false': False, '0': False, 'no': False, 'off': False,
+}
+
+def _secret_flag(name, default):
+    """On/off setting of secrets.toml; a quoted "false" is off, unknown values are rejected."""
+    value = st.secrets.get(name, default)
+    if isinstance(value, bool):
+        return value
+    flag = _FLAG_VALUES.get(str(value).strip().lower())
+    if flag is None:
+        raise ValueError(f"{name} inválido: {value!r}")
+    return flag
+
+def _connect_sqlite(path, pragmas=None, factory=PooledSqliteConnection):
+    # check_same_thread=False: Streamlit sessions run in different threads, the pool
+    # guarantees a connection is used by one borrower at a time
+    conn = sqlite3.connect(path, factory=factory, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for name, value in (pragmas or {}).items():
+        # sqlite3.Connection.execute: connection setup is not reported as a page query
+        sqlite3.Connection.execute(conn, f"PRAGMA {name} = {value}").fetchall()
+    return conn
+
+_replica_syncs = {}
+_replica_syncs_lock = threading.Lock()
+
+def _get_replica_sync(key, interval, on_write):
+    with _replica_syncs_lock:
+        replica_sync = _replica_syncs.get(key)
+        if replica_sync is None:
+            replica_sync = _replica_syncs[key] = ReplicaSync(interval, on_write)
+        return replica_sync
+
+def _database_target():
+    """(key, connect) of the configured database: key identifies it, connect opens a connection."""
     try:
         db_mode = st.secrets.get("DB_MODE", "online").lower()
         turso_url = st.secrets.get("TURSO_URL")
         turso_token = st.secrets.get("TURSO_TOKEN")
+        replica_path = st.secrets.get("REPLICA_PATH", REPLICA_PATH)
+        sync_interval = float(st.secrets.get("REPLICA_SYNC_INTERVAL", REPLICA_SYNC_INTERVAL))
+        sync_on_write = _secret_flag("REPLICA_SYNC_ON_WRITE", REPLICA_SYNC_ON_WRITE)
+        instrument = _secret_flag("QUERY_STATS", False)
+        slow_ms = st.secrets.get("SLOW_QUERY_MS", query_stats.SLOW_QUERY_MS)
+        slow_log = st.secrets.get("SLOW_QUERY_LOG", query_stats.SLOW_QUERY_LOG)
     except FileNotFoundError:
         db_mode = "local"
         turso_url = None
         turso_token = None
+        instrument = False
     
     if db_mode == "online" and turso_url and turso_token and libsql:
-        raw_conn = libsql.connect(turso_url, auth_token=turso_token)
-        return LibsqlConnectionWrapper(raw_conn)
+        key = ('online', turso_url)
+        connect = lambda: LibsqlConnectionWrapper(
+            libsql.connect(turso_url, auth_token=turso_token)
+        )
+    elif db_mode == "replica" and turso_url and turso_token and libsql:
+        replica_path = os.path.abspath(replica_path)
+        key = ('replica', turso_url, replica_path)
+        replica_sync = _get_replica_sync(key, sync_interval, sync_on_write)
+        connect = lambda: ReplicaConnectionWrapper(
+            libsql.connect(replica_path, sync_url=turso_url, auth_token=turso_token), replica_sync
+        )
     else:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
-        return conn
+        path = os.path.abspath(DB_NAME)
+        key = ('local', path)
+        factory = InstrumentedSqliteConnection if instrument else PooledSqliteConnection
+        connect = lambda: _connect_sqlite(path, _sqlite_pragmas(), factory)
 
-def init_db():
+    if instrument:
+        # Separate pool: turning QUERY_STATS on/off never mixes plain and instrumented connections
+        key = key + ('query_stats',)
+        connect = _instrumented(connect, slow_ms, slow_log)
+    return key, connect
+
+# Redefine get_connection to use wrapper
+def get_connection():
+    """
+    Borrows a connection from the process-wide pool (Turso, embedded replica or local SQLite).
+    conn.close() returns it to the pool; prefer the connection() context manager.
+    """
+    key, connect = _database_target()
+    conn = _get_pool(key, connect).acquire()
+    if isinstance(conn, ReplicaConnectionWrapper):
+        conn.sync_if_due()
+    return conn
+
+@contextmanager
+def connection():
+    """
+    with connection() as conn: ... borrows a pooled connection and always returns it.
+    Uncommitted changes are rolled back when the block exits (commit explicitly).
+    """
     conn = get_connection()
-    cursor = conn.cursor()
-    
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+# ===== SCHEMA INTROSPECTION =====
+# Column names per (database, table), read once with PRAGMA table_info. The schema only
+# changes through apply_migrations, which clears this cache.
+_columns_cache = {}
+_columns_lock = threading.Lock()
+
+def get_table_columns(table, cursor=None):
+    """
+    Column names of table, in table order (empty tuple if it does not exist).
+    cursor: already open cursor to use on a cache miss (optional).
+    """
+    key = (_database_target()[0], table)
+    with _columns_lock:
+        columns = _columns_cache.get(key)
+    if columns is not None:
+        return columns
+
+    if cursor is not None:
+        columns = tuple(col[1] for col in cursor.execute(f"PRAGMA table_info({table})").fetchall())
+    else:
+        conn = get_connection()
+        try:
+            columns = tuple(col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall())
+        finally:
+            conn.close()
+
+    # A missing table is not cached: it may be created later in the process
+    if columns:
+        with _columns_lock:
+            _columns_cache[key] = columns
+    return columns
+
+def invalidate_table_columns(table=None):
+    """Drops the cached columns of table (or of every table, if table is None)."""
+    with _columns_lock:
+        if table is None:
+            _columns_cache.clear()
+        else:
+            for key in [k for k in _columns_cache if k[1] == table]:
+                del _columns_cache[key]
+
+def get_schema_version():
+    """Schema version recorded in the database (0 if it was never stamped)."""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+    except Exception:
+        return 0 # No schema_version table yet
+    finally:
+        conn.close()
+
+def ensure_schema():
+    """
+    Runs init_db only if the database is behind SCHEMA_VERSION.
+    Up-to-date databases cost a single SELECT.
+    """
+    current = get_schema_version()
+    if current >= SCHEMA_VERSION:
+        return current
+    init_db()
+    return SCHEMA_VERSION
+
+@st.cache_resource(show_spinner=False)
+def _bootstrap_schema(database_key):
+    return ensure_schema()
+
+def bootstrap_db():
+    """
+    Schema bootstrap for App.py: checks/creates the schema once per process and
+    database (st.cache_resource), so regular reruns run no SQL at all.
+    """
+    key, _ = _database_target()
+    return _bootstrap_schema(key)
+
+# ===== MIGRATIONS =====
+# Numbered schema/data steps. Each one runs once, in order, inside its own transaction,
+# and is recorded in schema_version. To change the schema append a new step at the end;
+# never edit or renumber a step that was already released.
+
+# Tables whose rows belong to a user (COD_USUARIO)
+USER_OWNED_TABLES = ['EST_AREA', 'EST_MATERIA', 'EST_PROJETO', 'EST_CICLO', 'EST_GRADE_SEMANAL', 'EST_ESTUDOS', 'EST_PROGRAMACAO']
+
+class MigrationError(Exception):
+    """A migration step failed; it was rolled back and the following steps were not run."""
+
+def _table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [col[1] for col in cursor.fetchall()]
+
+def _add_column_if_missing(cursor, table, column, definition):
+    # Databases created by older versions (or by hand) may already have the column
+    if column not in _table_columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"Added {column} to {table}")
+
+def _migration_001_base_tables(cursor):
     # Tables from metadata_operacoes.sql related to Studies
     
     # EST_AREA
@@ -343,10 +943,6 @@ def init_db():
     )
     ''')
     
-    conn.commit()
-    
-    conn.commit()
-    
     # EST_CONFIGURACAO - Tabela de Preferências do Usuário
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS EST_CONFIGURACAO (
@@ -361,40 +957,232 @@ def init_db():
     )
     ''')
 
-    conn.commit()
-    
-    # ===== MIGRATION: Add COD_USUARIO to existing tables =====
-    # Check if COD_USUARIO column exists, if not, add it
-    
-    tables_to_migrate = ['EST_AREA', 'EST_MATERIA', 'EST_PROJETO', 'EST_CICLO', 'EST_GRADE_SEMANAL', 'EST_ESTUDOS', 'EST_PROGRAMACAO']
-    
-    for table in tables_to_migrate:
-        # Check if column exists
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'COD_USUARIO' not in columns:
-            try:
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN COD_USUARIO INTEGER")
-                print(f"Added COD_USUARIO to {table}")
-            except Exception as e:
-                print(f"Note: Could not add COD_USUARIO to {table}: {e}")
+def _migration_002_cod_usuario(cursor):
+    # Multi-user support: data ownership on tables created before EST_USUARIO existed
+    for table in USER_OWNED_TABLES:
+        _add_column_if_missing(cursor, table, 'COD_USUARIO', 'INTEGER')
 
-    # ===== MIGRATION: Add COD_MATERIA to EST_PROGRAMACAO and EST_ESTUDOS =====
-    tables_with_materia = ['EST_PROGRAMACAO', 'EST_ESTUDOS']
-    for table in tables_with_materia:
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'COD_MATERIA' not in columns:
+def _migration_003_cod_materia(cursor):
+    for table in ['EST_PROGRAMACAO', 'EST_ESTUDOS']:
+        _add_column_if_missing(cursor, table, 'COD_MATERIA', 'INTEGER')
+
+def _migration_004_conteudo_ciclo(cursor):
+    # EST_CONTEUDO_CICLO created by create_conteudo_table.py has OBSERVACOES but no ORDEM;
+    # the one created by init_db has ORDEM but no OBSERVACOES
+    _add_column_if_missing(cursor, 'EST_CONTEUDO_CICLO', 'ORDEM', 'INTEGER')
+    _add_column_if_missing(cursor, 'EST_CONTEUDO_CICLO', 'OBSERVACOES', 'TEXT')
+
+def _migration_005_estudos_tipo(cursor):
+    # History rows saved without TIPO are cycle studies (was fix_tipo.py); the timer and the
+    # retroactive form in Estudar now write TIPO_ESTUDO_CICLO, so no new NULL rows appear
+    cursor.execute("UPDATE EST_ESTUDOS SET TIPO = 4 WHERE TIPO IS NULL")
+
+def _migration_006_cursor_ciclo(cursor):
+    # EST_CURSOR_CICLO - Onde a programação de cada projeto parou (lido/avançado pelo gerador)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS EST_CURSOR_CICLO (
+        COD_PROJETO INTEGER PRIMARY KEY,
+        COD_USUARIO INTEGER,
+        COD_CICLO_ITEM INTEGER, -- Último item do ciclo programado
+        ULTIMO_DIA INTEGER,     -- Último DIA de estudo usado
+        ULTIMA_DATA TEXT,       -- Última data gerada
+        VERSAO INTEGER DEFAULT 0,
+        FOREIGN KEY(COD_PROJETO) REFERENCES EST_PROJETO(CODIGO)
+    )
+    ''')
+
+# Secondary indexes for the hot query paths (project/date filters of Home, Estudar,
+# Planejamento and the schedule generator). Created by migration 7.
+INDEXES = [
+    ('IDX_PROGRAMACAO_PROJETO_DATA', 'EST_PROGRAMACAO', 'COD_PROJETO, DATA'),
+    ('IDX_PROGRAMACAO_PROJETO_STATUS_DATA', 'EST_PROGRAMACAO', 'COD_PROJETO, STATUS, DATA'),
+    ('IDX_PROGRAMACAO_USUARIO', 'EST_PROGRAMACAO', 'COD_USUARIO'),
+    ('IDX_PROGRAMACAO_CICLO', 'EST_PROGRAMACAO', 'COD_CICLO'),
+    ('IDX_PROGRAMACAO_GRADE', 'EST_PROGRAMACAO', 'COD_GRADE'),
+    ('IDX_ESTUDOS_PROJETO_DATA', 'EST_ESTUDOS', 'COD_PROJETO, DATA'),
+    ('IDX_ESTUDOS_USUARIO', 'EST_ESTUDOS', 'COD_USUARIO'),
+    ('IDX_CONTEUDO_ITEM_FINALIZADO_ORDEM', 'EST_CONTEUDO_CICLO', 'COD_CICLO_ITEM, FINALIZADO, ORDEM'),
+    ('IDX_CICLO_ITEM_CICLO', 'EST_CICLO_ITEM', 'COD_CICLO, INDICE'),
+    ('IDX_GRADE_ITEM_GRADE', 'EST_GRADE_ITEM', 'COD_GRADE, DIA_SEMANA'),
+]
+
+def _migration_007_indexes(cursor):
+    for name, table, columns in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    # Refresh the planner statistics so it picks the new indexes right away
+    cursor.execute("ANALYZE")
+
+def _migration_008_resumo_diario(cursor):
+    # EST_RESUMO_DIARIO - Totais por usuário, projeto, matéria e dia (mantida por daily_rollup)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS EST_RESUMO_DIARIO (
+        COD_USUARIO INTEGER NOT NULL DEFAULT 0, -- Dono do projeto
+        COD_PROJETO INTEGER NOT NULL,
+        COD_MATERIA INTEGER NOT NULL DEFAULT 0, -- 0: matéria desconhecida
+        DATA TEXT NOT NULL,                     -- YYYY-MM-DD
+        HL_PREVISTA REAL DEFAULT 0,
+        HL_REALIZADA REAL DEFAULT 0,
+        QTDE_PROGRAMADA INTEGER DEFAULT 0,      -- Linhas de EST_PROGRAMACAO
+        QTDE_ESTUDOS INTEGER DEFAULT 0,         -- Linhas de EST_ESTUDOS
+        QUESTOES INTEGER DEFAULT 0,
+        CERTAS INTEGER DEFAULT 0,
+        ERRADAS INTEGER DEFAULT 0,
+        PRIMARY KEY (COD_PROJETO, DATA, COD_MATERIA)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS IDX_RESUMO_USUARIO_DATA ON EST_RESUMO_DIARIO (COD_USUARIO, DATA)")
+    # Imported here: daily_rollup only holds SQL over a cursor, but db_manager must load first
+    from daily_rollup import rebuild_daily_rollup
+    rebuild_daily_rollup(cursor)
+
+def _migration_009_backfill_materia(cursor):
+    # Rows saved before COD_MATERIA existed: subject from the cycle item only. Matching
+    # DESC_AULA is a guess and stays behind "python db_manager.py backfill"
+    from subject_resolver import backfill_subjects
+    from daily_rollup import rebuild_daily_rollup
+    if any(r.from_cycle for r in backfill_subjects(cursor)):
+        rebuild_daily_rollup(cursor)
+
+def _migration_010_programacao_editado(cursor):
+    # 'S' on schedule rows adjusted by hand in Planejamento; re-planning leaves their days alone
+    _add_column_if_missing(cursor, 'EST_PROGRAMACAO', 'EDITADO', "TEXT DEFAULT 'N'")
+
+MIGRATIONS = [
+    (1, "Tabelas base", _migration_001_base_tables),
+    (2, "COD_USUARIO nas tabelas de dados", _migration_002_cod_usuario),
+    (3, "COD_MATERIA em EST_PROGRAMACAO e EST_ESTUDOS", _migration_003_cod_materia),
+    (4, "ORDEM e OBSERVACOES em EST_CONTEUDO_CICLO", _migration_004_conteudo_ciclo),
+    (5, "TIPO nulo em EST_ESTUDOS vira estudo do ciclo", _migration_005_estudos_tipo),
+    (6, "Tabela EST_CURSOR_CICLO", _migration_006_cursor_ciclo),
+    (7, "Índices de projeto/data/status", _migration_007_indexes),
+    (8, "Tabela EST_RESUMO_DIARIO (totais por dia)", _migration_008_resumo_diario),
+    (9, "COD_MATERIA de registros antigos pelo item do ciclo", _migration_009_backfill_materia),
+    (10, "EDITADO em EST_PROGRAMACAO (ajuste manual)", _migration_010_programacao_editado),
+]
+
+# Version of the schema once every step has run
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _applied_versions(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        applied_at TEXT
+    )
+    """)
+    return {row[0] for row in cursor.execute("SELECT version FROM schema_version").fetchall()}
+
+def migration_status():
+    """List of (version, description, applied_at or None) for every known step."""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        _applied_versions(cursor)
+        conn.commit()
+        applied = {row[0]: row[1] for row in cursor.execute("SELECT version, applied_at FROM schema_version").fetchall()}
+    finally:
+        conn.close()
+    return [(version, description, applied.get(version)) for version, description, _ in MIGRATIONS]
+
+def apply_migrations(target=None, conn=None):
+    """
+    Applies the pending steps (up to target, or all of them) in order.
+    Each step and its schema_version row are committed together; on failure the step is
+    rolled back and MigrationError is raised. Returns the versions applied by this call.
+    conn: connection to migrate (optional; without it the configured database is used
+    and the connection is returned to the pool at the end).
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_connection()
+    applied_now = []
+    try:
+        cursor = conn.cursor()
+        done = _applied_versions(cursor)
+        conn.commit()
+
+        for version, description, step in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
             try:
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN COD_MATERIA INTEGER")
-                print(f"Added COD_MATERIA to {table}")
+                # Explicit BEGIN: sqlite3 would otherwise autocommit the DDL statements
+                cursor.execute("BEGIN")
+                step(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, applied_at) VALUES (?, datetime('now'))",
+                    (version,)
+                )
+                conn.commit()
             except Exception as e:
-                print(f"Note: Could not add COD_MATERIA to {table}: {e}")
+                conn.rollback()
+                raise MigrationError(f"Migração {version} ({description}) falhou: {e}") from e
+            finally:
+                # Even a failed step may have been partly applied by a non-transactional backend
+                invalidate_table_columns()
+            applied_now.append(version)
+            print(f"Migração {version} aplicada: {description}")
+    finally:
+        if owns_conn:
+            conn.close()
+    return applied_now
+
+# Hot queries (as issued by the pages and the generator) and the index each one must use.
+# (name, table, index expected in the plan, sql); every ? is bound to 1.
+HOT_QUERIES = [
+    ("Home: totais do projeto", 'EST_RESUMO_DIARIO', 'sqlite_autoindex_EST_RESUMO_DIARIO_1',
+     "SELECT SUM(HL_REALIZADA), SUM(HL_PREVISTA) FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ?"),
+    ("Home: horas da semana", 'EST_RESUMO_DIARIO', 'sqlite_autoindex_EST_RESUMO_DIARIO_1',
+     "SELECT DATA, SUM(HL_PREVISTA), SUM(HL_REALIZADA) FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ? AND DATA BETWEEN ? AND ? GROUP BY DATA"),
+    ("Home: horas por disciplina", 'EST_RESUMO_DIARIO', 'sqlite_autoindex_EST_RESUMO_DIARIO_1',
+     "SELECT COD_MATERIA, SUM(HL_REALIZADA) FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ? AND QTDE_ESTUDOS > 0 GROUP BY COD_MATERIA"),
+    ("Home: dias seguidos", 'EST_RESUMO_DIARIO', 'sqlite_autoindex_EST_RESUMO_DIARIO_1',
+     "SELECT DISTINCT DATA FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ? AND QTDE_ESTUDOS > 0"),
+    ("Home: programação do dia", 'EST_PROGRAMACAO', 'IDX_PROGRAMACAO_PROJETO_DATA',
+     "SELECT * FROM EST_PROGRAMACAO WHERE DATA = ? AND COD_PROJETO = ?"),
+    ("Resumo diário: estudos dos dias alterados", 'EST_ESTUDOS', 'IDX_ESTUDOS_PROJETO_DATA',
+     "SELECT * FROM EST_ESTUDOS WHERE COD_PROJETO = ? AND DATA >= ? AND DATA < ?"),
+    ("Resumo diário: programação dos dias alterados", 'EST_PROGRAMACAO', 'IDX_PROGRAMACAO_PROJETO_DATA',
+     "SELECT * FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA >= ? AND DATA < ?"),
+    ("Home: progresso do conteúdo", 'EST_CONTEUDO_CICLO', 'IDX_CONTEUDO_ITEM_FINALIZADO_ORDEM',
+     "SELECT COUNT(*) FROM EST_CONTEUDO_CICLO WHERE COD_CICLO_ITEM = ? AND FINALIZADO = ?"),
+    ("Estudar: tarefas pendentes", 'EST_PROGRAMACAO', 'IDX_PROGRAMACAO_PROJETO_STATUS_DATA',
+     "SELECT * FROM EST_PROGRAMACAO WHERE DATA <= ? AND STATUS = 'PENDENTE' AND COD_PROJETO = ? ORDER BY DATA"),
+    ("Estudar: próximo conteúdo", 'EST_CONTEUDO_CICLO', 'IDX_CONTEUDO_ITEM_FINALIZADO_ORDEM',
+     "SELECT DESCRICAO FROM EST_CONTEUDO_CICLO WHERE COD_CICLO_ITEM = ? AND (FINALIZADO IS NULL OR FINALIZADO != 'S') ORDER BY ORDEM"),
+    # +COD_USUARIO keeps the user index out: the project/status index narrows to the pending rows
+    ("Planejamento: excluir pendentes", 'EST_PROGRAMACAO', 'IDX_PROGRAMACAO_PROJETO_STATUS_DATA',
+     "DELETE FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND +COD_USUARIO = ? AND STATUS = 'PENDENTE'"),
+    ("Gerador: linha do tempo", 'EST_PROGRAMACAO', 'IDX_PROGRAMACAO_PROJETO_DATA',
+     "SELECT DATA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND TIPO > 0 AND DATA < ?"),
+    ("Gerador: dias já programados", 'EST_PROGRAMACAO', 'IDX_PROGRAMACAO_PROJETO_DATA',
+     "SELECT DISTINCT DATA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA BETWEEN ? AND ?"),
+    ("Gerador: grade semanal", 'EST_GRADE_ITEM', 'IDX_GRADE_ITEM_GRADE',
+     "SELECT * FROM EST_GRADE_ITEM WHERE COD_GRADE = ? ORDER BY DIA_SEMANA"),
+]
+
+def check_query_plans():
+    """
+    Runs EXPLAIN QUERY PLAN on HOT_QUERIES.
+    Returns a list of (name, uses_index, plan_details); uses_index is False when the
+    query does not search its table through the expected index (a scan or another index).
+    """
+    conn = get_connection()
+    results = []
+    try:
+        cursor = conn.cursor()
+        for name, table, index, sql in HOT_QUERIES:
+            params = (1,) * sql.count('?')
+            details = [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+            expected = re.compile(rf"^SEARCH {table} USING (COVERING )?INDEX {index}\b")
+            results.append((name, any(expected.match(d) for d in details), details))
+    finally:
+        conn.close()
+    return results
+
+def _ensure_default_admin():
+    conn = get_connection()
+    cursor = conn.cursor()
 
-    conn.commit()
-    
     # Create default admin user if no users exist
     cursor.execute("SELECT COUNT(*) FROM EST_USUARIO")
     user_count = cursor.fetchone()[0]
@@ -416,7 +1204,7 @@ def init_db():
         admin_id = cursor.lastrowid
         
         # Associate existing data with admin user
-        for table in tables_to_migrate:
+        for table in USER_OWNED_TABLES:
             try:
                 cursor.execute(f"UPDATE {table} SET COD_USUARIO = ? WHERE COD_USUARIO IS NULL", (admin_id,))
                 print(f"Associated existing {table} records with admin user")
@@ -428,9 +1216,87 @@ def init_db():
         print(f"   Email: admin@estudos.com")
         print(f"   Senha: admin123")
         print(f"   IMPORTANTE: Altere a senha após o primeiro login!")
-    
+
     conn.close()
 
+def init_db():
+    """Brings the database to SCHEMA_VERSION and creates the default admin on an empty one."""
+    applied = apply_migrations()
+    _ensure_default_admin()
+    return applied
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrações do banco do Sistema de Estudos")
+    commands = parser.add_subparsers(dest='command')
+    migrate = commands.add_parser('migrate', help="Aplica as migrações pendentes (padrão)")
+    migrate.add_argument('--to', type=int, help="Aplica apenas até esta versão")
+    commands.add_parser('status', help="Lista as migrações aplicadas e pendentes")
+    commands.add_parser('explain', help="Confere com EXPLAIN QUERY PLAN se as consultas principais usam índices")
+    commands.add_parser('rollup', help="Recria a tabela EST_RESUMO_DIARIO a partir de EST_ESTUDOS e EST_PROGRAMACAO")
+    backfill = commands.add_parser('backfill', help="Preenche COD_MATERIA dos registros antigos pela descrição e recria o resumo diário")
+    backfill.add_argument('--dry-run', action='store_true', help="Só lista as alterações propostas, sem gravar")
+    args = parser.parse_args(argv)
+
+    if args.command == 'backfill':
+        from subject_resolver import backfill_subjects
+        from daily_rollup import rebuild_daily_rollup
+        apply_migrations()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            results = backfill_subjects(cursor, from_description=True)
+            if args.dry_run:
+                conn.rollback()
+            else:
+                rebuild_daily_rollup(cursor)
+                conn.commit()
+        finally:
+            conn.close()
+        for r in results:
+            if args.dry_run:
+                for m in r.matches:
+                    print(f"{r.table} {m.codigo}: {m.description!r} -> {m.materia} ({m.cod_materia})")
+            print(f"{r.table}: {r.from_cycle} pelo ciclo, {r.from_description} pela descrição, {r.unresolved} sem matéria.")
+        if args.dry_run:
+            print("Simulação (--dry-run): nada foi gravado.")
+        return
+
+    if args.command == 'rollup':
+        from daily_rollup import rebuild_daily_rollup
+        apply_migrations()
+        conn = get_connection()
+        try:
+            rows = rebuild_daily_rollup(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"EST_RESUMO_DIARIO recriada: {rows} linha(s).")
+        return
+
+    if args.command == 'explain':
+        results = check_query_plans()
+        expected = {name: index for name, _, index, _ in HOT_QUERIES}
+        for name, uses_index, details in results:
+            status = 'OK  ' if uses_index else f"ERRO (esperado {expected[name]})"
+            print(f"{status}  {name}: {' | '.join(details)}")
+        if not all(uses_index for _, uses_index, _ in results):
+            raise SystemExit(1)
+        return
+
+    if args.command == 'status':
+        for version, description, applied_at in migration_status():
+            state = f"aplicada em {applied_at}" if applied_at else "pendente"
+            print(f"{version:>4}  {description:<50} {state}")
+        return
+
+    target = getattr(args, 'to', None)
+    if target is None:
+        applied = init_db()
+    else:
+        applied = apply_migrations(target)
+    print(f"Database initialized. {len(applied)} migração(ões) aplicada(s).")
+
 if __name__ == "__main__":
-    init_db()
-    print("Database initialized.")
+    main()
@@ -5,6 +5,7 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from db_manager import get_connection
 from auth import require_auth
+import query_stats
 
 # Configuração da Página
 st.set_page_config(page_title="Dashboard Administrativo", page_icon="📊", layout="wide")
@@ -36,12 +37,11 @@ def get_kpis():
         """
         active_users = pd.read_sql(query_active, conn)['count'][0]
         
-        # Total de Horas Estudadas
-        total_hours = pd.read_sql("SELECT SUM(HL_REALIZADA) as total FROM EST_ESTUDOS", conn)['total'][0]
+        # Total de Horas Estudadas e de Registros de Estudo (resumo diário)
+        totals = pd.read_sql("SELECT SUM(HL_REALIZADA) as total, SUM(QTDE_ESTUDOS) as count FROM EST_RESUMO_DIARIO", conn)
+        total_hours = totals['total'][0]
         if pd.isna(total_hours): total_hours = 0
-        
-        # Total de Registros de Estudo
-        total_records = pd.read_sql("SELECT COUNT(*) as count FROM EST_ESTUDOS", conn)['count'][0]
+        total_records = int(totals['count'][0]) if pd.notna(totals['count'][0]) else 0
         
         return total_users, active_users, total_hours, total_records
     finally:
@@ -61,9 +61,9 @@ def get_evolution_data():
         
         # Estudos por Dia (Últimos 30 dias)
         query_studies = """
-        SELECT DATA as dia, COUNT(*) as estudos
-        FROM EST_ESTUDOS 
-        WHERE date(DATA) >= date('now', '-30 days')
+        SELECT DATA as dia, SUM(QTDE_ESTUDOS) as estudos
+        FROM EST_RESUMO_DIARIO 
+        WHERE DATA >= date('now', '-30 days') AND QTDE_ESTUDOS > 0
         GROUP BY 1
         ORDER BY 1
         """
@@ -77,9 +77,10 @@ def get_top_subjects():
     conn = get_connection()
     try:
         query = """
-        SELECT m.NOME as Materia, SUM(e.HL_REALIZADA) as Horas
-        FROM EST_ESTUDOS e
-        JOIN EST_MATERIA m ON e.COD_MATERIA = m.CODIGO
+        SELECT m.NOME as Materia, SUM(r.HL_REALIZADA) as Horas
+        FROM EST_RESUMO_DIARIO r
+        JOIN EST_MATERIA m ON r.COD_MATERIA = m.CODIGO
+        WHERE r.QTDE_ESTUDOS > 0
         GROUP BY m.NOME
         ORDER BY Horas DESC
         LIMIT 10
@@ -97,9 +98,14 @@ def get_user_health():
             u.NOME, 
             u.EMAIL, 
             u.ULTIMO_ACESSO,
-            (SELECT COUNT(*) FROM EST_ESTUDOS e WHERE e.COD_USUARIO = u.CODIGO) as Qtd_Estudos,
-            (SELECT SUM(HL_REALIZADA) FROM EST_ESTUDOS e WHERE e.COD_USUARIO = u.CODIGO) as Total_Horas
+            COALESCE(r.Qtd_Estudos, 0) as Qtd_Estudos,
+            r.Total_Horas
         FROM EST_USUARIO u
+        LEFT JOIN (
+            SELECT COD_USUARIO, SUM(QTDE_ESTUDOS) as Qtd_Estudos, SUM(HL_REALIZADA) as Total_Horas
+            FROM EST_RESUMO_DIARIO
+            GROUP BY COD_USUARIO
+        ) r ON r.COD_USUARIO = u.CODIGO
         ORDER BY u.ULTIMO_ACESSO DESC
         """
         df = pd.read_sql(query, conn)
@@ -150,10 +156,10 @@ def get_project_stats():
         query_top_proj = """
         SELECT 
             p.NOME || ' (' || u.NOME || ')' as Projeto,
-            SUM(e.HL_REALIZADA) as Horas
+            SUM(r.HL_REALIZADA) as Horas
         FROM EST_PROJETO p
         JOIN EST_USUARIO u ON p.COD_USUARIO = u.CODIGO
-        JOIN EST_ESTUDOS e ON e.COD_PROJETO = p.CODIGO
+        JOIN EST_RESUMO_DIARIO r ON r.COD_PROJETO = p.CODIGO AND r.QTDE_ESTUDOS > 0
         GROUP BY 1
         ORDER BY Horas DESC
         LIMIT 5
@@ -176,7 +182,7 @@ def get_project_stats():
 
 # --- Renderização ---
 
-tab_overview, tab_projects = st.tabs(["📊 Visão Geral", "🚀 Projetos"])
+tab_overview, tab_projects, tab_queries = st.tabs(["📊 Visão Geral", "🚀 Projetos", "🐢 Consultas SQL"])
 
 with tab_overview:
     # 1. Big Numbers
@@ -267,6 +273,45 @@ with tab_projects:
         else:
             st.info("Nenhum dado de horário por projeto.")
 
+with tab_queries:
+    st.subheader("🐢 Consultas SQL")
+
+    if not query_stats.is_enabled():
+        st.info("Coleta desligada. Adicione `QUERY_STATS = true` no secrets.toml (opcional: `SLOW_QUERY_MS`, `SLOW_QUERY_LOG`) e reinicie o app.")
+    else:
+        st.caption("Totais desde o início do processo (ou do último reset). Consultas lentas também vão para o log de consultas lentas.")
+
+        st.write("📄 **Por página:**")
+        df_pages = pd.DataFrame(query_stats.page_summary())
+        if not df_pages.empty:
+            st.dataframe(df_pages, hide_index=True, use_container_width=True, column_config={
+                "pagina": "Página",
+                "reruns": "Reruns",
+                "consultas": "Consultas",
+                "total_ms": st.column_config.NumberColumn("Tempo Total", format="%.1f ms"),
+                "consultas_por_rerun": st.column_config.NumberColumn("Consultas/Rerun", format="%.1f"),
+                "ms_por_rerun": st.column_config.NumberColumn("Tempo/Rerun", format="%.1f ms"),
+            })
+
+        st.write("⏱️ **Consultas com maior tempo total:**")
+        df_queries = pd.DataFrame(query_stats.top_queries(limit=30))
+        if not df_queries.empty:
+            st.dataframe(df_queries, hide_index=True, use_container_width=True, column_config={
+                "pagina": "Página",
+                "sql": st.column_config.TextColumn("SQL", width="large"),
+                "execucoes": "Execuções",
+                "total_ms": st.column_config.NumberColumn("Total", format="%.1f ms"),
+                "media_ms": st.column_config.NumberColumn("Média", format="%.2f ms"),
+                "max_ms": st.column_config.NumberColumn("Máx.", format="%.1f ms"),
+                "linhas": "Linhas",
+            })
+        else:
+            st.info("Nenhuma consulta registrada ainda.")
+
+        if st.button("🔄 Zerar Estatísticas"):
+            query_stats.reset()
+            st.rerun()
+
 # 5. Métricas de Autenticação (Novo pedido)
 st.divider()
 st.subheader("🔐 Métodos de Autenticação")
@@ -1,6 +1,5 @@
 import streamlit as st
-import pandas as pd
-from db_manager import get_connection
+from user_settings import get_user_settings, save_revision_settings
 from auth import require_auth, get_current_user
 import time
 
@@ -11,30 +10,8 @@ user_id = current_user['CODIGO']
 
 st.title("⚙️ Configurações")
 
-# Function to get or create config
-def get_user_config(u_id):
-    conn = get_connection()
-    try:
-        # Check if config exists
-        df = pd.read_sql_query("SELECT * FROM EST_CONFIGURACAO WHERE COD_USUARIO = ?", conn, params=(u_id,))
-        
-        if df.empty:
-            # Create default config
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO EST_CONFIGURACAO (COD_USUARIO, TEMA_APP, TEMA_WEB, REV_24H, REV_7D, REV_30D)
-                VALUES (?, 'light', 'light', 0.25, 1.0, 2.0)
-            """, (u_id,))
-            conn.commit()
-            # Fetch again
-            df = pd.read_sql_query("SELECT * FROM EST_CONFIGURACAO WHERE COD_USUARIO = ?", conn, params=(u_id,))
-        
-        return df.iloc[0]
-    finally:
-        conn.close()
-
-# Load Config
-config = get_user_config(user_id)
+# Load Config (cached per user; invalidated when the form below is saved)
+config = get_user_settings(user_id)
 
 with st.form("config_form"):
     st.subheader("⏱️ Tempo das Revisões")
@@ -49,19 +26,10 @@ with st.form("config_form"):
     st.divider()
     
     if st.form_submit_button("💾 Salvar Configurações", type="primary"):
-        conn = get_connection()
         try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE EST_CONFIGURACAO 
-                SET REV_24H = ?, REV_7D = ?, REV_30D = ?
-                WHERE COD_USUARIO = ?
-            """, (rev_24h, rev_7d, rev_30d, user_id))
-            conn.commit()
+            save_revision_settings(user_id, rev_24h, rev_7d, rev_30d)
             st.toast("✅ Configurações salvas com sucesso!", icon="✅")
             time.sleep(1)
             st.rerun()
         except Exception as e:
             st.error(f"Erro ao salvar: {e}")
-        finally:
-            conn.close()
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 from db_manager import get_connection
-from study_engine import generate_schedule
+from study_engine import generate_schedule, load_study_timeline, rebuild_cycle_cursor
+from daily_rollup import refresh_daily_rollup
+from dashboard_service import bump_data_version
 from datetime import date
 from auth import get_current_user
 import time
@@ -24,11 +26,16 @@ def confirm_clear_pending(proj_id, u_id):
         try:
             cursor = conn.cursor()
             cursor.execute(
-                "DELETE FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND COD_USUARIO = ? AND STATUS = 'PENDENTE'",
+                # +COD_USUARIO: searched by the project/status index, not the user one
+                "DELETE FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND +COD_USUARIO = ? AND STATUS = 'PENDENTE'",
                 (proj_id, u_id)
             )
             rows = cursor.rowcount
+            # Resume the cycle from what is left, not from the deleted rows
+            rebuild_cycle_cursor(cursor, proj_id)
+            refresh_daily_rollup(cursor, proj_id)
             conn.commit()
+            bump_data_version(int(proj_id))
             st.toast(f"✅ {rows} agendamentos apagados!", icon="🗑️")
             time.sleep(1)
             st.rerun()
@@ -40,6 +47,23 @@ def confirm_clear_pending(proj_id, u_id):
     if col_cancel.button("Cancelar"):
         st.rerun()
 
+def generate_with_progress(pid, base_dt, days, dry_run=False, expected=None):
+    """Runs generate_schedule showing the day-by-day progress in a st.progress bar."""
+    label = "Simulando cronograma" if dry_run else "Gerando cronograma"
+    progress_bar = st.progress(0.0, text=f"{label}...")
+
+    def on_progress(done, total):
+        # Weekly steps are enough for the bar and keep long horizons cheap
+        if done == total or done % 7 == 0:
+            progress_bar.progress(done / total, text=f"{label}: {done}/{total} dias")
+
+    try:
+        return generate_schedule(pid, base_dt, days, dry_run=dry_run, progress=on_progress, expected=expected)
+    finally:
+        progress_bar.empty()
+        if not dry_run:
+            bump_data_version(int(pid))
+
 st.title("📅 Planejamento")
 with st.sidebar:
     st.header("Configuração")
@@ -50,7 +74,7 @@ with st.sidebar:
     if project_id:
         conn = get_connection()
         proj = pd.read_sql_query(
-            "SELECT NOME FROM EST_PROJETO WHERE CODIGO = ? AND COD_USUARIO = ?", 
+            "SELECT NOME, DATA_FINAL FROM EST_PROJETO WHERE CODIGO = ? AND COD_USUARIO = ?", 
             conn, params=(int(project_id), user_id)
         )
         conn.close()
@@ -61,21 +85,53 @@ with st.sidebar:
         st.divider()
         st.markdown("### ⚙️ Gerar Programação")
         
+        # Project end date (enables "until the end of the project")
+        project_end = None
+        if not proj.empty and proj.iloc[0]['DATA_FINAL']:
+            try:
+                project_end = pd.to_datetime(proj.iloc[0]['DATA_FINAL']).date()
+            except:
+                project_end = None
+
         c_date, c_days = st.columns(2)
         base_date = c_date.date_input("Dt. Base", value=date.today(), format="DD/MM/YYYY")
-        days_period = c_days.number_input("Período (dias)", min_value=1, max_value=90, value=7, step=1, help="Máximo de 90 dias por vez para garantir performance.")
-        
-        if st.button("🚀 Gerar Programação", use_container_width=True):
-            with st.spinner(f"Gerando cronograma para {days_period} dias..."):
-                # Ensure project_id is int
-                pid = int(project_id)
-                msg = generate_schedule(pid, base_date, int(days_period))
-                if "Sucesso" in msg:
-                    st.toast("✅ " + msg, icon="✅")
-                    time.sleep(1)
-                    st.rerun()
-                else:
-                    st.error(msg)
+        until_end = st.checkbox(
+            "Até o fim do projeto", value=False, disabled=project_end is None,
+            help="Gera do dia base até a Data Final do projeto."
+        )
+        if until_end and project_end:
+            days_period = (project_end - base_date).days + 1
+            c_days.number_input("Período (dias)", value=max(days_period, 1), disabled=True)
+            if days_period < 1:
+                st.warning(f"A Data Final do projeto ({project_end.strftime('%d/%m/%Y')}) é anterior à Dt. Base.")
+        else:
+            days_period = c_days.number_input("Período (dias)", min_value=1, value=7, step=1, help="Ex.: 365 para planejar o ano todo de uma vez.")
+
+        can_generate = days_period >= 1
+
+        if st.button("🔍 Pré-visualizar", use_container_width=True, disabled=not can_generate, help="Simula a programação sem gravar. Nada é salvo até você confirmar."):
+            preview = generate_with_progress(int(project_id), base_date, int(days_period), dry_run=True)
+            if isinstance(preview, str):
+                st.error(preview)
+            else:
+                st.session_state['schedule_preview'] = {
+                    'project_id': int(project_id),
+                    'base_date': base_date,
+                    'days': int(days_period),
+                    'df': preview,
+                }
+
+        if st.button("🚀 Gerar Programação", use_container_width=True, disabled=not can_generate):
+            # Ensure project_id is int
+            pid = int(project_id)
+            msg = generate_with_progress(pid, base_date, int(days_period))
+            if "Sucesso" in msg:
+                st.session_state.pop('schedule_preview', None)
+                st.toast("✅ " + msg, icon="✅")
+                time.sleep(1)
+                st.rerun()
+            else:
+                st.error(msg)
                     
         st.markdown("") # Spacer
         if st.button("🗑️ Excluir Pendentes", use_container_width=True, type="secondary", help="Apaga todos os agendamentos PENDENTES deste projeto."):
@@ -83,6 +139,53 @@ with st.sidebar:
     else:
         st.warning("⚠️ Selecione um projeto na página inicial.")
 
+# --- What-if Preview (nothing written until "Confirmar") ---
+preview = st.session_state.get('schedule_preview')
+if project_id and preview and preview['project_id'] == int(project_id):
+    st.subheader("🔍 Pré-visualização")
+    preview_df = preview['df']
+    st.caption(
+        f"Simulação de {preview['days']} dias a partir de {preview['base_date'].strftime('%d/%m/%Y')} "
+        f"- {len(preview_df)} agendamentos, {preview_df['HL_PREVISTA'].sum():.2f} h previstas. Nada foi gravado."
+    )
+
+    if preview_df.empty:
+        st.info("Nenhum agendamento seria criado neste período (dias já programados ou sem horários na grade).")
+    else:
+        display_df = preview_df[['DATA', 'DIA', 'HR_INICIAL_PREVISTA', 'HL_PREVISTA', 'DESC_AULA', 'MATERIA']].copy()
+        display_df['DATA'] = pd.to_datetime(display_df['DATA'])
+        st.dataframe(
+            display_df,
+            column_config={
+                "DATA": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+                "DIA": "Dia",
+                "HR_INICIAL_PREVISTA": "Início",
+                "HL_PREVISTA": st.column_config.NumberColumn("Previsto (h)", format="%.2f"),
+                "DESC_AULA": "Descrição",
+                "MATERIA": "Matéria",
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+
+    c_confirm, c_discard = st.columns(2)
+    if c_confirm.button("✅ Confirmar", type="primary", use_container_width=True, disabled=preview_df.empty):
+        # Re-runs the generation and saves it only if it plans exactly the rows shown above
+        msg = generate_with_progress(preview['project_id'], preview['base_date'], preview['days'], expected=preview_df)
+        st.session_state.pop('schedule_preview', None)
+        if "Sucesso" in msg:
+            st.toast("✅ " + msg, icon="✅")
+            time.sleep(1)
+            st.rerun()
+        else:
+            st.error(msg)
+
+    if c_discard.button("❌ Descartar", use_container_width=True):
+        st.session_state.pop('schedule_preview', None)
+        st.rerun()
+
+    st.divider()
+
 # --- Calendar / List View ---
 if project_id:
     st.subheader("Cronograma")
@@ -118,21 +221,10 @@ if project_id:
         days_map = {0: 'Segunda', 1: 'Terça', 2: 'Quarta', 3: 'Quinta', 4: 'Sexta', 5: 'Sábado', 6: 'Domingo'}
         
         # --- Calculate Study Day Indices (Virtual Timeline) ---
-        # Get all historical and planned dates with activity (TIPO > 0)
+        # Same timeline the generator uses: all historical and planned dates with activity (TIPO > 0)
         conn_timeline = get_connection()
-        hist_dates = [row['DATA'] for row in conn_timeline.execute(
-            "SELECT DISTINCT DATA FROM EST_ESTUDOS WHERE COD_PROJETO = ? AND TIPO > 0 ORDER BY DATA", 
-            (int(project_id),)
-        ).fetchall()]
-        plan_dates = [row['DATA'] for row in conn_timeline.execute(
-            "SELECT DISTINCT DATA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND TIPO > 0 ORDER BY DATA", 
-            (int(project_id),)
-        ).fetchall()]
+        timeline = load_study_timeline(conn_timeline.cursor(), int(project_id))
         conn_timeline.close()
-        
-        all_study_dates = sorted(list(set(hist_dates + plan_dates)))
-        # Create map: Date String -> Day Number (1-based)
-        study_day_map = {d: i+1 for i, d in enumerate(all_study_dates)}
         # ----------------------------------------------------
         
         for d in dates:
@@ -140,9 +232,9 @@ if project_id:
                 dt_obj = pd.to_datetime(d)
                 weekday = days_map[dt_obj.weekday()]
                 
-                # Get Study Day Number
-                day_num = study_day_map.get(d, "?")
-                day_label = f" - Dia {day_num}" if day_num != "?" else ""
+                # Get Study Day Number (1-based)
+                day_idx = timeline.index_of(d)
+                day_label = f" - Dia {day_idx + 1}" if day_idx != -1 else ""
                 
                 formatted_date = f"{dt_obj.strftime('%d/%m/%Y')} - {weekday}{day_label}"
             except:
@@ -187,8 +279,10 @@ if project_id:
                         conn = get_connection()
                         cursor = conn.cursor()
                         cursor.execute("DELETE FROM EST_PROGRAMACAO WHERE CODIGO = ?", (row['CODIGO'],))
+                        refresh_daily_rollup(cursor, int(project_id), [row['DATA']])
                         conn.commit()
                         conn.close()
+                        bump_data_version(int(project_id))
                         st.toast("🗑️ Agendamento excluído!", icon="🗑️")
                         st.rerun()
 
@@ -222,11 +316,13 @@ if project_id:
                         cursor = conn.cursor()
                         cursor.execute("""
                             UPDATE EST_PROGRAMACAO 
-                            SET DESC_AULA=?, HL_PREVISTA=?, STATUS=?, DATA=?
+                            SET DESC_AULA=?, HL_PREVISTA=?, STATUS=?, DATA=?, EDITADO='S'
                             WHERE CODIGO=?
                         """, (new_desc, new_hl, new_status, new_date.isoformat(), st.session_state['edit_prog_id']))
+                        refresh_daily_rollup(cursor, int(item['COD_PROJETO']), [item['DATA'], new_date])
                         conn.commit()
                         conn.close()
+                        bump_data_version(int(item['COD_PROJETO']))
                         st.session_state['edit_prog_id'] = None
                         st.toast("✅ Programação atualizada!", icon="✅")
                         st.rerun()
@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 from db_manager import get_connection
+from daily_rollup import refresh_daily_rollup
+from dashboard_service import bump_data_version
+from schedule_kernel import TIPO_ESTUDO_CICLO
 from datetime import date, datetime
 import time
 from auth import get_current_user
@@ -110,11 +113,14 @@ def render_timer(task_name, task_id=None, is_extra=False, custom_desc=None, cont
         cod_ciclo_save = None
         cod_ciclo_item_save = None
         cod_materia_save = None
+        tipo_save = TIPO_ESTUDO_CICLO # Sessions without a task count as cycle studies
         
         if task_id and not is_extra:
             # Fetch from Programacao
-            prog_info = cursor.execute("SELECT COD_MATERIA, COD_CICLO, COD_CICLO_ITEM FROM EST_PROGRAMACAO WHERE CODIGO = ?", (task_id,)).fetchone()
+            prog_info = cursor.execute("SELECT COD_MATERIA, COD_CICLO, COD_CICLO_ITEM, TIPO FROM EST_PROGRAMACAO WHERE CODIGO = ?", (task_id,)).fetchone()
             if prog_info:
+                if prog_info['TIPO']:
+                    tipo_save = prog_info['TIPO'] # 24h/7d/30d revisions keep their type
                 if prog_info['COD_MATERIA']:
                     cod_materia_save = prog_info['COD_MATERIA']
                 if prog_info['COD_CICLO']:
@@ -152,15 +158,16 @@ def render_timer(task_name, task_id=None, is_extra=False, custom_desc=None, cont
         cursor.execute("""
             INSERT INTO EST_ESTUDOS (
                 COD_PROJETO, COD_USUARIO, COD_CICLO, COD_CICLO_ITEM, 
-                DATA, HL_REALIZADA, DESC_AULA, COD_MATERIA, 
+                DATA, HL_REALIZADA, DESC_AULA, COD_MATERIA, TIPO,
                 HR_INICIAL_EFETIVA, HR_FINAL_EFETIVA
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             project_id, user_id, cod_ciclo_save, cod_ciclo_item_save,
-            end_dt.isoformat(), final_hours, final_desc, cod_materia_save,
+            end_dt.date().isoformat(), final_hours, final_desc, cod_materia_save, tipo_save,
             start_dt_iso, end_dt.isoformat()
         ))
+        refresh_daily_rollup(cursor, project_id, [end_dt.date()])
         
         if not is_extra:
             tid_to_update = st.session_state.get('current_task_id', task_id)
@@ -170,6 +177,7 @@ def render_timer(task_name, task_id=None, is_extra=False, custom_desc=None, cont
             
         conn.commit()
         conn.close()
+        bump_data_version(project_id)
         
         # Reset State
         st.session_state['timer_active'] = False
@@ -368,11 +376,13 @@ if st.session_state['mode_hist'] == 'NEW':
             cod_mat_new = mat_row['CODIGO'] if mat_row else None
 
             cursor.execute("""
-                INSERT INTO EST_ESTUDOS (COD_PROJETO, COD_USUARIO, DATA, HL_REALIZADA, DESC_AULA, COD_MATERIA)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (project_id, user_id, new_date.isoformat(), new_hl, new_desc, cod_mat_new))
+                INSERT INTO EST_ESTUDOS (COD_PROJETO, COD_USUARIO, DATA, HL_REALIZADA, DESC_AULA, COD_MATERIA, TIPO)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (project_id, user_id, new_date.isoformat(), new_hl, new_desc, cod_mat_new, TIPO_ESTUDO_CICLO))
+            refresh_daily_rollup(cursor, project_id, [new_date])
             conn.commit()
             conn.close()
+            bump_data_version(project_id)
             st.session_state['mode_hist'] = 'LIST'
             st.toast("✅ Registro adicionado com sucesso!", icon="✅")
             st.rerun()
@@ -419,8 +429,10 @@ if not history.empty:
             conn = get_connection()
             cursor = conn.cursor()
             cursor.execute("DELETE FROM EST_ESTUDOS WHERE CODIGO = ?", (row['CODIGO'],))
+            refresh_daily_rollup(cursor, project_id, [row['DATA']])
             conn.commit()
             conn.close()
+            bump_data_version(project_id)
             st.toast("🗑️ Registro de histórico excluído!", icon="🗑️")
             st.rerun()
 
@@ -492,8 +504,11 @@ if not history.empty:
                         SET DESC_AULA=?, HL_REALIZADA=?, DATA=?, COD_MATERIA=?
                         WHERE CODIGO=?
                     """, (final_desc, new_hl, new_date.isoformat(), cod_mat_edit, st.session_state['edit_hist_id']))
+                    # Old and new day (the record may have moved)
+                    refresh_daily_rollup(cursor, project_id, [item['DATA'], new_date])
                     conn.commit()
                     conn.close()
+                    bump_data_version(project_id)
                     st.session_state['edit_hist_id'] = None
                     st.toast("✅ Histórico atualizado!", icon="✅")
                     st.rerun()
@@ -3,6 +3,8 @@ import pandas as pd
 from crud_helper import create_crud_interface
 from db_manager import get_connection
 from auth import get_current_user
+from replanner import replan_after_grade_change, replan_after_cycle_change
+from dashboard_service import bump_data_version
 from datetime import date, datetime
 import time
 
@@ -15,6 +17,39 @@ if not current_user:
     st.stop()
 user_id = current_user['CODIGO']
 
+def request_replan(replan, *args):
+    """
+    Simula o ajuste da programação pendente após editar a grade/ciclo. Se algum dia mudaria,
+    guarda o ajuste para o usuário confirmar (nada é gravado aqui).
+    """
+    try:
+        results = replan(*args, dry_run=True)
+    except Exception as e:
+        st.toast(f"⚠️ Não foi possível simular o ajuste da programação: {e}", icon="⚠️")
+        return
+    if any(r.days_changed for r in results):
+        st.session_state.setdefault('pending_replans', []).append({
+            'replan': replan,
+            'args': args,
+            'days': sum(r.days_changed for r in results),
+            'rows': sum(r.rows_updated + r.rows_deleted + r.rows_inserted for r in results),
+            'kept': sum(r.days_kept for r in results),
+        })
+
+def apply_pending_replans():
+    """Ajusta a programação pendente com os replanejamentos confirmados, reescrevendo só os dias afetados."""
+    days_changed = 0
+    for pending in st.session_state.pop('pending_replans', []):
+        try:
+            results = pending['replan'](*pending['args'])
+        except Exception as e:
+            st.toast(f"⚠️ Não foi possível ajustar a programação: {e}", icon="⚠️")
+            continue
+        days_changed += sum(r.days_changed for r in results)
+    bump_data_version()
+    if days_changed:
+        st.toast(f"🔄 Programação ajustada: {days_changed} dia(s) replanejado(s).", icon="🔄")
+
 # --- Dialog for Managing Contents (Moved to global scope for persistence) ---
 
 @st.dialog("Gerenciar Conteúdos")
@@ -52,6 +87,7 @@ def manage_contents(item_id, materia_name):
                     
                     cursor.execute("INSERT INTO EST_CONTEUDO_CICLO (COD_CICLO_ITEM, DESCRICAO, ORDEM) VALUES (?, ?, ?)", (item_id, c_new_desc, new_ord))
                     conn.commit()
+                    bump_data_version()
                     st.toast("✅ Tópico adicionado!", icon="✅")
                     # Small delay to ensure toast is seen if rerun is fast, though typically reruns are fine.
                     time.sleep(0.5) 
@@ -87,6 +123,7 @@ def manage_contents(item_id, materia_name):
                             
                         cursor.executemany("INSERT INTO EST_CONTEUDO_CICLO (COD_CICLO_ITEM, DESCRICAO, ORDEM) VALUES (?, ?, ?)", data_to_insert)
                         conn.commit()
+                        bump_data_version()
                         conn.close()
                         
                         st.toast(f"{len(lines)} tópicos importados com sucesso!", icon="✅")
@@ -117,6 +154,7 @@ def manage_contents(item_id, materia_name):
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM EST_CONTEUDO_CICLO WHERE COD_CICLO_ITEM = ?", (item_id,))
                 conn.commit()
+                bump_data_version()
                 st.session_state[confirm_key] = False
                 st.toast("🧹 Lista de conteúdos limpa com sucesso!", icon="🗑️")
                 st.rerun()
@@ -159,12 +197,14 @@ def manage_contents(item_id, materia_name):
                     cursor = conn.cursor()
                     cursor.execute("UPDATE EST_CONTEUDO_CICLO SET FINALIZADO = 'S' WHERE CODIGO = ?", (row['CODIGO'],))
                     conn.commit()
+                    bump_data_version()
                     st.rerun()
             else:
                 if is_checked: # State changed to False
                     cursor = conn.cursor()
                     cursor.execute("UPDATE EST_CONTEUDO_CICLO SET FINALIZADO = 'N' WHERE CODIGO = ?", (row['CODIGO'],))
                     conn.commit()
+                    bump_data_version()
                     st.rerun()
                     
             # Description
@@ -193,6 +233,7 @@ def manage_contents(item_id, materia_name):
                     cursor.execute("UPDATE EST_CONTEUDO_CICLO SET ORDEM = ? WHERE CODIGO = ?", (prev_ordem, row['CODIGO']))
                     cursor.execute("UPDATE EST_CONTEUDO_CICLO SET ORDEM = ? WHERE CODIGO = ?", (curr_ordem, prev_row['CODIGO']))
                     conn.commit()
+                    bump_data_version()
                     st.rerun()
             
             # Down Arrow (only if not last)
@@ -211,6 +252,7 @@ def manage_contents(item_id, materia_name):
                     cursor.execute("UPDATE EST_CONTEUDO_CICLO SET ORDEM = ? WHERE CODIGO = ?", (next_ordem, row['CODIGO']))
                     cursor.execute("UPDATE EST_CONTEUDO_CICLO SET ORDEM = ? WHERE CODIGO = ?", (curr_ordem, next_row['CODIGO']))
                     conn.commit()
+                    bump_data_version()
                     st.rerun()
             
             # Delete
@@ -218,6 +260,7 @@ def manage_contents(item_id, materia_name):
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM EST_CONTEUDO_CICLO WHERE CODIGO = ?", (row['CODIGO'],))
                 conn.commit()
+                bump_data_version()
                 st.toast("🗑️ Tópico excluído!", icon="🗑️")
                 st.rerun()
     else:
@@ -232,6 +275,27 @@ def manage_contents(item_id, materia_name):
 
 st.title("🗂️ Cadastros")
 
+# --- Re-planning waiting for confirmation (grade/cycle edits) ---
+pending_replans = st.session_state.get('pending_replans')
+if pending_replans:
+    days = sum(p['days'] for p in pending_replans)
+    rows = sum(p['rows'] for p in pending_replans)
+    kept = sum(p['kept'] for p in pending_replans)
+    with st.container(border=True):
+        msg = (f"🔄 A alteração afeta **{days} dia(s)** da programação pendente "
+               f"({rows} agendamento(s) seriam reescritos).")
+        if kept:
+            msg += f" {kept} dia(s) com ajustes manuais serão mantidos como estão."
+        st.warning(msg)
+        c_apply, c_keep = st.columns(2)
+        if c_apply.button("🔄 Replanejar", type="primary", use_container_width=True):
+            apply_pending_replans()
+            st.rerun()
+        if c_keep.button("Manter programação atual", use_container_width=True):
+            st.session_state.pop('pending_replans', None)
+            st.toast("Programação mantida. Use 'Excluir Pendentes' e gere novamente quando quiser.", icon="ℹ️")
+            st.rerun()
+
 # UX: Group Selector
 group = st.radio(
     "Contexto:",
@@ -316,7 +380,9 @@ if group == "📚 Base de Conhecimento":
                         cursor = conn.cursor()
                         cursor.execute("DELETE FROM EST_GRADE_ITEM WHERE CODIGO = ?", (row['CODIGO'],))
                         conn.commit()
+                        bump_data_version()
                         conn.close()
+                        request_replan(replan_after_grade_change, int(grade_id), [row['DIA_SEMANA']])
                         if st.session_state['edit_grade_item'] == row['CODIGO']:
                             st.session_state['mode_grade_item'] = 'LIST'
                             st.session_state['edit_grade_item'] = None
@@ -374,7 +440,10 @@ if group == "📚 Base de Conhecimento":
                             st.toast("✅ Horário adicionado!", icon="✅")
                         
                         conn.commit()
+                        bump_data_version()
                         conn.close()
+                        # Old and new weekday (a slot may have moved to another day)
+                        request_replan(replan_after_grade_change, int(grade_id), [dia, g_item_data.get('DIA_SEMANA')])
                         st.session_state['mode_grade_item'] = 'LIST'
                         st.session_state['edit_grade_item'] = None
                         st.rerun()
@@ -511,7 +580,9 @@ else: # Estratégia & Projetos
                                 cursor.execute("DELETE FROM EST_CONTEUDO_CICLO WHERE COD_CICLO_ITEM = ?", (row['CODIGO'],))
                                 cursor.execute("DELETE FROM EST_CICLO_ITEM WHERE CODIGO = ?", (row['CODIGO'],))
                                 conn.commit()
+                                bump_data_version()
                                 conn.close()
+                                request_replan(replan_after_cycle_change, int(ciclo_id))
                                 
                                 if st.session_state.get('edit_ciclo_item') == row['CODIGO']:
                                     st.session_state['mode_ciclo_item'] = 'LIST'
@@ -585,7 +656,13 @@ else: # Estratégia & Projetos
                             st.toast("✅ Item adicionado!", icon="✅")
                         
                         conn.commit()
+                        bump_data_version()
                         conn.close()
+                        # Same position in the cycle: only days from the item's first use change
+                        if is_edit_item and indice == int(item_data.get('INDICE', indice)):
+                            request_replan(replan_after_cycle_change, int(ciclo_id), int(st.session_state['edit_ciclo_item']))
+                        else:
+                            request_replan(replan_after_cycle_change, int(ciclo_id))
                         st.session_state['mode_ciclo_item'] = 'LIST'
                         st.session_state['edit_ciclo_item'] = None
                         st.rerun()
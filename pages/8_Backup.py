@@ -2,8 +2,12 @@
 import streamlit as st
 import pandas as pd
 import json
-from db_manager import get_connection
+import tempfile
+from db_manager import get_connection, get_table_columns, FETCH_ARRAYSIZE
 from auth import get_current_user
+from daily_rollup import rebuild_daily_rollup
+from subject_resolver import backfill_subjects
+from dashboard_service import bump_data_version
 import time
 
 # Note: st.set_page_config handled in App.py
@@ -26,11 +30,12 @@ with tab_export:
     
     if st.button("📦 Gerar Arquivo de Backup"):
         conn = get_connection()
-        backup_data = {
-            "version": "1.0",
-            "timestamp": time.time(),
-            "data": {}
-        }
+        # Same layout as before ({"version", "timestamp", "data": {table: [rows]}}), written
+        # one record per line to a temporary file as each chunk arrives. Unbuffered, the file
+        # is an io.FileIO, which st.download_button reads once into its own copy for the link
+        export_file = tempfile.TemporaryFile(buffering=0)
+        out = open(export_file.fileno(), "w", encoding="utf-8", closefd=False)
+        out.write('{"version": "1.0", "timestamp": %s, "data": {' % json.dumps(time.time()))
         
         tables = [
             "EST_AREA", "EST_MATERIA", 
@@ -41,14 +46,13 @@ with tab_export:
         ]
         
         try:
-            for table in tables:
+            cursor = conn.cursor()
+            for i, table in enumerate(tables):
                 # Check if table has COD_USUARIO
-                cursor = conn.cursor()
-                cursor.execute(f"PRAGMA table_info({table})")
-                cols = [c[1] for c in cursor.fetchall()]
+                cols = get_table_columns(table, cursor)
                 
                 if 'COD_USUARIO' in cols:
-                    df = pd.read_sql_query(f"SELECT * FROM {table} WHERE COD_USUARIO = ?", conn, params=(user_id,))
+                    query = f"SELECT * FROM {table} WHERE COD_USUARIO = ?"
                 else:
                     # Tables like EST_CICLO_ITEM, EST_CONTEUDO_CICLO don't have COD_USUARIO directly,
                     # they depend on parent tables.
@@ -58,37 +62,46 @@ with tab_export:
                     
                     # Dependency Filtering Logic
                     if table == "EST_CICLO_ITEM":
-                        df = pd.read_sql_query(f"""
+                        query = """
                             SELECT ci.* FROM EST_CICLO_ITEM ci
                             JOIN EST_CICLO c ON ci.COD_CICLO = c.CODIGO
                             WHERE c.COD_USUARIO = ?
-                        """, conn, params=(user_id,))
+                        """
                     elif table == "EST_CONTEUDO_CICLO":
-                        df = pd.read_sql_query(f"""
+                        query = """
                             SELECT cc.* FROM EST_CONTEUDO_CICLO cc
                             JOIN EST_CICLO_ITEM ci ON cc.COD_CICLO_ITEM = ci.CODIGO
                             JOIN EST_CICLO c ON ci.COD_CICLO = c.CODIGO
                             WHERE c.COD_USUARIO = ?
-                        """, conn, params=(user_id,))
+                        """
                     elif table == "EST_GRADE_ITEM":
-                        df = pd.read_sql_query(f"""
+                        query = """
                             SELECT gi.* FROM EST_GRADE_ITEM gi
                             JOIN EST_GRADE_SEMANAL g ON gi.COD_GRADE = g.CODIGO
                             WHERE g.COD_USUARIO = ?
-                        """, conn, params=(user_id,))
+                        """
                     else:
                         # Fallback (should not happen for the main tables listed above if schema is correct)
-                        df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+                        query = f"SELECT * FROM {table}"
 
-                backup_data["data"][table] = df.to_dict(orient="records")
-            
-            # Serialize
-            json_str = json.dumps(backup_data, indent=4, default=str)
+                params = (user_id,) if '?' in query else ()
+
+                # Read in chunks and write each chunk to the file: history tables can be large,
+                # only FETCH_ARRAYSIZE rows are held as a DataFrame at a time
+                out.write("%s\n%s: [" % ("," if i else "", json.dumps(table)))
+                first = True
+                for chunk in pd.read_sql_query(query, conn, params=params, chunksize=FETCH_ARRAYSIZE):
+                    for record in chunk.to_dict(orient="records"):
+                        out.write("%s\n%s" % ("" if first else ",", json.dumps(record, default=str)))
+                        first = False
+                out.write("\n]")
+            out.write("\n}}\n")
+            out.flush()
             
             st.success("Backup gerado com sucesso!")
             st.download_button(
                 label="⬇️ Baixar backup_estudos.json",
-                data=json_str,
+                data=export_file,
                 file_name="backup_estudos.json",
                 mime="application/json"
             )
@@ -96,6 +109,8 @@ with tab_export:
         except Exception as e:
             st.error(f"Erro ao gerar backup: {e}")
         finally:
+            out.close()
+            export_file.close()
             conn.close()
 
 # --- IMPORT ---
@@ -122,7 +137,7 @@ with tab_import:
                     try:
                         # DELETE Existing Data (Reverse Order)
                         delete_order = [
-                            "EST_PROGRAMACAO", "EST_ESTUDOS",
+                            "EST_RESUMO_DIARIO", "EST_CURSOR_CICLO", "EST_PROGRAMACAO", "EST_ESTUDOS",
                             "EST_CONTEUDO_CICLO",
                             "EST_CICLO_ITEM",
                             "EST_CICLO",
@@ -139,8 +154,7 @@ with tab_import:
                         for idx_del, table in enumerate(delete_order):
                             progress_bar.progress((idx_del + 1) / len(delete_order), text=f"Limpando {table}...")
                             # Check if table has COD_USUARIO
-                            cursor.execute(f"PRAGMA table_info({table})")
-                            cols = [c[1] for c in cursor.fetchall()]
+                            cols = get_table_columns(table, cursor)
                             
                             if 'COD_USUARIO' in cols:
                                 cursor.execute(f"DELETE FROM {table} WHERE COD_USUARIO = ?", (user_id,))
@@ -201,6 +215,8 @@ with tab_import:
                             progress_bar.progress((idx + 1) / len(tables_order), text=progress_text)
                             
                             records = data["data"].get(table, [])
+                            # Table columns, to filter the keys of each row (read once per table)
+                            valid_cols = set(get_table_columns(table, cursor))
                             
                             for row in records:
                                 old_id = row['CODIGO']
@@ -235,9 +251,6 @@ with tab_import:
                                     row['COD_MATERIA'] = id_map["EST_MATERIA"].get(row['COD_MATERIA']) if row.get('COD_MATERIA') else None
                                 
                                 # Construct INSERT
-                                # Filter keys to match table columns
-                                cursor.execute(f"PRAGMA table_info({table})")
-                                valid_cols = {c[1] for c in cursor.fetchall()}
                                 # Filter keys to match table columns AND remove None/NaN values
                                 filtered_row = {
                                     k: v for k, v in row.items() 
@@ -254,7 +267,11 @@ with tab_import:
                                 # Store Mapping
                                 id_map[table][old_id] = new_id
                             
+                        # Backups from before COD_MATERIA: subjects from the cycle items, then the daily totals
+                        backfill_subjects(cursor, user_id)
+                        rebuild_daily_rollup(cursor, user_id)
                         conn.commit()
+                        bump_data_version()
                         st.success("✅ Restauração concluída com sucesso! Seus dados antigos foram substituídos.")
                         st.balloons()
                         time.sleep(2)
@@ -284,7 +301,7 @@ with tab_clean:
         
         try:
             delete_order = [
-                "EST_PROGRAMACAO", "EST_ESTUDOS",
+                "EST_RESUMO_DIARIO", "EST_CURSOR_CICLO", "EST_PROGRAMACAO", "EST_ESTUDOS",
                 "EST_CONTEUDO_CICLO",
                 "EST_CICLO_ITEM",
                 "EST_CICLO",
@@ -300,8 +317,7 @@ with tab_clean:
             
             for idx, table in enumerate(delete_order):
                 # Check if table has COD_USUARIO
-                cursor.execute(f"PRAGMA table_info({table})")
-                cols = [c[1] for c in cursor.fetchall()]
+                cols = get_table_columns(table, cursor)
                 
                 if 'COD_USUARIO' in cols:
                     cursor.execute(f"DELETE FROM {table} WHERE COD_USUARIO = ?", (user_id,))
@@ -331,6 +347,7 @@ with tab_clean:
                 progress_bar.progress((idx + 1) / len(delete_order))
             
             conn.commit()
+            bump_data_version()
             st.success("✅ Todos os dados foram apagados com sucesso! Sua conta agora está vazia.")
             st.balloons()
             time.sleep(2)
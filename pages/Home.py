@@ -1,5 +1,7 @@
 import streamlit as st
 from db_manager import init_db, get_connection
+from dashboard_service import load_home_frames
+from study_streak import get_streak
 from auth import get_current_user, logout
 import pandas as pd
 import base64
@@ -141,7 +143,6 @@ with st.sidebar:
         st.rerun()
 
 # Dashboard Logic
-conn = get_connection()
 project_id = st.session_state.get('selected_project')
 
 # Convert numpy.int64 to Python int (fixes pandas query issues)
@@ -153,63 +154,29 @@ if project_id is None:
     st.warning("⚠️ Nenhum projeto selecionado. Por favor, selecione um projeto na sidebar ou limpe o cache (Ctrl+Shift+R).")
     st.stop()
 
-# 1. Horas Hoje
-today = date.today().isoformat()
-df_today = pd.read_sql_query("SELECT SUM(HL_REALIZADA) as TOTAL_HORAS FROM EST_ESTUDOS WHERE DATA = ? AND COD_PROJETO = ?", conn, params=(today, project_id))
+# Everything shown below is loaded once per (project, data version); reruns that
+# only change widgets (tabs, chart filter) are served from the cache
+frames = load_home_frames(project_id)
+dashboard = frames.dashboard
 
-horas_hoje = df_today['TOTAL_HORAS'].iloc[0] if df_today['TOTAL_HORAS'].iloc[0] else 0.0
+# 1. Horas Hoje
+horas_hoje = dashboard.horas_hoje
 questoes_hoje = 0 # Column QTDE_QUESTOES does not exist yet
 
-# 2. Dias Seguidos (Streak)
-# Get all unique study dates in descending order
-dates_df = pd.read_sql_query("SELECT DISTINCT DATA FROM EST_ESTUDOS WHERE COD_PROJETO = ? ORDER BY DATA DESC", conn, params=(project_id,))
-streak = 0
-if not dates_df.empty:
-    study_dates = pd.to_datetime(dates_df['DATA'], errors='coerce').dropna().dt.date.tolist()
-    
-    # Check if studied today or yesterday to keep streak alive
-    if not study_dates:
-        streak = 0
-    else:
-        last_study = study_dates[0]
-    current_check = date.today()
-    
-    if last_study == current_check:
-        streak = 1
-        check_idx = 1
-    elif last_study == current_check - timedelta(days=1):
-        streak = 1
-        check_idx = 1
-        current_check -= timedelta(days=1) # Start checking from yesterday
-    else:
-        streak = 0
-        check_idx = 0 # No active streak
-        
-    # Count backwards
-    if streak > 0:
-        while check_idx < len(study_dates):
-            expected_date = current_check - timedelta(days=1)
-            if study_dates[check_idx] == expected_date:
-                streak += 1
-                current_check = expected_date
-                check_idx += 1
-            else:
-                break
+# 2. Dias Seguidos (Streak) - cached per project, refreshed when a study is saved
+streak_stats = get_streak(project_id, today=dashboard.today)
+streak = streak_stats.atual
 
 # 3. Totais do Projeto
-# Total Realizado
-df_total_real = pd.read_sql_query("SELECT SUM(HL_REALIZADA) as TOTAL FROM EST_ESTUDOS WHERE COD_PROJETO = ?", conn, params=(project_id,))
-total_horas_real = df_total_real['TOTAL'].iloc[0] if df_total_real['TOTAL'].iloc[0] else 0.0
-
-# Total Planejado
-df_total_plan = pd.read_sql_query("SELECT SUM(HL_PREVISTA) as TOTAL FROM EST_PROGRAMACAO WHERE COD_PROJETO = ?", conn, params=(project_id,))
-total_horas_plan = df_total_plan['TOTAL'].iloc[0] if df_total_plan['TOTAL'].iloc[0] else 0.0
-
-conn.close()
+total_horas_real = dashboard.total_real
+total_horas_plan = dashboard.total_plan
 
 # Display KPIs
 col1, col2, col3, col4, col5 = st.columns(5)
-col1.metric("Dias Seguidos", f"{streak} 🔥")
+col1.metric(
+    "Dias Seguidos", f"{streak} 🔥",
+    help=f"Recorde: {streak_stats.recorde} dias · Últimos 7 dias: {streak_stats.dias_semana}/7 ({streak_stats.constancia:.0%})"
+)
 col2.metric("Horas Hoje", f"{horas_hoje:.2f}h ⏳")
 col3.metric("Questões Hoje", f"{int(questoes_hoje)} ✅")
 col4.metric("Horas Totais", f"{total_horas_real:.2f}h 📚")
@@ -220,34 +187,9 @@ st.subheader("📊 Raio X da Preparação")
 
 # --- 1. Agenda Diária ---
 st.markdown("### 📅 Agenda Diária")
-conn = get_connection()
-agenda_query = """
-    SELECT 
-        p.DESC_AULA as Descrição,
-        p.HR_INICIAL_PREVISTA as 'Hr. Inicial',
-        p.HL_PREVISTA as 'Qtde Horas'
-    FROM EST_PROGRAMACAO p
-    WHERE p.DATA = ? AND p.COD_PROJETO = ?
-    ORDER BY p.HR_INICIAL_PREVISTA
-"""
-df_agenda = pd.read_sql_query(agenda_query, conn, params=(today, project_id))
+df_agenda = frames.agenda
 
 if not df_agenda.empty:
-    # Calculate End Time and Minutes
-    df_agenda['Qtde Minutos'] = df_agenda['Qtde Horas'] * 60
-    
-    def calc_end_time(row):
-        try:
-            start = pd.to_datetime(row['Hr. Inicial'], format='%H:%M:%S')
-            end = start + pd.Timedelta(hours=row['Qtde Horas'])
-            return end.strftime('%H:%M:%S')
-        except: return "-"
-        
-    df_agenda['Hr. Final'] = df_agenda.apply(calc_end_time, axis=1)
-    
-    # Reorder columns
-    df_agenda = df_agenda[['Descrição', 'Hr. Inicial', 'Hr. Final', 'Qtde Minutos', 'Qtde Horas']]
-    
     st.dataframe(
         df_agenda, 
         use_container_width=True, 
@@ -263,42 +205,11 @@ else:
 # --- 2. Evolução Programação - Semana ---
 st.markdown("### 📈 Evolução Programação - Semana")
 
-# Calculate Start/End of Week (Sunday to Saturday)
-dt_today = date.today()
-idx_weekday = (dt_today.weekday() + 1) % 7 # Mon=0 -> Sun=0 conversion
-start_week = dt_today - timedelta(days=idx_weekday)
-end_week = start_week + timedelta(days=6)
-
-# Fetch Data
-week_prog = pd.read_sql_query("""
-    SELECT DATA, SUM(HL_PREVISTA) as HL 
-    FROM EST_PROGRAMACAO 
-    WHERE DATA BETWEEN ? AND ? AND COD_PROJETO = ?
-    GROUP BY DATA
-""", conn, params=(start_week.isoformat(), end_week.isoformat(), project_id))
-
-week_real = pd.read_sql_query("""
-    SELECT DATA, SUM(HL_REALIZADA) as HL 
-    FROM EST_ESTUDOS 
-    WHERE DATA BETWEEN ? AND ? AND COD_PROJETO = ?
-    GROUP BY DATA
-""", conn, params=(start_week.isoformat(), end_week.isoformat(), project_id))
-
-# Build Pivot Table
+# Build Pivot Table (Sunday to Saturday)
 days_cols = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
 data_matrix = {'Tipo': ['PREVISTA', 'REALIZADA']}
-for d in days_cols: data_matrix[d] = [0.0, 0.0]
-
-# Fill Data
-def fill_week_data(df, row_idx):
-    for _, row in df.iterrows():
-        d_obj = pd.to_datetime(row['DATA'])
-        d_idx = (d_obj.weekday() + 1) % 7
-        day_name = days_cols[d_idx]
-        data_matrix[day_name][row_idx] = float(row['HL'])
-
-fill_week_data(week_prog, 0)
-fill_week_data(week_real, 1)
+for d_idx, d in enumerate(days_cols):
+    data_matrix[d] = [dashboard.week_plan[d_idx], dashboard.week_real[d_idx]]
 
 df_week = pd.DataFrame(data_matrix)
 df_week['Total'] = df_week[days_cols].sum(axis=1)
@@ -317,14 +228,13 @@ st.dataframe(
 # --- 3. Evolução Programação - Projeto ---
 st.markdown("### 🏗️ Evolução Programação - Projeto")
 
-# Get Project Info
-proj = pd.read_sql_query("SELECT DATA_INICIAL FROM EST_PROJETO WHERE CODIGO = ?", conn, params=(project_id,))
-if not proj.empty:
-    dt_inicio = pd.to_datetime(proj.iloc[0]['DATA_INICIAL']).date()
+# Project Info
+if dashboard.data_inicial is not None:
+    dt_inicio = dashboard.data_inicial
     
     # Totals
-    total_prev = pd.read_sql_query("SELECT SUM(HL_PREVISTA) as T FROM EST_PROGRAMACAO WHERE COD_PROJETO = ?", conn, params=(project_id,)).iloc[0]['T'] or 0.0
-    total_real = pd.read_sql_query("SELECT SUM(HL_REALIZADA) as T FROM EST_ESTUDOS WHERE COD_PROJETO = ?", conn, params=(project_id,)).iloc[0]['T'] or 0.0
+    total_prev = dashboard.total_plan
+    total_real = dashboard.total_real
     
     # Calcs
     total_days = (date.today() - dt_inicio).days + 1
@@ -355,45 +265,14 @@ if not proj.empty:
     )
 
 # --- 4. & 4.1 Disciplinas e Progresso ---
-# First, fetch Progress Data to decide layout
-conn = get_connection()
-df_progress = pd.read_sql_query("""
-    SELECT 
-        m.NOME as MATERIA,
-        COUNT(cc.CODIGO) as TOTAL,
-        SUM(CASE WHEN cc.FINALIZADO = 'S' THEN 1 ELSE 0 END) as CONCLUIDO
-    FROM EST_CONTEUDO_CICLO cc
-    JOIN EST_CICLO_ITEM ci ON cc.COD_CICLO_ITEM = ci.CODIGO
-    JOIN EST_MATERIA m ON ci.COD_MATERIA = m.CODIGO
-    WHERE ci.COD_CICLO IN (
-        SELECT DISTINCT COD_CICLO FROM EST_PROGRAMACAO WHERE COD_PROJETO = ?
-        UNION
-        SELECT DISTINCT COD_CICLO FROM EST_ESTUDOS WHERE COD_PROJETO = ?
-    )
-    GROUP BY m.NOME
-    HAVING TOTAL > 0
-    ORDER BY (CAST(CONCLUIDO AS FLOAT) / TOTAL) DESC
-""", conn, params=(project_id, project_id))
-conn.close()
+# Progress Data decides the layout
+df_progress = frames.progress
 
 # Define render function for Hours Table (to reuse)
 def render_hours_table():
-    conn = get_connection()
-    # Extract Subject from Description (Simple Heuristic: Remove "Estudo de ")
-    df_subj = pd.read_sql_query("SELECT DESC_AULA, HL_REALIZADA FROM EST_ESTUDOS WHERE COD_PROJETO = ?", conn, params=(project_id,))
-    conn.close()
+    df_grouped = frames.subject_hours
     
-    if not df_subj.empty:
-        df_subj['Disciplina'] = df_subj['DESC_AULA'].apply(lambda x: x.replace('Estudo de ', '').strip())
-        df_grouped = df_subj.groupby('Disciplina')['HL_REALIZADA'].sum().reset_index()
-        df_grouped.columns = ['Disciplina', 'Hrs. Estudadas']
-        df_grouped = df_grouped.sort_values('Hrs. Estudadas', ascending=False)
-        
-        # Add Total Row
-        total_hrs = df_grouped['Hrs. Estudadas'].sum()
-        new_row = pd.DataFrame([{'Disciplina': 'TOTAL', 'Hrs. Estudadas': total_hrs}])
-        df_grouped = pd.concat([df_grouped, new_row], ignore_index=True)
-        
+    if not df_grouped.empty:
         st.dataframe(
             df_grouped, 
             use_container_width=True, 
@@ -407,8 +286,6 @@ def render_hours_table():
 
 # Define render function for Progress Chart
 def render_progress_chart():
-    df_progress['PERCENT'] = (df_progress['CONCLUIDO'] / df_progress['TOTAL']) * 100
-    
     import plotly.express as px
     
     fig_prog = px.bar(
@@ -471,38 +348,9 @@ else:
 # --- 5. Gráfico de Evolução Temporal ---
 st.markdown("### 📉 Gráfico de Evolução (Previsto x Realizado)")
 
-conn = get_connection()
-
-# 1. Fetch Data
-# Planned
-df_plan = pd.read_sql_query("""
-    SELECT p.DATA, p.HL_PREVISTA, m.NOME as MATERIA 
-    FROM EST_PROGRAMACAO p
-    LEFT JOIN EST_CICLO_ITEM ci ON p.COD_CICLO_ITEM = ci.CODIGO
-    LEFT JOIN EST_MATERIA m ON ci.COD_MATERIA = m.CODIGO
-    WHERE p.COD_PROJETO = ?
-""", conn, params=(project_id,))
-
-# Realized
-df_real = pd.read_sql_query("""
-    SELECT DATA, HL_REALIZADA, DESC_AULA 
-    FROM EST_ESTUDOS 
-    WHERE COD_PROJETO = ?
-""", conn, params=(project_id,))
-
-conn.close()
-
-# 2. Process Data
-if not df_plan.empty:
-    df_plan['DATA'] = pd.to_datetime(df_plan['DATA'], errors='coerce')
-    df_plan = df_plan.dropna(subset=['DATA'])
-    df_plan['MATERIA'] = df_plan['MATERIA'].fillna('Outros')
-
-if not df_real.empty:
-    df_real['DATA'] = pd.to_datetime(df_real['DATA'], errors='coerce')
-    df_real = df_real.dropna(subset=['DATA'])
-    # Extract Subject from Description
-    df_real['MATERIA'] = df_real['DESC_AULA'].apply(lambda x: x.replace('Estudo de ', '').strip() if x else 'Outros')
+# Plan/real frames are already cached; filtering below is done in memory
+df_plan = frames.plan
+df_real = frames.real
 
 # 3. Filter Interface
 if not df_plan.empty or not df_real.empty:
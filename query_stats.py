@@ -0,0 +1,177 @@
+"""
+Estatísticas das consultas SQL: tempo, quantidade e linhas, por página e por rerun.
+Alimentado pelas conexões instrumentadas de db_manager (QUERY_STATS = true no
+secrets.toml); consultas acima de SLOW_QUERY_MS vão para o log de consultas lentas.
+Os totais ficam em memória no processo e são exibidos no Dashboard Geral (admin); os do
+rerun atual aparecem na barra lateral dos administradores (App.py).
+"""
+
+import logging
+import re
+import threading
+import time
+
+# Padrões (podem ser alterados no secrets.toml: SLOW_QUERY_MS, SLOW_QUERY_LOG)
+SLOW_QUERY_MS = 200
+SLOW_QUERY_LOG = 'slow_queries.log'
+
+# Limite de consultas distintas guardadas (SQL montado com valores literais não cresce sem fim)
+MAX_DISTINCT_QUERIES = 500
+
+NO_PAGE = '-'
+
+_lock = threading.Lock()
+_queries = {}  # (página, sql normalizado) -> totais da consulta
+_pages = {}    # página -> totais da página
+_local = threading.local()  # página e totais do rerun em execução nesta thread
+
+_config = {'enabled': False, 'slow_seconds': SLOW_QUERY_MS / 1000}
+_slow_logger = logging.getLogger('estudos.slow_queries')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryRecord:
+    """Uma execução de consulta; o tempo e as linhas das leituras seguintes são somados a ela."""
+    __slots__ = ('key', 'sql', 'params_count', 'seconds', 'rows', 'logged')
+
+    def __init__(self, key, sql, params_count):
+        self.key = key
+        self.sql = sql
+        self.params_count = params_count
+        self.seconds = 0.0
+        self.rows = 0
+        self.logged = False
+
+
+def configure(slow_ms=SLOW_QUERY_MS, log_path=SLOW_QUERY_LOG):
+    """
+    Liga a coleta e define o limite (ms) e o arquivo do log de consultas lentas.
+    Chamado por db_manager ao abrir conexões instrumentadas.
+    """
+    _config['enabled'] = True
+    _config['slow_seconds'] = float(slow_ms) / 1000
+    if log_path and not _slow_logger.handlers:
+        handler = logging.FileHandler(log_path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        _slow_logger.addHandler(handler)
+        _slow_logger.setLevel(logging.INFO)
+        _slow_logger.propagate = False
+
+
+def is_enabled():
+    return _config['enabled']
+
+
+def normalize_sql(sql):
+    """SQL sem valores literais e com espaços colapsados, para agrupar execuções da mesma consulta."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def start_rerun(page):
+    """
+    Início de um rerun do Streamlit (App.py): as consultas desta thread passam a
+    contar para page e para um novo total de rerun.
+    """
+    _local.page = page
+    _local.rerun = {'page': page, 'queries': 0, 'seconds': 0.0, 'rows': 0, 'started_at': time.time()}
+    with _lock:
+        _page_totals(page)['reruns'] += 1
+
+
+def current_rerun():
+    """Totais do rerun em execução nesta thread (consultas, segundos, linhas), ou None."""
+    rerun = getattr(_local, 'rerun', None)
+    return dict(rerun) if rerun else None
+
+
+def _page_totals(page):
+    totals = _pages.get(page)
+    if totals is None:
+        totals = _pages[page] = {'reruns': 0, 'queries': 0, 'seconds': 0.0, 'rows': 0}
+    return totals
+
+
+def start_query(sql, params_count):
+    """Registra uma execução (conta 1) e devolve o QueryRecord que acumula tempo e linhas."""
+    page = getattr(_local, 'page', NO_PAGE)
+    key = (page, normalize_sql(sql))
+    with _lock:
+        totals = _queries.get(key)
+        if totals is None and len(_queries) < MAX_DISTINCT_QUERIES:
+            totals = _queries[key] = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0}
+        if totals is not None:
+            totals['count'] += 1
+        _page_totals(page)['queries'] += 1
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is not None:
+        rerun['queries'] += 1
+    return QueryRecord(key, sql, params_count)
+
+
+def add(record, seconds, rows=0):
+    """Soma tempo e linhas (da execução ou de uma leitura) à consulta, à página e ao rerun."""
+    record.seconds += seconds
+    record.rows += rows
+    with _lock:
+        totals = _queries.get(record.key)
+        if totals is not None:
+            totals['seconds'] += seconds
+            totals['rows'] += rows
+            totals['max_seconds'] = max(totals['max_seconds'], record.seconds)
+        page = _page_totals(record.key[0])
+        page['seconds'] += seconds
+        page['rows'] += rows
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is not None:
+        rerun['seconds'] += seconds
+        rerun['rows'] += rows
+
+    if not record.logged and record.seconds >= _config['slow_seconds']:
+        record.logged = True
+        _slow_logger.info(
+            "%.1f ms | página %s | %d parâmetros | %s",
+            record.seconds * 1000, record.key[0], record.params_count, record.key[1]
+        )
+
+
+def top_queries(limit=20):
+    """Consultas com maior tempo total: lista de dicts (página, sql, execuções, tempos em ms, linhas)."""
+    with _lock:
+        items = [(key, dict(totals)) for key, totals in _queries.items()]
+    items.sort(key=lambda item: item[1]['seconds'], reverse=True)
+    return [{
+        'pagina': page,
+        'sql': sql,
+        'execucoes': totals['count'],
+        'total_ms': round(totals['seconds'] * 1000, 2),
+        'media_ms': round(totals['seconds'] * 1000 / totals['count'], 3) if totals['count'] else 0.0,
+        'max_ms': round(totals['max_seconds'] * 1000, 2),
+        'linhas': totals['rows'],
+    } for (page, sql), totals in items[:limit]]
+
+
+def page_summary():
+    """Totais por página, com consultas e tempo médios por rerun."""
+    with _lock:
+        items = [(page, dict(totals)) for page, totals in _pages.items()]
+    items.sort(key=lambda item: item[1]['seconds'], reverse=True)
+    return [{
+        'pagina': page,
+        'reruns': totals['reruns'],
+        'consultas': totals['queries'],
+        'total_ms': round(totals['seconds'] * 1000, 2),
+        'consultas_por_rerun': round(totals['queries'] / totals['reruns'], 1) if totals['reruns'] else None,
+        'ms_por_rerun': round(totals['seconds'] * 1000 / totals['reruns'], 2) if totals['reruns'] else None,
+    } for page, totals in items]
+
+
+def reset():
+    """Zera os totais acumulados (o rerun em andamento continua sendo contado)."""
+    with _lock:
+        _queries.clear()
+        _pages.clear()
@@ -0,0 +1,268 @@
+"""
+Incremental re-planning of pending EST_PROGRAMACAO days after a grade or cycle edit.
+
+Instead of "Excluir Pendentes" + a full regeneration, the plan is recomputed in memory
+from the first day the edit can affect, compared day by day with what is stored, and
+only the rows that actually differ are rewritten (updated in place where possible).
+DIA numbering and the cycle position are carried over from the untouched days before
+the window, exactly as generate_schedule would compute them.
+
+Days with a row adjusted by hand in Planejamento (EDITADO = 'S') are kept as they are:
+the plan flows around them like around the days generate_schedule skips. Pages can run
+the re-planning with dry_run=True first to show how much would change and ask before
+writing anything.
+"""
+
+from collections import namedtuple
+from datetime import date, timedelta
+from db_manager import get_connection
+from study_engine import (
+    PROGRAMACAO_COLUMNS, ScheduleSetupError, ScheduleStore,
+    cycle_resume_index, insert_planned_rows, load_study_timeline, rebuild_cycle_cursor,
+)
+from schedule_kernel import TIPO_ESTUDO_CICLO, db_weekday, plan_schedule
+from daily_rollup import refresh_daily_rollup
+
+# Outcome of re-planning one project
+ReplanResult = namedtuple('ReplanResult', [
+    'project_id', 'window_start', 'days_changed', 'rows_updated', 'rows_deleted', 'rows_inserted',
+    'days_kept',  # Days left untouched because they have rows edited by hand
+])
+
+_HL_INDEX = PROGRAMACAO_COLUMNS.index('HL_PREVISTA')
+
+
+def _normalize(row):
+    # HL_PREVISTA is a float computed as minutes/60; compare it rounded
+    row = list(row)
+    if row[_HL_INDEX] is not None:
+        row[_HL_INDEX] = round(row[_HL_INDEX], 6)
+    return tuple(row)
+
+
+def _group_by_date(rows, date_index):
+    days = {}
+    for row in rows:
+        days.setdefault(row[date_index], []).append(row)
+    return days
+
+
+def replan_project(project_id, first_affected_date, today=None, store=None, inputs=None, dry_run=False):
+    """
+    Re-plans the pending days of a project from first_affected_date to its last planned day.
+
+    Days before today, days up to the last non-pending row (done/cancelled) and days with
+    rows edited by hand are never touched. Returns a ReplanResult, or None when the project
+    has nothing to re-plan. Raises ScheduleSetupError if the project has no default
+    cycle/grade anymore.
+
+    inputs: ScheduleInputs already loaded for the project by the caller (optional)
+    dry_run: only compute what would change; nothing is written
+    """
+    today = today or date.today()
+    owns_conn = store is None
+    if owns_conn:
+        store = ScheduleStore(get_connection())
+
+    try:
+        cursor = store.cursor
+        bounds = cursor.execute("""
+            SELECT MAX(DATA) AS LAST_DATA,
+                   MAX(CASE WHEN STATUS <> 'PENDENTE' THEN DATA END) AS LAST_LOCKED
+            FROM EST_PROGRAMACAO WHERE COD_PROJETO = ?
+        """, (project_id,)).fetchone()
+        if not bounds or not bounds['LAST_DATA']:
+            return None
+
+        window_start = max(first_affected_date, today)
+        if bounds['LAST_LOCKED']:
+            window_start = max(window_start, date.fromisoformat(bounds['LAST_LOCKED'][:10]) + timedelta(days=1))
+        window_end = date.fromisoformat(bounds['LAST_DATA'][:10])
+        if window_start > window_end:
+            return None
+
+        start_str = window_start.isoformat()
+        days = (window_end - window_start).days + 1
+        if inputs is None:
+            inputs = store.load_inputs(project_id, window_start, days)
+
+        # --- State as it stands right before the window ---
+        last_prog = cursor.execute(
+            "SELECT MAX(DIA) AS LAST_DIA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA < ?",
+            (project_id, start_str)
+        ).fetchone()
+        last_scheduled = cursor.execute("""
+            SELECT COD_CICLO_ITEM FROM EST_PROGRAMACAO
+            WHERE COD_PROJETO = ? AND TIPO = ? AND DATA < ?
+            ORDER BY DATA DESC, CODIGO DESC LIMIT 1
+        """, (project_id, TIPO_ESTUDO_CICLO, start_str)).fetchone()
+
+        # Days adjusted by hand stay as they are and keep counting as study days, with their DIA
+        kept_days = {row['DATA']: row['DIA'] for row in cursor.execute("""
+            SELECT DATA, MAX(DIA) AS DIA FROM EST_PROGRAMACAO
+            WHERE COD_PROJETO = ? AND DATA >= ? AND DATA IN (
+                SELECT DATA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA >= ? AND EDITADO = 'S'
+            )
+            GROUP BY DATA
+        """, (project_id, start_str, project_id, start_str)).fetchall()}
+        timeline = load_study_timeline(cursor, project_id, before=start_str)
+        for day in kept_days:
+            timeline.add(day)
+
+        inputs = inputs._replace(
+            timeline=timeline,
+            last_dia=last_prog['LAST_DIA'] or 0,
+            start_item_idx=cycle_resume_index(
+                inputs.cycle_items, last_scheduled['COD_CICLO_ITEM'] if last_scheduled else None
+            ),
+            skip_dates=kept_days,
+        )
+
+        result = plan_schedule(
+            inputs.cycle_items, inputs.grade, inputs.timeline, inputs.revision_minutes,
+            window_start, days,
+            start_item_idx=inputs.start_item_idx,
+            last_dia=inputs.last_dia,
+            revision_materia=inputs.revision_materia,
+            revision_ciclo_item=inputs.revision_ciclo_item,
+            skip_dates=inputs.skip_dates,
+        )
+
+        # --- Diff stored vs planned, day by day ---
+        cols = ', '.join(PROGRAMACAO_COLUMNS)
+        stored = cursor.execute(f"""
+            SELECT CODIGO, {cols} FROM EST_PROGRAMACAO
+            WHERE COD_PROJETO = ? AND DATA >= ?
+            ORDER BY DATA, CODIGO
+        """, (project_id, start_str)).fetchall()
+        stored_days = {day: rows for day, rows in _group_by_date(stored, 'DATA').items() if day not in kept_days}
+        planned_days = _group_by_date(store.to_db_rows(inputs, result.rows), PROGRAMACAO_COLUMNS.index('DATA'))
+
+        update_rows = []
+        delete_ids = []
+        insert_rows = []
+        days_changed = 0
+        for day in sorted(set(stored_days) | set(planned_days)):
+            old_rows = stored_days.get(day, [])
+            new_rows = planned_days.get(day, [])
+            old_sig = [_normalize(tuple(r[c] for c in PROGRAMACAO_COLUMNS)) for r in old_rows]
+            new_sig = [_normalize(r) for r in new_rows]
+            if old_sig == new_sig:
+                continue
+            days_changed += 1
+
+            # Reuse the stored rows of the day in order; only differing ones are rewritten
+            for old_row, old, new in zip(old_rows, old_sig, new_sig):
+                if old != new:
+                    update_rows.append(new + (old_row['CODIGO'],))
+            delete_ids.extend(r['CODIGO'] for r in old_rows[len(new_rows):])
+            insert_rows.extend(new_rows[len(old_rows):])
+
+        if days_changed and not dry_run:
+            assignments = ', '.join(f"{c} = ?" for c in PROGRAMACAO_COLUMNS)
+            try:
+                if update_rows:
+                    cursor.executemany(f"UPDATE EST_PROGRAMACAO SET {assignments} WHERE CODIGO = ?", update_rows)
+                if delete_ids:
+                    cursor.executemany("DELETE FROM EST_PROGRAMACAO WHERE CODIGO = ?", [(i,) for i in delete_ids])
+                insert_planned_rows(cursor, insert_rows)
+                # The tail of the plan changed: the cycle cursor follows the rewritten rows
+                rebuild_cycle_cursor(cursor, project_id)
+                refresh_daily_rollup(cursor, project_id, [window_start, window_end])
+                store.conn.commit()
+            except Exception:
+                store.conn.rollback()
+                raise
+
+        return ReplanResult(
+            project_id, window_start, days_changed, len(update_rows), len(delete_ids), len(insert_rows),
+            len(kept_days)
+        )
+    finally:
+        if owns_conn:
+            store.conn.close()
+
+
+def _first_date_on_weekdays(start, weekdays):
+    # Next date (from start) whose DIA_SEMANA is in weekdays
+    for offset in range(7):
+        day = start + timedelta(days=offset)
+        if db_weekday(day) in weekdays:
+            return day
+    return None
+
+
+def _replan_projects(conn, project_ids, first_affected_by_project, today, key_column, key_value, dry_run):
+    results = []
+    store = ScheduleStore(conn)
+    for project_id in project_ids:
+        first_affected = first_affected_by_project(project_id)
+        if first_affected is None:
+            continue
+        try:
+            inputs = store.load_inputs(project_id, first_affected, 1)
+        except ScheduleSetupError:
+            continue
+        # The generator always uses the default grade/cycle; only re-plan if it is the edited one
+        if getattr(inputs, key_column) != key_value:
+            continue
+        outcome = replan_project(project_id, first_affected, today=today, store=store, inputs=inputs, dry_run=dry_run)
+        if outcome:
+            results.append(outcome)
+    return results
+
+
+def replan_after_grade_change(cod_grade, weekdays, today=None, dry_run=False):
+    """
+    Re-plans the pending schedule of every project planned with this grade after
+    one of its slots changed. weekdays: DIA_SEMANA values touched by the edit
+    (old and new day when a slot moves to another weekday).
+    Returns the list of ReplanResult of the projects that were (or, with dry_run,
+    would be) re-planned.
+    """
+    today = today or date.today()
+    weekdays = {int(d) for d in weekdays if d is not None}
+    first_affected = _first_date_on_weekdays(today, weekdays)
+    if first_affected is None:
+        return []
+
+    conn = get_connection()
+    try:
+        project_ids = [row['COD_PROJETO'] for row in conn.cursor().execute("""
+            SELECT DISTINCT COD_PROJETO FROM EST_PROGRAMACAO
+            WHERE COD_GRADE = ? AND STATUS = 'PENDENTE' AND DATA >= ?
+        """, (cod_grade, today.isoformat())).fetchall()]
+        return _replan_projects(conn, project_ids, lambda _pid: first_affected, today, 'cod_grade', cod_grade, dry_run)
+    finally:
+        conn.close()
+
+
+def replan_after_cycle_change(cod_ciclo, cod_ciclo_item=None, today=None, dry_run=False):
+    """
+    Re-plans the pending schedule of every project planned with this cycle after
+    one of its items changed. With cod_ciclo_item (duration/subject edit) the window
+    starts at the first pending day that uses the item; without it (item added,
+    removed or re-ordered) at the first pending cycle study day.
+    Returns the list of ReplanResult of the projects that were (or, with dry_run,
+    would be) re-planned.
+    """
+    today = today or date.today()
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        project_ids = [row['COD_PROJETO'] for row in cursor.execute("""
+            SELECT DISTINCT COD_PROJETO FROM EST_PROGRAMACAO
+            WHERE COD_CICLO = ? AND STATUS = 'PENDENTE' AND DATA >= ?
+        """, (cod_ciclo, today.isoformat())).fetchall()]
+
+        def first_affected(project_id):
+            row = cursor.execute("""
+                SELECT MIN(DATA) AS FIRST_DATA FROM EST_PROGRAMACAO
+                WHERE COD_PROJETO = ? AND TIPO = ? AND STATUS = 'PENDENTE' AND DATA >= ?
+                  AND (? IS NULL OR COD_CICLO_ITEM = ?)
+            """, (project_id, TIPO_ESTUDO_CICLO, today.isoformat(), cod_ciclo_item, cod_ciclo_item)).fetchone()
+            return date.fromisoformat(row['FIRST_DATA'][:10]) if row and row['FIRST_DATA'] else None
+
+        return _replan_projects(conn, project_ids, first_affected, today, 'cod_ciclo', cod_ciclo, dry_run)
+    finally:
+        conn.close()
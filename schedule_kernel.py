@@ -0,0 +1,284 @@
+"""
+Pure scheduling kernel (no database, no Streamlit).
+
+Ports the allocation rules of PCD_GERA_PROGRAMACAO: given the cycle items, the weekly
+grade, the study-day timeline and the revision durations, plan_schedule returns the
+rows to be scheduled. Loading the inputs and persisting the rows is done by the
+adapter in study_engine, so the kernel can run in tight loops (what-if simulations,
+benchmarks) and be checked without touching estudos.db.
+"""
+
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Revision / cycle row types (EST_PROGRAMACAO.TIPO)
+TIPO_REVISAO_24H = 1
+TIPO_REVISAO_7D = 2
+TIPO_REVISAO_30D = 3
+TIPO_ESTUDO_CICLO = 4
+
+# Minimum free minutes in a slot to schedule a revision / a cycle block
+MIN_REVISION_BLOCK = 5
+MIN_CYCLE_BLOCK = 10
+
+# Default cycle item duration when QTDE_MINUTOS is empty
+DEFAULT_ITEM_MINUTES = 60
+
+# One planned EST_PROGRAMACAO row, without the run constants (grade, project, cycle, user)
+PlannedRow = namedtuple('PlannedRow', [
+    'DATA', 'DIA', 'TIPO', 'DESC_AULA', 'HL_PREVISTA', 'HR_INICIAL_PREVISTA',
+    'COD_CICLO_ITEM', 'COD_MATERIA'
+])
+
+# Output of plan_schedule: the rows plus the state needed to continue from where it stopped
+ScheduleResult = namedtuple('ScheduleResult', [
+    'rows', 'next_item_idx', 'last_dia', 'last_date', 'timeline'
+])
+
+
+def db_weekday(day):
+    """Converts a date to the DIA_SEMANA convention of EST_GRADE_ITEM (1=Dom, 2=Seg ... 7=Sáb)."""
+    weekday = day.isoweekday()
+    return weekday + 1 if weekday < 7 else 1
+
+
+def format_clock(minutes):
+    """Minutes since midnight as "HH:MM:SS" (seconds truncated, like strftime on a datetime)."""
+    seconds = int(round(minutes * 60, 6))
+    return f"{seconds // 3600 % 24:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _time_to_minutes(value):
+    # Accepts "HH:MM:SS" and "HH:MM"
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            t = datetime.strptime(value, fmt)
+            return t.hour * 60 + t.minute + t.second / 60
+        except (TypeError, ValueError):
+            continue
+    raise ValueError(f"Horário inválido: {value!r}")
+
+
+class StudyTimeline:
+    """
+    Sorted, de-duplicated list of a project's study dates (history + plan, TIPO > 0).
+    Loaded once per run and extended as days are planned, so looking up the
+    study-day index of a date is a bisect instead of a query + sort + .index().
+    """
+    def __init__(self, dates=()):
+        self._dates = sorted(set(dates))
+
+    def copy(self):
+        clone = StudyTimeline()
+        clone._dates = list(self._dates)
+        return clone
+
+    def __len__(self):
+        return len(self._dates)
+
+    def __contains__(self, date_str):
+        i = bisect_left(self._dates, date_str)
+        return i < len(self._dates) and self._dates[i] == date_str
+
+    def position(self, date_str):
+        """0-based index the date has (or would have once added) in the timeline."""
+        return bisect_left(self._dates, date_str)
+
+    def index_of(self, date_str):
+        """0-based study-day index of the date, or -1 if it is not a study day."""
+        return self.position(date_str) if date_str in self else -1
+
+    def add(self, date_str):
+        if date_str not in self:
+            insort(self._dates, date_str)
+
+
+class WeeklyGrade:
+    """
+    The weekly grade (EST_GRADE_ITEM) as a 7-entry table keyed by DIA_SEMANA.
+    Each weekday holds its slots ordered by start time, already parsed as
+    (start_minute, duration_minutes), so day generation needs no queries or strptime.
+    """
+    def __init__(self, slots_by_weekday=None):
+        slots_by_weekday = slots_by_weekday or {}
+        self._slots = {d: tuple(slots_by_weekday.get(d, ())) for d in range(1, 8)}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds the table from EST_GRADE_ITEM rows (DIA_SEMANA, HORA_INICIAL, HORA_FINAL, QTDE_MINUTOS)."""
+        slots_by_weekday = {}
+        for row in rows:
+            # Calculate duration from Start/End times
+            try:
+                start = _time_to_minutes(row['HORA_INICIAL'])
+                duration = _time_to_minutes(row['HORA_FINAL']) - start
+            except ValueError:
+                # Fallback to QTDE_MINUTOS if parsing fails
+                start = 0
+                duration = row['QTDE_MINUTOS'] or 0
+            slots_by_weekday.setdefault(row['DIA_SEMANA'], []).append((start, duration))
+
+        for slots in slots_by_weekday.values():
+            slots.sort()
+        return cls(slots_by_weekday)
+
+    def slots_for(self, day):
+        return self._slots.get(db_weekday(day), ())
+
+    def has_slots(self, day):
+        return bool(self.slots_for(day))
+
+
+def revision_minutes_for(curr_idx, revision_minutes):
+    """
+    Revision minutes (24h, 7d, 30d) due on the study day with 0-based index curr_idx.
+    """
+    cfg_rev_24h, cfg_rev_7d, cfg_rev_30d = revision_minutes
+    minutos_revisao_24h = 0
+    minutos_revisao_7d = 0
+    minutos_revisao_30d = 0
+
+    # Rule: 24h Revision = Always, unless suppressed (handled below)
+    # Only if we have at least one previous day
+    if curr_idx >= 1:
+        minutos_revisao_24h = cfg_rev_24h
+
+    # Rule: 7d Revision = Every 7 days (Index 7, 14, 21...)
+    # User Rule: "estudei de 1 a 7, no dia 8 tenho a revisão" -> Index 7
+    if curr_idx > 0 and curr_idx % 7 == 0:
+        minutos_revisao_7d = cfg_rev_7d
+
+    # Rule: 30d Revision = Every 30 days (Index 30, 60...)
+    if curr_idx > 0 and curr_idx % 30 == 0:
+        minutos_revisao_30d = cfg_rev_30d
+
+    # --- SUPPRESSION LOGIC (User Rule: 30d > 7d > 24h) ---
+    # If 30d revision exists, suppress 7d and 24h
+    if minutos_revisao_30d > 0:
+        minutos_revisao_7d = 0
+        minutos_revisao_24h = 0
+    # Else if 7d revision exists, suppress 24h
+    elif minutos_revisao_7d > 0:
+        minutos_revisao_24h = 0
+
+    return minutos_revisao_24h, minutos_revisao_7d, minutos_revisao_30d
+
+
+def plan_schedule(cycle_items, grade, timeline, revision_minutes, start_date, days_to_generate,
+                  start_item_idx=0, last_dia=0, skip_dates=frozenset(),
+                  revision_materia=None, revision_ciclo_item=None, progress=None):
+    """
+    Plans days_to_generate calendar days starting at start_date.
+    Runs in time linear in the horizon: per-day work is bounded by the grade slots,
+    and the timeline only grows at its end (bisect + append).
+
+    cycle_items: ordered cycle items (mappings with CODIGO, COD_MATERIA, MATERIA, QTDE_MINUTOS)
+    grade: WeeklyGrade with the available slots per weekday
+    timeline: StudyTimeline with the study dates before this run (not modified)
+    revision_minutes: (24h, 7d, 30d) revision durations in minutes
+    start_item_idx: index in cycle_items where the cycle resumes
+    last_dia: last study-day number (DIA) already used by the project
+    skip_dates: ISO dates that already have a schedule and must be left untouched; a dict
+        {date: DIA} also gives the study-day number each of them keeps
+    revision_materia / revision_ciclo_item: subject flagged as Revision and its cycle item
+    progress: optional callable(days_done, days_to_generate), called before each calendar day and once at the end
+
+    Returns a ScheduleResult with the PlannedRow list and the state after the last day.
+    """
+    timeline = timeline.copy()
+    rows = []
+    current_item_idx = start_item_idx
+    last_date = None
+
+    # A cycle made only of the revision subject has nothing to allocate in the cycle loop
+    has_cycle_subjects = any(
+        not (revision_materia and item['COD_MATERIA'] == revision_materia) for item in cycle_items
+    )
+
+    for days_done in range(days_to_generate):
+        if progress is not None:
+            progress(days_done, days_to_generate)
+
+        current_date = start_date + timedelta(days=days_done)
+        current_date_str = current_date.isoformat()
+
+        # 0. Check if schedule already exists for this day
+        if current_date_str in skip_dates:
+            # Skip generation for this day, but move to next. A kept day still uses its
+            # DIA, so the days planned after it continue the numbering from there
+            if isinstance(skip_dates, dict):
+                last_dia = max(last_dia, skip_dates[current_date_str] or 0)
+            continue
+
+        # 1. Determine Study Day
+        dia_estudo = last_dia + 1
+        day_rows_start = len(rows)
+
+        # 2. Check Revisions using "Study Days" (Virtual Timeline) logic
+        # We ignore calendar gaps. Revisions are based on the N-th previous study day.
+        if current_date_str not in timeline and not grade.has_slots(current_date):
+            # Only consider it a study day if there are slots available!
+            # If no slots, this is a skip day (folga)
+            continue
+
+        # Position of current date (counting it tentatively if it is not planned yet)
+        curr_idx = timeline.position(current_date_str)
+        pending = list(revision_minutes_for(curr_idx, revision_minutes))
+
+        # 3. Allocate the Available Time for Today
+        for slot_start, slot_duration in grade.slots_for(current_date):
+            # Current Time Cursor for this slot (minutes since midnight)
+            current_slot_time = slot_start
+
+            # Allocate Revisions in Priority Order: 24h → 7d → 30d → Cycle
+            for i, (tipo, desc) in enumerate((
+                (TIPO_REVISAO_24H, 'Estudar Revisão 24h'),
+                (TIPO_REVISAO_7D, 'Estudar Revisão 7d'),
+                (TIPO_REVISAO_30D, 'Estudar Revisão 30d'),
+            )):
+                if pending[i] > 0 and slot_duration >= MIN_REVISION_BLOCK:
+                    alloc_rev = min(pending[i], slot_duration)
+                    rows.append(PlannedRow(
+                        current_date_str, dia_estudo, tipo, desc, alloc_rev/60,
+                        format_clock(current_slot_time), revision_ciclo_item, revision_materia
+                    ))
+                    pending[i] -= alloc_rev
+                    slot_duration -= alloc_rev
+                    current_slot_time += alloc_rev
+
+            # Allocate Cycle Items
+            while has_cycle_subjects and slot_duration >= MIN_CYCLE_BLOCK:
+                item = cycle_items[current_item_idx]
+
+                # SKIP generic revision items in the cycle loop
+                # The user wants "Revisão" to ONLY appear as specific 24h/7d/30d tasks.
+                if revision_materia and item['COD_MATERIA'] == revision_materia:
+                    # Advance cycle index but do not schedule this generic item
+                    current_item_idx = (current_item_idx + 1) % len(cycle_items)
+                    continue
+
+                item_duration = item['QTDE_MINUTOS'] if item['QTDE_MINUTOS'] else DEFAULT_ITEM_MINUTES
+                alloc_cycle = min(slot_duration, item_duration)
+
+                rows.append(PlannedRow(
+                    current_date_str, dia_estudo, TIPO_ESTUDO_CICLO, f"Estudar {item['MATERIA']}",
+                    alloc_cycle/60, format_clock(current_slot_time), item['CODIGO'], item['COD_MATERIA']
+                ))
+
+                slot_duration -= alloc_cycle
+                current_slot_time += alloc_cycle
+
+                # Advance Cycle
+                current_item_idx = (current_item_idx + 1) % len(cycle_items)
+
+        # Only days that actually received rows advance the study-day counter
+        if len(rows) > day_rows_start:
+            last_dia = dia_estudo
+            last_date = current_date_str
+            timeline.add(current_date_str)
+
+    if progress is not None:
+        progress(days_to_generate, days_to_generate)
+
+    return ScheduleResult(rows, current_item_idx, last_dia, last_date, timeline)
@@ -1,329 +1,364 @@
 import sqlite3
+from collections import namedtuple
 from datetime import date, timedelta, datetime
 from db_manager import get_connection
+from user_settings import get_revision_minutes
+from schedule_kernel import TIPO_ESTUDO_CICLO, StudyTimeline, WeeklyGrade, plan_schedule
+from daily_rollup import refresh_daily_rollup
 import pandas as pd
 
-def generate_schedule(project_id, start_date, days_to_generate=7):
+# Column order of the rows written to EST_PROGRAMACAO (one tuple per row)
+PROGRAMACAO_COLUMNS = (
+    'COD_GRADE', 'COD_PROJETO', 'COD_CICLO', 'COD_CICLO_ITEM', 'COD_USUARIO',
+    'DATA', 'DIA', 'DESC_AULA', 'TIPO', 'HL_PREVISTA', 'STATUS',
+    'HR_INICIAL_PREVISTA', 'COD_MATERIA'
+)
+
+class ScheduleSetupError(Exception):
+    """The project is missing something the generator needs. The message is shown to the user."""
+
+class ScheduleConflictError(Exception):
+    """The cycle cursor moved while this run was planning (another generation saved first)."""
+
+# Everything schedule_kernel.plan_schedule needs for one project, plus the run constants
+ScheduleInputs = namedtuple('ScheduleInputs', [
+    'project_id', 'user_id', 'cod_ciclo', 'cod_grade',
+    'cycle_items', 'grade', 'timeline', 'revision_minutes',
+    'start_item_idx', 'last_dia', 'skip_dates',
+    'revision_materia', 'revision_ciclo_item',
+    'last_date', 'cursor_version'
+])
+
+def load_study_timeline(cursor, project_id, before=None):
     """
-    Ports the logic from PCD_GERA_PROGRAMACAO.
-    Generates schedule for X days starting from start_date.
+    Study dates (History + Plan) of the project as a StudyTimeline, in one query.
+    before: ISO date; planned days on or after it are left out (used when re-planning).
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    current_date = start_date
-    
-    # Get Project Info (including user)
-    proj = cursor.execute("SELECT * FROM EST_PROJETO WHERE CODIGO = ?", (project_id,)).fetchone()
-    if not proj:
-        return "Projeto não encontrado"
+    # We include ANY activity (TIPO > 0) so that revision-only days also count as "days".
+    # Days are the first 10 characters of DATA: older timer rows store a full timestamp
+    rows = cursor.execute("""
+        SELECT substr(DATA, 1, 10) AS DATA FROM EST_ESTUDOS WHERE COD_PROJETO = ? AND TIPO > 0
+        UNION
+        SELECT substr(DATA, 1, 10) AS DATA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND TIPO > 0 AND (? IS NULL OR DATA < ?)
+    """, (project_id, project_id, before, before)).fetchall()
+    return StudyTimeline(row['DATA'] for row in rows if row['DATA'])
+
+def load_weekly_grade(cursor, cod_grade):
+    """Slots of the weekly grade as a WeeklyGrade, in one query."""
+    rows = cursor.execute("""
+        SELECT DIA_SEMANA, HORA_INICIAL, HORA_FINAL, QTDE_MINUTOS FROM EST_GRADE_ITEM 
+        WHERE COD_GRADE = ?
+        ORDER BY DIA_SEMANA, HORA_INICIAL
+    """, (cod_grade,)).fetchall()
+    return WeeklyGrade.from_rows(rows)
+
+def cycle_resume_index(cycle_items, last_cod_ciclo_item):
+    """Index of the cycle item that follows last_cod_ciclo_item (0 if unknown)."""
+    if last_cod_ciclo_item:
+        # Find index of last item
+        for i, item in enumerate(cycle_items):
+            if item['CODIGO'] == last_cod_ciclo_item:
+                return (i + 1) % len(cycle_items) # Move to next, wrap around
+    return 0
+
+def load_cycle_cursor(cursor, project_id):
+    """Persisted cycle cursor of the project (EST_CURSOR_CICLO row), or None if there is none yet."""
+    try:
+        return cursor.execute(
+            "SELECT COD_CICLO_ITEM, ULTIMO_DIA, ULTIMA_DATA, VERSAO FROM EST_CURSOR_CICLO WHERE COD_PROJETO = ?",
+            (project_id,)
+        ).fetchone()
+    except Exception:
+        return None # Table not created yet: fall back to deriving it from EST_PROGRAMACAO
+
+def rebuild_cycle_cursor(cursor, project_id):
+    """
+    Re-derives the cycle cursor from the project's EST_PROGRAMACAO rows.
+    Used for projects planned before the cursor existed and after bulk rewrites/deletes
+    (Excluir Pendentes, re-planning). Does not commit.
+    """
+    cursor.execute("""
+        INSERT OR REPLACE INTO EST_CURSOR_CICLO (COD_PROJETO, COD_USUARIO, COD_CICLO_ITEM, ULTIMO_DIA, ULTIMA_DATA, VERSAO)
+        SELECT p.CODIGO, p.COD_USUARIO,
+            (SELECT COD_CICLO_ITEM FROM EST_PROGRAMACAO
+             WHERE COD_PROJETO = p.CODIGO AND TIPO = 4 ORDER BY DATA DESC, CODIGO DESC LIMIT 1),
+            (SELECT MAX(DIA) FROM EST_PROGRAMACAO WHERE COD_PROJETO = p.CODIGO),
+            (SELECT MAX(DATA) FROM EST_PROGRAMACAO WHERE COD_PROJETO = p.CODIGO),
+            COALESCE((SELECT VERSAO FROM EST_CURSOR_CICLO WHERE COD_PROJETO = p.CODIGO), 0) + 1
+        FROM EST_PROJETO p WHERE p.CODIGO = ?
+    """, (project_id,))
+
+def insert_planned_rows(cursor, rows):
+    """
+    Writes planned rows (tuples in PROGRAMACAO_COLUMNS order) with a single executemany.
+    One statement for the whole batch keeps Turso runs to a single round-trip.
+    """
+    if not rows:
+        return 0
+    cols = ', '.join(PROGRAMACAO_COLUMNS)
+    placeholders = ', '.join(['?'] * len(PROGRAMACAO_COLUMNS))
+    cursor.executemany(f"INSERT INTO EST_PROGRAMACAO ({cols}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+class ScheduleStore:
+    """
+    Persistence adapter between schedule_kernel and EST_PROGRAMACAO.
+    Loads the kernel inputs for a project and saves the planned rows.
+    Any object with the same load_inputs/save methods can be passed to generate_schedule.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+
+    def load_inputs(self, project_id, start_date, days_to_generate):
+        cursor = self.cursor
+
+        # Get Project Info (including user)
+        proj = cursor.execute("SELECT * FROM EST_PROJETO WHERE CODIGO = ?", (project_id,)).fetchone()
+        if not proj:
+            raise ScheduleSetupError("Projeto não encontrado")
     
-    user_id = proj['COD_USUARIO']
+        user_id = proj['COD_USUARIO']
         
-    # Get Default Cycle and Grade FOR THIS USER
-    # Try to find default first
-    ciclo = cursor.execute(
-        "SELECT CODIGO FROM EST_CICLO WHERE PADRAO = 'S' AND COD_USUARIO = ?", 
-        (user_id,)
-    ).fetchone()
+        # Get Default Cycle and Grade FOR THIS USER
+        # Try to find default first
+        ciclo = cursor.execute(
+            "SELECT CODIGO FROM EST_CICLO WHERE PADRAO = 'S' AND COD_USUARIO = ?", 
+            (user_id,)
+        ).fetchone()
     
-    if not ciclo:
-        # Fallback: Check if user has ONLY ONE cycle
-        all_ciclos = cursor.execute("SELECT CODIGO FROM EST_CICLO WHERE COD_USUARIO = ?", (user_id,)).fetchall()
-        if len(all_ciclos) == 1:
-            ciclo = all_ciclos[0]
+        if not ciclo:
+            # Fallback: Check if user has ONLY ONE cycle
+            all_ciclos = cursor.execute("SELECT CODIGO FROM EST_CICLO WHERE COD_USUARIO = ?", (user_id,)).fetchall()
+            if len(all_ciclos) == 1:
+                ciclo = all_ciclos[0]
             
-    grade = cursor.execute(
-        "SELECT CODIGO FROM EST_GRADE_SEMANAL WHERE PADRAO = 'S' AND COD_USUARIO = ?", 
-        (user_id,)
-    ).fetchone()
-    
-    if not grade:
-        # Fallback: Check if user has ONLY ONE grade
-        all_grades = cursor.execute("SELECT CODIGO FROM EST_GRADE_SEMANAL WHERE COD_USUARIO = ?", (user_id,)).fetchall()
-        if len(all_grades) == 1:
-            grade = all_grades[0]
+        grade = cursor.execute(
+            "SELECT CODIGO FROM EST_GRADE_SEMANAL WHERE PADRAO = 'S' AND COD_USUARIO = ?", 
+            (user_id,)
+        ).fetchone()
     
-    if not ciclo or not grade:
-        missing = []
-        if not ciclo:
-            missing.append("Ciclo de Estudos Padrão")
         if not grade:
-            missing.append("Grade Semanal Padrão")
+            # Fallback: Check if user has ONLY ONE grade
+            all_grades = cursor.execute("SELECT CODIGO FROM EST_GRADE_SEMANAL WHERE COD_USUARIO = ?", (user_id,)).fetchall()
+            if len(all_grades) == 1:
+                grade = all_grades[0]
+    
+        if not ciclo or not grade:
+            missing = []
+            if not ciclo:
+                missing.append("Ciclo de Estudos Padrão")
+            if not grade:
+                missing.append("Grade Semanal Padrão")
             
-        msg = "⚠️ Configuração incompleta:\n"
-        msg += f"Você precisa definir um { ' e uma '.join(missing) }.\n"
-        msg += "Vá em 'Cadastros', crie o registro e marque a opção 'Padrão'.\n"
-        msg += "(Ou se tiver apenas um registro, o sistema usará ele automaticamente)"
-        return msg
+            msg = "⚠️ Configuração incompleta:\n"
+            msg += f"Você precisa definir um { ' e uma '.join(missing) }.\n"
+            msg += "Vá em 'Cadastros', crie o registro e marque a opção 'Padrão'.\n"
+            msg += "(Ou se tiver apenas um registro, o sistema usará ele automaticamente)"
+            raise ScheduleSetupError(msg)
         
-    cod_ciclo = ciclo['CODIGO']
-    cod_grade = grade['CODIGO']
+        cod_ciclo = ciclo['CODIGO']
+        cod_grade = grade['CODIGO']
 
-    # --- Load Cycle Items in Order ---
-    cycle_items = cursor.execute("""
-        SELECT ci.*, m.NOME as MATERIA 
-        FROM EST_CICLO_ITEM ci
-        JOIN EST_MATERIA m ON ci.COD_MATERIA = m.CODIGO
-        WHERE ci.COD_CICLO = ? 
-        ORDER BY ci.INDICE
-    """, (cod_ciclo,)).fetchall()
+        # --- Load Cycle Items in Order ---
+        cycle_items = cursor.execute("""
+            SELECT ci.*, m.NOME as MATERIA 
+            FROM EST_CICLO_ITEM ci
+            JOIN EST_MATERIA m ON ci.COD_MATERIA = m.CODIGO
+            WHERE ci.COD_CICLO = ? 
+            ORDER BY ci.INDICE
+        """, (cod_ciclo,)).fetchall()
     
-    if not cycle_items:
-        return "Ciclo sem itens cadastrados"
+        if not cycle_items:
+            raise ScheduleSetupError("Ciclo sem itens cadastrados")
         
-    # --- Determine Starting Point in Cycle ---
-    # Check the very last scheduled item for this project to know where to continue from
-    last_scheduled = cursor.execute("""
-        SELECT COD_CICLO_ITEM FROM EST_PROGRAMACAO 
-        WHERE COD_PROJETO = ? AND TIPO = 4 -- TIPO 4 = ESTUDO CICLO
-        ORDER BY DATA DESC, CODIGO DESC LIMIT 1
-    """, (project_id,)).fetchone()
+        # --- Determine Starting Point in Cycle ---
+        # The persisted cursor says where the last generation stopped (item, DIA, date)
+        cycle_cursor = load_cycle_cursor(cursor, project_id)
+        if cycle_cursor:
+            last_item = cycle_cursor['COD_CICLO_ITEM']
+            last_dia = cycle_cursor['ULTIMO_DIA'] or 0
+            last_date = cycle_cursor['ULTIMA_DATA']
+            cursor_version = cycle_cursor['VERSAO']
+        else:
+            # No cursor yet (planned before it existed): derive it from the last scheduled rows
+            last_scheduled = cursor.execute("""
+                SELECT COD_CICLO_ITEM FROM EST_PROGRAMACAO 
+                WHERE COD_PROJETO = ? AND TIPO = 4 -- TIPO 4 = ESTUDO CICLO
+                ORDER BY DATA DESC, CODIGO DESC LIMIT 1
+            """, (project_id,)).fetchone()
+            last_prog = cursor.execute("""
+                SELECT MAX(DIA) as LAST_DIA, MAX(DATA) as LAST_DATA FROM EST_PROGRAMACAO 
+                WHERE COD_PROJETO = ?
+            """, (project_id,)).fetchone()
+            last_item = last_scheduled['COD_CICLO_ITEM'] if last_scheduled else None
+            last_dia = last_prog['LAST_DIA'] if last_prog['LAST_DIA'] else 0
+            last_date = last_prog['LAST_DATA']
+            cursor_version = None
     
-    current_item_idx = 0
-    if last_scheduled and last_scheduled['COD_CICLO_ITEM']:
-        # Find index of last item
-        for i, item in enumerate(cycle_items):
-            if item['CODIGO'] == last_scheduled['COD_CICLO_ITEM']:
-                current_item_idx = (i + 1) % len(cycle_items) # Move to next, wrap around
-                break
+        current_item_idx = cycle_resume_index(cycle_items, last_item)
 
-    # --- Get Revision Subject and Cycle Item ---
-    # 1. Find Subject flagged as Revision
-    rev_subject = cursor.execute(
-        "SELECT CODIGO FROM EST_MATERIA WHERE REVISAO = 'S' AND COD_USUARIO = ?", 
-        (user_id,)
-    ).fetchone()
+        # --- Get Revision Subject and Cycle Item ---
+        # 1. Find Subject flagged as Revision
+        rev_subject = cursor.execute(
+            "SELECT CODIGO FROM EST_MATERIA WHERE REVISAO = 'S' AND COD_USUARIO = ?", 
+            (user_id,)
+        ).fetchone()
     
-    cod_materia_revisao = None
-    cod_ciclo_item_revisao = None
+        cod_materia_revisao = None
+        cod_ciclo_item_revisao = None
     
-    if rev_subject:
-        cod_materia_revisao = rev_subject['CODIGO']
-        # 2. Find corresponding Cycle Item in the CURRENT Cycle
-        rev_item = cursor.execute(
-            "SELECT CODIGO FROM EST_CICLO_ITEM WHERE COD_CICLO = ? AND COD_MATERIA = ?",
-            (cod_ciclo, cod_materia_revisao)
-        ).fetchone()
-        if rev_item:
-            cod_ciclo_item_revisao = rev_item['CODIGO']
+        if rev_subject:
+            cod_materia_revisao = rev_subject['CODIGO']
+            # 2. Find corresponding Cycle Item in the CURRENT Cycle
+            rev_item = cursor.execute(
+                "SELECT CODIGO FROM EST_CICLO_ITEM WHERE COD_CICLO = ? AND COD_MATERIA = ?",
+                (cod_ciclo, cod_materia_revisao)
+            ).fetchone()
+            if rev_item:
+                cod_ciclo_item_revisao = rev_item['CODIGO']
 
-    for _ in range(days_to_generate):
-        # 0. Check if schedule already exists for this day
-        has_schedule = cursor.execute(
-            "SELECT 1 FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA = ? LIMIT 1", 
-            (project_id, current_date.isoformat())
-        ).fetchone()
-        
-        if has_schedule:
-            # Skip generation for this day, but move to next
-            current_date += timedelta(days=1)
-            continue
+        # --- Preload state that used to be queried day by day ---
+        end_date = start_date + timedelta(days=days_to_generate - 1)
+        scheduled_dates = frozenset(row['DATA'] for row in cursor.execute(
+            "SELECT DISTINCT DATA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA BETWEEN ? AND ?",
+            (project_id, start_date.isoformat(), end_date.isoformat())
+        ).fetchall())
 
-        # 1. Determine Study Day
-        last_prog = cursor.execute("""
-            SELECT MAX(DIA) as LAST_DIA FROM EST_PROGRAMACAO 
-            WHERE COD_PROJETO = ?
-        """, (project_id,)).fetchone()
-        
-        dia_estudo = (last_prog['LAST_DIA'] if last_prog['LAST_DIA'] else 0) + 1
-        
-        # 2. Check Revisions using "Study Days" (Virtual Timeline) logic
-        # We ignore calendar gaps. Revisions are based on the N-th previous study day.
-        
-        # Build the timeline of ALL valid study dates (History + Plan)
-        # We include ANY activity (TIPO > 0) so that revision-only days also count as "days"
-        # This ensures the cycle (1-7 study, 8 revision, 9 study...) flows correctly.
-        
-        # Get history dates
-        hist_dates = [row['DATA'] for row in cursor.execute(
-            "SELECT DISTINCT DATA FROM EST_ESTUDOS WHERE COD_PROJETO = ? AND TIPO > 0 ORDER BY DATA", 
-            (project_id,)
-        ).fetchall()]
-        
-        # Get planned dates (including the ones we just generated in previous iterations of this loop)
-        plan_dates = [row['DATA'] for row in cursor.execute(
-            "SELECT DISTINCT DATA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND TIPO > 0 ORDER BY DATA", 
-            (project_id,)
-        ).fetchall()]
-        
-        # Merge and Sort
-        all_study_dates = sorted(list(set(hist_dates + plan_dates)))
-        
-        # If current_date is not in the list (because we haven't scheduled it yet), add it tentatively
-        current_date_str = current_date.isoformat()
-        if current_date_str not in all_study_dates:
-            # Only consider it a study day if there are slots available!
-            weekday = current_date.isoweekday() 
-            db_weekday = weekday + 1 if weekday < 7 else 1
-            has_slots = cursor.execute("SELECT 1 FROM EST_GRADE_ITEM WHERE COD_GRADE = ? AND DIA_SEMANA = ?", (cod_grade, db_weekday)).fetchone()
-            
-            if has_slots:
-                all_study_dates.append(current_date_str)
-                all_study_dates.sort()
-            else:
-                # If no slots, this is a skip day (folga)
-                current_date += timedelta(days=1)
-                continue
+        return ScheduleInputs(
+            project_id=project_id,
+            user_id=user_id,
+            cod_ciclo=cod_ciclo,
+            cod_grade=cod_grade,
+            cycle_items=[dict(item) for item in cycle_items],
+            grade=load_weekly_grade(cursor, cod_grade),
+            timeline=load_study_timeline(cursor, project_id),
+            # Revision durations in MINUTES (cached user settings; DB stores HOURS)
+            revision_minutes=get_revision_minutes(user_id, cursor=cursor),
+            start_item_idx=current_item_idx,
+            last_dia=last_dia,
+            skip_dates=scheduled_dates,
+            revision_materia=cod_materia_revisao,
+            revision_ciclo_item=cod_ciclo_item_revisao,
+            last_date=last_date,
+            cursor_version=cursor_version,
+        )
 
-        # Find position of current date
-        try:
-            curr_idx = all_study_dates.index(current_date_str)
-        except ValueError:
-            curr_idx = -1
-            
-        minutos_revisao_24h = 0
-        minutos_revisao_7d = 0
-        minutos_revisao_30d = 0
-        
-        # --- Fetch User Configuration for Revision Times ---
-        # Default values in minutes
-        cfg_rev_24h = 15
-        cfg_rev_7d = 60
-        cfg_rev_30d = 120
-        
+    @staticmethod
+    def to_db_rows(inputs, planned_rows):
+        """Adds the run constants to the kernel rows (tuples in PROGRAMACAO_COLUMNS order)."""
+        return [
+            (inputs.cod_grade, inputs.project_id, inputs.cod_ciclo, r.COD_CICLO_ITEM, inputs.user_id,
+             r.DATA, r.DIA, r.DESC_AULA, r.TIPO, r.HL_PREVISTA, 'PENDENTE', r.HR_INICIAL_PREVISTA, r.COD_MATERIA)
+            for r in planned_rows
+        ]
+
+    def advance_cursor(self, inputs, result):
+        """
+        Moves the cycle cursor past the planned rows (does not commit).
+        Filling a gap before the last generated date keeps the item/date, like the
+        "last row by DATA" rule it replaces; DIA always keeps the highest value.
+        Raises ScheduleConflictError if another run moved the cursor since load_inputs.
+        """
+        last_item = None
+        last_date = inputs.last_date
+        cycle_rows = [r for r in result.rows if r.TIPO == TIPO_ESTUDO_CICLO]
+        if cycle_rows and (not last_date or cycle_rows[-1].DATA >= last_date):
+            last_item = cycle_rows[-1].COD_CICLO_ITEM
+        if result.last_date and (not last_date or result.last_date > last_date):
+            last_date = result.last_date
+        last_dia = max(inputs.last_dia, result.last_dia)
+
+        if inputs.cursor_version is None:
+            if last_item is None:
+                # First cursor of a legacy project: keep the item derived by load_inputs
+                last_item = (inputs.cycle_items[inputs.start_item_idx - 1]['CODIGO']
+                             if inputs.start_item_idx else None)
+            # PRIMARY KEY makes a concurrent first run fail instead of overwriting
+            self.cursor.execute("""
+                INSERT INTO EST_CURSOR_CICLO (COD_PROJETO, COD_USUARIO, COD_CICLO_ITEM, ULTIMO_DIA, ULTIMA_DATA, VERSAO)
+                VALUES (?, ?, ?, ?, ?, 1)
+            """, (inputs.project_id, inputs.user_id, last_item, last_dia, last_date))
+        else:
+            self.cursor.execute("""
+                UPDATE EST_CURSOR_CICLO
+                SET COD_CICLO_ITEM = COALESCE(?, COD_CICLO_ITEM), ULTIMO_DIA = ?, ULTIMA_DATA = ?, VERSAO = VERSAO + 1
+                WHERE COD_PROJETO = ? AND VERSAO = ?
+            """, (last_item, last_dia, last_date, inputs.project_id, inputs.cursor_version))
+            if self.cursor.rowcount == 0:
+                raise ScheduleConflictError("A programação foi alterada em outra sessão. Gere novamente.")
+
+    def save(self, inputs, result):
+        """Persists the whole horizon and advances the cycle cursor in one transaction."""
         try:
-            # We already have cursor open
-            config_row = cursor.execute("SELECT REV_24H, REV_7D, REV_30D FROM EST_CONFIGURACAO WHERE COD_USUARIO = ?", (user_id,)).fetchone()
-            if config_row:
-                # DB stores in HOURS (float), convert to MINUTES (int)
-                cfg_rev_24h = int(config_row['REV_24H'] * 60)
-                cfg_rev_7d = int(config_row['REV_7D'] * 60)
-                cfg_rev_30d = int(config_row['REV_30D'] * 60)
+            insert_planned_rows(self.cursor, self.to_db_rows(inputs, result.rows))
+            refresh_daily_rollup(self.cursor, inputs.project_id, [r.DATA for r in result.rows])
+            self.advance_cursor(inputs, result)
+            self.conn.commit()
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            raise ScheduleConflictError("A programação foi alterada em outra sessão. Gere novamente.")
         except Exception:
-            pass # Fallback to defaults
-        # ------------------------------------------------
-        
-        if curr_idx != -1:
-            # Rule: 24h Revision = Always, unless suppressed (handled below)
-            # Only if we have at least one previous day
-            if curr_idx >= 1:
-                minutos_revisao_24h = cfg_rev_24h
-                
-            # Rule: 7d Revision = Every 7 days (Index 7, 14, 21...)
-            # User Rule: "estudei de 1 a 7, no dia 8 tenho a revisão" -> Index 7
-            if curr_idx > 0 and curr_idx % 7 == 0:
-                minutos_revisao_7d = cfg_rev_7d
-                
-            # Rule: 30d Revision = Every 30 days (Index 30, 60...)
-            if curr_idx > 0 and curr_idx % 30 == 0:
-                minutos_revisao_30d = cfg_rev_30d
+            self.conn.rollback()
+            raise
 
-        # --- SUPPRESSION LOGIC (User Rule: 30d > 7d > 24h) ---
-        # If 30d revision exists, suppress 7d and 24h
-        if minutos_revisao_30d > 0:
-            minutos_revisao_7d = 0
-            minutos_revisao_24h = 0
-        # Else if 7d revision exists, suppress 24h
-        elif minutos_revisao_7d > 0:
-            minutos_revisao_24h = 0
-        # -----------------------------------------------------
+def preview_frame(inputs, result):
+    """
+    Planned rows as a DataFrame (PROGRAMACAO_COLUMNS + MATERIA), exactly as they would be saved.
+    """
+    materias = {item['COD_MATERIA']: item['MATERIA'] for item in inputs.cycle_items}
+    df = pd.DataFrame(ScheduleStore.to_db_rows(inputs, result.rows), columns=list(PROGRAMACAO_COLUMNS))
+    df['MATERIA'] = df['COD_MATERIA'].map(materias)
+    return df
 
-        # 3. Get Available Time for Today
-        weekday = current_date.isoweekday() 
-        db_weekday = weekday + 1 if weekday < 7 else 1
-        
-        slots = cursor.execute("""
-            SELECT * FROM EST_GRADE_ITEM 
-            WHERE COD_GRADE = ? AND DIA_SEMANA = ?
-            ORDER BY HORA_INICIAL
-        """, (cod_grade, db_weekday)).fetchall()
-        
-        for slot in slots:
-            # Calculate duration from Start/End times
-            try:
-                fmt = "%H:%M:%S"
-                # Handle cases where time might be just "HH:MM"
-                h_ini = slot['HORA_INICIAL'] if len(slot['HORA_INICIAL']) >= 5 else slot['HORA_INICIAL'] + ":00"
-                h_fim = slot['HORA_FINAL'] if len(slot['HORA_FINAL']) >= 5 else slot['HORA_FINAL'] + ":00"
-                
-                t_start = datetime.strptime(h_ini, fmt)
-                t_end = datetime.strptime(h_fim, fmt)
-                
-                # Calculate difference in minutes
-                diff = t_end - t_start
-                slot_duration = diff.total_seconds() / 60
-                
-                # Current Time Cursor for this slot
-                current_slot_time = t_start
-            except Exception as e:
-                # Fallback to QTDE_MINUTOS if parsing fails
-                slot_duration = slot['QTDE_MINUTOS']
-                current_slot_time = datetime.strptime("00:00:00", "%H:%M:%S") # Should not happen ideally
+# Returned when the confirmed preview no longer matches what would be saved
+PREVIEW_CHANGED_MSG = (
+    "A programação mudou desde a pré-visualização (grade, ciclo ou agenda alterados em outro lugar). "
+    "Nada foi gravado: pré-visualize novamente."
+)
 
-            # Allocate Revisions in Priority Order: 24h → 7d → 30d → Cycle
-            
-            # 1. Revisão 24h
-            if minutos_revisao_24h > 0 and slot_duration >= 5:
-                alloc_rev = min(minutos_revisao_24h, slot_duration)
-                
-                cursor.execute("""
-                    INSERT INTO EST_PROGRAMACAO (COD_GRADE, COD_PROJETO, COD_CICLO, COD_USUARIO, DATA, DIA, DESC_AULA, TIPO, HL_PREVISTA, STATUS, HR_INICIAL_PREVISTA, COD_MATERIA, COD_CICLO_ITEM)
-                    VALUES (?, ?, ?, ?, ?, ?, 'Estudar Revisão 24h', 1, ?, 'PENDENTE', ?, ?, ?)
-                """, (cod_grade, project_id, cod_ciclo, user_id, current_date.isoformat(), dia_estudo, alloc_rev/60, current_slot_time.strftime("%H:%M:%S"), cod_materia_revisao, cod_ciclo_item_revisao))
-                
-                minutos_revisao_24h -= alloc_rev
-                slot_duration -= alloc_rev
-                current_slot_time += timedelta(minutes=alloc_rev)
-            
-            # 2. Revisão 7 dias
-            if minutos_revisao_7d > 0 and slot_duration >= 5:
-                alloc_rev = min(minutos_revisao_7d, slot_duration)
-                
-                cursor.execute("""
-                    INSERT INTO EST_PROGRAMACAO (COD_GRADE, COD_PROJETO, COD_CICLO, COD_USUARIO, DATA, DIA, DESC_AULA, TIPO, HL_PREVISTA, STATUS, HR_INICIAL_PREVISTA, COD_MATERIA, COD_CICLO_ITEM)
-                    VALUES (?, ?, ?, ?, ?, ?, 'Estudar Revisão 7d', 2, ?, 'PENDENTE', ?, ?, ?)
-                """, (cod_grade, project_id, cod_ciclo, user_id, current_date.isoformat(), dia_estudo, alloc_rev/60, current_slot_time.strftime("%H:%M:%S"), cod_materia_revisao, cod_ciclo_item_revisao))
-                
-                minutos_revisao_7d -= alloc_rev
-                slot_duration -= alloc_rev
-                current_slot_time += timedelta(minutes=alloc_rev)
-            
-            # 3. Revisão 30 dias
-            if minutos_revisao_30d > 0 and slot_duration >= 5:
-                alloc_rev = min(minutos_revisao_30d, slot_duration)
-                
-                cursor.execute("""
-                    INSERT INTO EST_PROGRAMACAO (COD_GRADE, COD_PROJETO, COD_CICLO, COD_USUARIO, DATA, DIA, DESC_AULA, TIPO, HL_PREVISTA, STATUS, HR_INICIAL_PREVISTA, COD_MATERIA, COD_CICLO_ITEM)
-                    VALUES (?, ?, ?, ?, ?, ?, 'Estudar Revisão 30d', 3, ?, 'PENDENTE', ?, ?, ?)
-                """, (cod_grade, project_id, cod_ciclo, user_id, current_date.isoformat(), dia_estudo, alloc_rev/60, current_slot_time.strftime("%H:%M:%S"), cod_materia_revisao, cod_ciclo_item_revisao))
-                
-                minutos_revisao_30d -= alloc_rev
-                slot_duration -= alloc_rev
-                current_slot_time += timedelta(minutes=alloc_rev)
-                
-            # Allocate Cycle Items
-            while slot_duration >= 10: # Minimum 10 mins to schedule a block
-                item = cycle_items[current_item_idx]
-                item_duration = item['QTDE_MINUTOS'] if item['QTDE_MINUTOS'] else 60
-                
-                alloc_cycle = min(slot_duration, item_duration)
-                
-                # SKIP generic revision items in the cycle loop
-                # The user wants "Revisão" to ONLY appear as specific 24h/7d/30d tasks.
-                if cod_materia_revisao and item['COD_MATERIA'] == cod_materia_revisao:
-                    # Advance cycle index but do not schedule this generic item
-                    current_item_idx = (current_item_idx + 1) % len(cycle_items)
-                    continue
+def generate_schedule(project_id, start_date, days_to_generate=7, store=None, dry_run=False, progress=None,
+                      expected=None):
+    """
+    Ports the logic from PCD_GERA_PROGRAMACAO.
+    Generates schedule for X days starting from start_date.
+    The allocation itself is schedule_kernel.plan_schedule; store loads its inputs and saves its rows.
 
-                # Determine description
-                desc_aula = f"Estudar {item['MATERIA']}"
+    With dry_run=True nothing is written: the projected rows are returned as a DataFrame
+    (see preview_frame). Setup problems are returned as the message string in both modes.
+    progress: optional callable(days_done, days_to_generate) forwarded to plan_schedule.
+    expected: DataFrame of an earlier dry run the user approved; the rows are only saved if
+    this run plans exactly the same ones (otherwise PREVIEW_CHANGED_MSG is returned).
+    """
+    owns_conn = store is None
+    if owns_conn:
+        store = ScheduleStore(get_connection())
 
-                cursor.execute("""
-                    INSERT INTO EST_PROGRAMACAO (COD_GRADE, COD_PROJETO, COD_CICLO, COD_CICLO_ITEM, COD_USUARIO, DATA, DIA, DESC_AULA, TIPO, HL_PREVISTA, STATUS, HR_INICIAL_PREVISTA, COD_MATERIA)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 4, ?, 'PENDENTE', ?, ?)
-                """, (cod_grade, project_id, cod_ciclo, item['CODIGO'], user_id, current_date.isoformat(), dia_estudo, 
-                      desc_aula, 
-                      alloc_cycle/60, current_slot_time.strftime("%H:%M:%S"), item['COD_MATERIA']))
-                
-                slot_duration -= alloc_cycle
-                current_slot_time += timedelta(minutes=alloc_cycle)
-                
-                # Advance Cycle
-                current_item_idx = (current_item_idx + 1) % len(cycle_items)
-        
-        current_date += timedelta(days=1)
+    try:
+        try:
+            inputs = store.load_inputs(project_id, start_date, days_to_generate)
+        except ScheduleSetupError as e:
+            return str(e)
 
-    conn.commit()
-    conn.close()
+        result = plan_schedule(
+            inputs.cycle_items, inputs.grade, inputs.timeline, inputs.revision_minutes,
+            start_date, days_to_generate,
+            start_item_idx=inputs.start_item_idx,
+            last_dia=inputs.last_dia,
+            skip_dates=inputs.skip_dates,
+            revision_materia=inputs.revision_materia,
+            revision_ciclo_item=inputs.revision_ciclo_item,
+            progress=progress,
+        )
+        if dry_run:
+            return preview_frame(inputs, result)
+        if expected is not None and not preview_frame(inputs, result).equals(expected):
+            return PREVIEW_CHANGED_MSG
+        try:
+            store.save(inputs, result)
+        except ScheduleConflictError as e:
+            return str(e)
+    finally:
+        if owns_conn:
+            store.conn.close()
     return "Programação Gerada com Sucesso"
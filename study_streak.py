@@ -0,0 +1,113 @@
+"""
+Sequência de estudos do projeto (Dias Seguidos): sequência atual, recorde e constância
+da última semana, calculados de uma vez sobre os ordinais das datas estudadas (NumPy).
+Os resultados ficam em cache por projeto; gravar/editar/excluir um estudo invalida a
+entrada do projeto (invalidate_streak).
+"""
+
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+import numpy as np
+from db_manager import get_connection
+
+# Tempo máximo (segundos) que uma entrada fica no cache sem ser recarregada
+STREAK_TTL_SECONDS = 300
+
+# Resultado de compute_streak / get_streak
+StreakStats = namedtuple('StreakStats', [
+    'atual',        # Dias seguidos até hoje (ou até ontem, se ainda não estudou hoje)
+    'recorde',      # Maior sequência do projeto
+    'dias_semana',  # Dias com estudo nos últimos 7 dias (incluindo hoje)
+    'constancia',   # dias_semana / 7
+    'ultimo_dia',   # Última data estudada (None se nunca estudou)
+])
+
+_cache = {}  # project_id -> (expira_em, hoje, StreakStats)
+_lock = threading.Lock()
+
+
+def compute_streak(study_dates, today=None) -> StreakStats:
+    """
+    Calcula a sequência a partir das datas estudadas (date, em qualquer ordem, com repetições).
+    Datas posteriores a today são ignoradas.
+    """
+    today = today or date.today()
+    today_ord = today.toordinal()
+    days = np.unique(np.fromiter((d.toordinal() for d in study_dates), dtype=np.int64))
+    days = days[days <= today_ord]
+    if days.size == 0:
+        return StreakStats(0, 0, 0, 0.0, None)
+
+    # Runs of consecutive days: a new run starts wherever the gap is not exactly one day
+    run_starts = np.flatnonzero(np.diff(days) != 1) + 1
+    run_lengths = np.diff(np.concatenate(([0], run_starts, [days.size])))
+
+    # The last run is still alive if it reaches today or yesterday
+    current = int(run_lengths[-1]) if today_ord - days[-1] <= 1 else 0
+    week_days = int(np.count_nonzero(days > today_ord - 7))
+    return StreakStats(
+        atual=current,
+        recorde=int(run_lengths.max()),
+        dias_semana=week_days,
+        constancia=week_days / 7,
+        ultimo_dia=date.fromordinal(int(days[-1])),
+    )
+
+
+def _load_study_dates(cursor, project_id):
+    rows = cursor.execute(
+        "SELECT DISTINCT DATA FROM EST_RESUMO_DIARIO WHERE COD_PROJETO = ? AND QTDE_ESTUDOS > 0",
+        (project_id,)
+    ).fetchall()
+    dates = []
+    for row in rows:
+        try:
+            dates.append(date.fromisoformat(row['DATA']))
+        except (TypeError, ValueError):
+            continue
+    return dates
+
+
+def get_streak(project_id: int, today=None, cursor=None) -> StreakStats:
+    """
+    Sequência de estudos do projeto, usando o cache enquanto a entrada for válida
+    (e calculada para o mesmo dia).
+
+    Args:
+        project_id: Código do projeto
+        today: Data de referência (padrão: hoje)
+        cursor: Cursor já aberto para usar em caso de cache miss (opcional)
+    """
+    today = today or date.today()
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(project_id)
+        if entry and entry[0] > now and entry[1] == today:
+            return entry[2]
+
+    if cursor is not None:
+        dates = _load_study_dates(cursor, project_id)
+    else:
+        conn = get_connection()
+        try:
+            dates = _load_study_dates(conn.cursor(), project_id)
+        finally:
+            conn.close()
+
+    stats = compute_streak(dates, today)
+    with _lock:
+        _cache[project_id] = (now + STREAK_TTL_SECONDS, today, stats)
+    return stats
+
+
+def invalidate_streak(project_id: int = None):
+    """
+    Remove a entrada do projeto do cache (ou todas, se project_id for None).
+    """
+    with _lock:
+        if project_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(project_id, None)
@@ -0,0 +1,133 @@
+"""
+Subject (COD_MATERIA) of study and schedule rows.
+
+Panels group by COD_MATERIA in SQL (through EST_RESUMO_DIARIO) and join EST_MATERIA
+for the names, instead of parsing DESC_AULA row by row. Rows written before
+COD_MATERIA existed (migration 3) are filled by backfill_subjects from their cycle
+item; migration 9 and the backup restore do only this exact match. Matching the
+description ("Estudo de X", "Estudar X - topic") against the subjects of the row's owner
+is a guess, so it runs only when asked for (python db_manager.py backfill, with --dry-run
+to list the proposed changes first). No database connection is opened here and nothing
+is committed; callers rebuild the rollup (daily_rollup) afterwards.
+"""
+
+from collections import namedtuple
+
+SUBJECT_TABLES = ('EST_ESTUDOS', 'EST_PROGRAMACAO')
+
+# Prefixes written by the timer, the retroactive form and the schedule generator
+DESCRIPTION_PREFIXES = ('estudo de ', 'estudar ')
+
+# Separator between the subject and the content topic in DESC_AULA
+TOPIC_SEPARATOR = ' - '
+
+# Result of backfill_subjects, one per table
+BackfillResult = namedtuple('BackfillResult', [
+    'table',
+    'from_cycle',        # Rows filled from EST_CICLO_ITEM.COD_MATERIA
+    'from_description',  # Rows filled by matching DESC_AULA with EST_MATERIA.NOME
+    'unresolved',        # Rows still without a subject (revisions, deleted subjects...)
+    'matches',           # SubjectMatch of each row filled from the description
+])
+
+# A row whose subject was found in its description
+SubjectMatch = namedtuple('SubjectMatch', ['codigo', 'description', 'cod_materia', 'materia'])
+
+
+def _normalize(text):
+    return ' '.join(str(text).split()).casefold()
+
+
+def subject_from_description(description, subjects):
+    """
+    CODIGO of the subject named in description, or None.
+    subjects: (normalized name, CODIGO) pairs, longest names first, so that a subject
+    whose name contains the separator wins over a shorter one.
+    """
+    if not description:
+        return None
+    text = _normalize(description)
+    for prefix in DESCRIPTION_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+            break
+    for name, code in subjects:
+        if text == name or text.startswith(name + TOPIC_SEPARATOR):
+            return code
+    return None
+
+
+def _subjects_by_owner(cursor):
+    owners = {}
+    shared = []  # Subjects without an owner are offered to every user
+    for row in cursor.execute("SELECT CODIGO, NOME, COD_USUARIO FROM EST_MATERIA ORDER BY CODIGO").fetchall():
+        if not row['NOME']:
+            continue
+        entry = (_normalize(row['NOME']), row['CODIGO'])
+        if row['COD_USUARIO'] is None:
+            shared.append(entry)
+        else:
+            owners.setdefault(row['COD_USUARIO'], []).append(entry)
+
+    def ranked(entries):
+        # Longest name first; on equal names the oldest subject (lowest CODIGO) wins
+        seen, result = set(), []
+        for name, code in sorted(entries, key=lambda e: (-len(e[0]), e[1])):
+            if name not in seen:
+                seen.add(name)
+                result.append((name, code))
+        return result
+
+    by_owner = {owner: ranked(entries + shared) for owner, entries in owners.items()}
+    return by_owner, ranked(shared)
+
+
+def backfill_subjects(cursor, user_id=None, from_description=False):
+    """
+    Fills COD_MATERIA where it is NULL in EST_ESTUDOS and EST_PROGRAMACAO, for every
+    user or only for user_id: from the cycle item, and from DESC_AULA too when
+    from_description is set. Returns a list of BackfillResult. Does not commit, so a
+    dry run is a rollback.
+    """
+    user_filter, user_params = "", ()
+    if user_id is not None:
+        user_filter, user_params = "AND COALESCE(t.COD_USUARIO, p.COD_USUARIO) = ?", (user_id,)
+    if from_description:
+        subjects, shared = _subjects_by_owner(cursor)
+        names = {row['CODIGO']: row['NOME'] for row in cursor.execute("SELECT CODIGO, NOME FROM EST_MATERIA").fetchall()}
+
+    results = []
+    for table in SUBJECT_TABLES:
+        cursor.execute(f"""
+            UPDATE {table} SET COD_MATERIA = (
+                SELECT ci.COD_MATERIA FROM EST_CICLO_ITEM ci WHERE ci.CODIGO = {table}.COD_CICLO_ITEM
+            )
+            WHERE COD_MATERIA IS NULL AND CODIGO IN (
+                SELECT t.CODIGO FROM {table} t
+                JOIN EST_CICLO_ITEM ci ON ci.CODIGO = t.COD_CICLO_ITEM
+                LEFT JOIN EST_PROJETO p ON p.CODIGO = t.COD_PROJETO
+                WHERE t.COD_MATERIA IS NULL AND ci.COD_MATERIA IS NOT NULL {user_filter}
+            )
+        """, user_params)
+        from_cycle = max(cursor.rowcount, 0)
+
+        rows = cursor.execute(f"""
+            SELECT t.CODIGO, t.DESC_AULA, COALESCE(t.COD_USUARIO, p.COD_USUARIO) AS OWNER
+            FROM {table} t
+            LEFT JOIN EST_PROJETO p ON p.CODIGO = t.COD_PROJETO
+            WHERE t.COD_MATERIA IS NULL {user_filter}
+            ORDER BY t.CODIGO
+        """, user_params).fetchall()
+
+        matches = []
+        if from_description:
+            for row in rows:
+                code = subject_from_description(row['DESC_AULA'], subjects.get(row['OWNER'], shared))
+                if code is not None:
+                    matches.append(SubjectMatch(row['CODIGO'], row['DESC_AULA'], code, names[code]))
+            if matches:
+                cursor.executemany(f"UPDATE {table} SET COD_MATERIA = ? WHERE CODIGO = ?",
+                                   [(m.cod_materia, m.codigo) for m in matches])
+
+        results.append(BackfillResult(table, from_cycle, len(matches), len(rows) - len(matches), matches))
+    return results
@@ -0,0 +1,26 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from benchmark_schedule import build_dataset
+from user_settings import invalidate_user_settings
+
+
+@pytest.fixture
+def schedule_db(tmp_path):
+    """
+    Synthetic SQLite database (benchmark_schedule.build_dataset) with 28 days of
+    studied history before 2026-03-02. Yields (conn, project_id, start_date).
+    """
+    invalidate_user_settings()
+    path = tmp_path / "estudos_test.db"
+    project_id, start_date = build_dataset(
+        str(path), subjects=6, cycle_items=8, history_days=28,
+        start_date=date(2026, 3, 2),
+    )
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    yield conn, project_id, start_date
+    conn.close()
+    invalidate_user_settings()
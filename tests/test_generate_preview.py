@@ -0,0 +1,31 @@
+from study_engine import PREVIEW_CHANGED_MSG, ScheduleStore, generate_schedule
+
+
+def _count(conn, project_id):
+    return conn.execute(
+        "SELECT COUNT(*) FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND STATUS = 'PENDENTE'", (project_id,)
+    ).fetchone()[0]
+
+
+def test_confirmed_preview_is_saved(schedule_db):
+    conn, project_id, start = schedule_db
+    preview = generate_schedule(project_id, start, 14, store=ScheduleStore(conn), dry_run=True)
+    assert _count(conn, project_id) == 0
+
+    msg = generate_schedule(project_id, start, 14, store=ScheduleStore(conn), expected=preview)
+
+    assert "Sucesso" in msg
+    assert _count(conn, project_id) == len(preview)
+
+
+def test_preview_is_refused_when_the_plan_changed(schedule_db):
+    conn, project_id, start = schedule_db
+    preview = generate_schedule(project_id, start, 14, store=ScheduleStore(conn), dry_run=True)
+    # The grade changes between the preview and the confirmation
+    conn.execute("UPDATE EST_GRADE_ITEM SET HORA_FINAL = '11:00:00' WHERE HORA_INICIAL = '08:00:00'")
+    conn.commit()
+
+    msg = generate_schedule(project_id, start, 14, store=ScheduleStore(conn), expected=preview)
+
+    assert msg == PREVIEW_CHANGED_MSG
+    assert _count(conn, project_id) == 0
@@ -0,0 +1,37 @@
+import io
+from contextlib import redirect_stdout
+
+import pytest
+
+import db_manager
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Local database created by the migrations, in a temporary directory."""
+    monkeypatch.setattr(db_manager.st, "secrets", {"DB_MODE": "local"})
+    monkeypatch.setattr(db_manager, "DB_NAME", str(tmp_path / "estudos.db"))
+    with redirect_stdout(io.StringIO()):
+        db_manager.apply_migrations()
+    yield
+    db_manager.close_all_pools()
+
+
+def test_hot_queries_use_their_index(fresh_db):
+    results = db_manager.check_query_plans()
+
+    assert len(results) == len(db_manager.HOT_QUERIES)
+    assert [(name, details) for name, uses_index, details in results if not uses_index] == []
+
+
+def test_other_index_is_reported(fresh_db, monkeypatch):
+    # The old "excluir pendentes" wording: searched through IDX_PROGRAMACAO_USUARIO
+    monkeypatch.setattr(db_manager, "HOT_QUERIES", [
+        ("Planejamento: excluir pendentes", 'EST_PROGRAMACAO', 'IDX_PROGRAMACAO_PROJETO_STATUS_DATA',
+         "DELETE FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND COD_USUARIO = ? AND STATUS = 'PENDENTE'"),
+    ])
+
+    [(name, uses_index, details)] = db_manager.check_query_plans()
+
+    assert not uses_index
+    assert "IDX_PROGRAMACAO_USUARIO" in details[0]
@@ -0,0 +1,138 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from replanner import replan_project
+from schedule_kernel import TIPO_ESTUDO_CICLO
+from study_engine import PROGRAMACAO_COLUMNS, ScheduleStore, generate_schedule, rebuild_cycle_cursor
+
+HORIZON = 42
+
+
+def _plan_rows(conn, project_id):
+    cols = ', '.join(PROGRAMACAO_COLUMNS)
+    rows = conn.execute(f"""
+        SELECT {cols} FROM EST_PROGRAMACAO
+        WHERE COD_PROJETO = ? AND STATUS = 'PENDENTE'
+        ORDER BY DATA, HR_INICIAL_PREVISTA, TIPO
+    """, (project_id,)).fetchall()
+    hl = PROGRAMACAO_COLUMNS.index('HL_PREVISTA')
+    return [tuple(round(v, 6) if i == hl else v for i, v in enumerate(row)) for row in rows]
+
+
+def _copy(conn):
+    clone = sqlite3.connect(':memory:')
+    clone.row_factory = sqlite3.Row
+    conn.backup(clone)
+    return clone
+
+
+def _regenerate(conn, project_id, first_affected, last_day):
+    # The old way: drop the pending days from the window on and generate them again
+    conn.execute("DELETE FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND STATUS = 'PENDENTE' AND DATA >= ?",
+                 (project_id, first_affected.isoformat()))
+    rebuild_cycle_cursor(conn.cursor(), project_id)
+    conn.commit()
+    msg = generate_schedule(project_id, first_affected, (last_day - first_affected).days + 1,
+                            store=ScheduleStore(conn))
+    assert "Sucesso" in msg
+
+
+def _edit_grade(conn, project_id):
+    # Wednesday's first slot gains an hour
+    conn.execute("""
+        UPDATE EST_GRADE_ITEM SET HORA_FINAL = '11:00:00'
+        WHERE DIA_SEMANA = 4 AND HORA_INICIAL = '08:00:00'
+    """)
+    return 3  # days from the start to the first Wednesday
+
+
+def _edit_cycle_item(conn, project_id):
+    # The item of the first planned cycle study gets a new duration
+    first = conn.execute("""
+        SELECT COD_CICLO_ITEM, DATA FROM EST_PROGRAMACAO
+        WHERE COD_PROJETO = ? AND STATUS = 'PENDENTE' AND TIPO = ? ORDER BY DATA, CODIGO LIMIT 1
+    """, (project_id, TIPO_ESTUDO_CICLO)).fetchone()
+    conn.execute("UPDATE EST_CICLO_ITEM SET QTDE_MINUTOS = 25 WHERE CODIGO = ?", (first['COD_CICLO_ITEM'],))
+    return (date.fromisoformat(first['DATA']) - date(2026, 3, 2)).days
+
+
+@pytest.mark.parametrize('edit', [_edit_grade, _edit_cycle_item])
+def test_replan_matches_full_regeneration(schedule_db, edit):
+    conn, project_id, start = schedule_db
+    assert "Sucesso" in generate_schedule(project_id, start, HORIZON, store=ScheduleStore(conn))
+    first_affected = start + timedelta(days=edit(conn, project_id))
+    conn.commit()
+    before = _plan_rows(conn, project_id)
+
+    expected = _copy(conn)
+    _regenerate(expected, project_id, first_affected, start + timedelta(days=HORIZON - 1))
+
+    result = replan_project(project_id, first_affected, today=start, store=ScheduleStore(conn))
+
+    assert result.days_changed > 0
+    assert _plan_rows(conn, project_id) != before
+    assert _plan_rows(conn, project_id) == _plan_rows(expected, project_id)
+    # The cycle cursor ends where a regeneration leaves it
+    cursor_sql = "SELECT COD_CICLO_ITEM, ULTIMO_DIA, ULTIMA_DATA FROM EST_CURSOR_CICLO WHERE COD_PROJETO = ?"
+    assert tuple(conn.execute(cursor_sql, (project_id,)).fetchone()) == \
+        tuple(expected.execute(cursor_sql, (project_id,)).fetchone())
+    expected.close()
+
+
+def test_replan_without_changes_writes_nothing(schedule_db):
+    conn, project_id, start = schedule_db
+    generate_schedule(project_id, start, HORIZON, store=ScheduleStore(conn))
+    before = _plan_rows(conn, project_id)
+
+    result = replan_project(project_id, start, today=start, store=ScheduleStore(conn))
+
+    assert result.days_changed == 0
+    assert _plan_rows(conn, project_id) == before
+
+
+def _day_rows(conn, project_id, day):
+    return [tuple(r) for r in conn.execute(
+        "SELECT * FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA = ? ORDER BY CODIGO",
+        (project_id, day.isoformat())
+    ).fetchall()]
+
+
+def test_days_edited_by_hand_are_kept(schedule_db):
+    conn, project_id, start = schedule_db
+    generate_schedule(project_id, start, HORIZON, store=ScheduleStore(conn))
+    edited_day = start + timedelta(days=9)  # a Wednesday, after the first affected one
+    conn.execute("""
+        UPDATE EST_PROGRAMACAO SET HL_PREVISTA = 0.5, DESC_AULA = 'Ajuste manual', EDITADO = 'S'
+        WHERE CODIGO = (SELECT MIN(CODIGO) FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA = ?)
+    """, (project_id, edited_day.isoformat()))
+    first_affected = start + timedelta(days=_edit_grade(conn, project_id))
+    conn.commit()
+    kept = _day_rows(conn, project_id, edited_day)
+
+    result = replan_project(project_id, first_affected, today=start, store=ScheduleStore(conn))
+
+    assert result.days_changed > 0
+    assert result.days_kept == 1
+    assert _day_rows(conn, project_id, edited_day) == kept
+    # The kept day keeps its DIA and the re-planned days continue after it: one number per day
+    dias = [row['DIA'] for row in conn.execute("""
+        SELECT DATA, MAX(DIA) AS DIA FROM EST_PROGRAMACAO WHERE COD_PROJETO = ? AND DATA >= ?
+        GROUP BY DATA ORDER BY DATA
+    """, (project_id, first_affected.isoformat()))]
+    assert dias == list(range(dias[0], dias[0] + len(dias)))
+
+
+def test_dry_run_reports_without_writing(schedule_db):
+    conn, project_id, start = schedule_db
+    generate_schedule(project_id, start, HORIZON, store=ScheduleStore(conn))
+    first_affected = start + timedelta(days=_edit_grade(conn, project_id))
+    conn.commit()
+    before = _plan_rows(conn, project_id)
+
+    preview = replan_project(project_id, first_affected, today=start, store=ScheduleStore(conn), dry_run=True)
+    assert _plan_rows(conn, project_id) == before
+
+    applied = replan_project(project_id, first_affected, today=start, store=ScheduleStore(conn))
+    assert preview == applied
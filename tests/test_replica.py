@@ -0,0 +1,135 @@
+import logging
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import db_manager
+
+
+class FileReplicaConnection:
+    """
+    Local stand-in for a libsql embedded replica: queries run on the replica file and
+    sync() pulls the whole "primary" (another SQLite file, the sync_url) into it.
+    Unlike libsql, writes stay in the replica file.
+    """
+    def __init__(self, path, sync_url):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._primary = sync_url
+        self.syncs = 0
+
+    def sync(self):
+        if not os.path.exists(self._primary):
+            raise ConnectionError(f"primary unreachable: {self._primary}")
+        primary = sqlite3.connect(self._primary)
+        try:
+            primary.backup(self._conn)
+        finally:
+            primary.close()
+        self.syncs += 1
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def execute(self, sql, params=()):
+        return self._conn.execute(sql, params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def _file_libsql(path, sync_url=None, auth_token=None):
+    return FileReplicaConnection(path, sync_url)
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """Replica mode against two files; yields (primary path, secrets dict to adjust)."""
+    primary = tmp_path / "primary.db"
+    with sqlite3.connect(primary) as conn:
+        conn.execute("CREATE TABLE EST_AREA (CODIGO INTEGER PRIMARY KEY, NOME TEXT)")
+        conn.execute("INSERT INTO EST_AREA (NOME) VALUES ('EXATAS')")
+    secrets = {
+        "DB_MODE": "replica",
+        "TURSO_URL": str(primary),
+        "TURSO_TOKEN": "token",
+        "REPLICA_PATH": str(tmp_path / "replica.db"),
+        "REPLICA_SYNC_INTERVAL": 3600,
+    }
+    monkeypatch.setattr(db_manager, "libsql", SimpleNamespace(connect=_file_libsql))
+    monkeypatch.setattr(db_manager.st, "secrets", secrets)
+    monkeypatch.setattr(db_manager, "_replica_syncs", {})
+    yield primary, secrets
+    db_manager.close_all_pools()
+
+
+def _add_area(primary, name):
+    with sqlite3.connect(primary) as conn:
+        conn.execute("INSERT INTO EST_AREA (NOME) VALUES (?)", (name,))
+
+
+def _areas(conn):
+    return [row['NOME'] for row in conn.execute("SELECT NOME FROM EST_AREA ORDER BY CODIGO").fetchall()]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, True), (False, False), ("true", True), ("false", False),
+    ("False", False), ("0", False), ("1", True), ("off", False), (0, False),
+])
+def test_sync_on_write_flag(replica, value, expected):
+    _, secrets = replica
+    secrets["REPLICA_SYNC_ON_WRITE"] = value
+    conn = db_manager.get_connection()
+    try:
+        assert isinstance(conn, db_manager.ReplicaConnectionWrapper)
+        assert conn._replica_sync.on_write is expected
+    finally:
+        conn.close()
+
+
+def test_invalid_flag_is_rejected(replica):
+    _, secrets = replica
+    secrets["REPLICA_SYNC_ON_WRITE"] = "talvez"
+    with pytest.raises(ValueError, match="REPLICA_SYNC_ON_WRITE"):
+        db_manager.get_connection()
+
+
+def test_first_connection_pulls_from_primary(replica):
+    with db_manager.connection() as conn:
+        assert _areas(conn) == ['EXATAS']
+
+
+def test_commit_pulls_only_when_sync_on_write(replica):
+    primary, secrets = replica
+    secrets["REPLICA_SYNC_ON_WRITE"] = "false"
+    with db_manager.connection() as conn:
+        _add_area(primary, 'HUMANAS')
+        conn.commit()
+        # Next pull is REPLICA_SYNC_INTERVAL away: the local copy is still the old one
+        assert _areas(conn) == ['EXATAS']
+
+    db_manager.close_all_pools()
+    db_manager._replica_syncs.clear()
+    secrets["REPLICA_SYNC_ON_WRITE"] = "true"
+    with db_manager.connection() as conn:
+        _add_area(primary, 'DIREITO')
+        conn.commit()
+        assert _areas(conn) == ['EXATAS', 'HUMANAS', 'DIREITO']
+
+
+def test_failed_sync_is_logged_and_local_copy_served(replica, caplog):
+    primary, _ = replica
+    with db_manager.connection() as conn:
+        assert _areas(conn) == ['EXATAS']
+        os.remove(primary)
+        with caplog.at_level(logging.WARNING, logger='estudos.db'):
+            conn.commit()
+        assert "Replica sync failed" in caplog.text
+        assert _areas(conn) == ['EXATAS']
@@ -0,0 +1,143 @@
+from datetime import date, timedelta
+
+import pytest
+
+from schedule_kernel import (
+    TIPO_ESTUDO_CICLO, TIPO_REVISAO_24H, TIPO_REVISAO_30D, TIPO_REVISAO_7D,
+    StudyTimeline, WeeklyGrade, _time_to_minutes, plan_schedule, revision_minutes_for,
+)
+
+START = date(2026, 3, 2)  # Monday
+REVISIONS = (15, 60, 120)  # 24h, 7d, 30d in minutes
+REVISION_MATERIA = 99
+
+
+def _items(*minutes, revision_at=()):
+    return [
+        {'CODIGO': 100 + i, 'COD_MATERIA': REVISION_MATERIA if i in revision_at else i + 1,
+         'MATERIA': f"MATÉRIA {i}", 'QTDE_MINUTOS': m}
+        for i, m in enumerate(minutes)
+    ]
+
+
+def _every_day(start_minute=8 * 60, duration=120):
+    return WeeklyGrade({d: [(start_minute, duration)] for d in range(1, 8)})
+
+
+def _past_days(n):
+    return StudyTimeline((START - timedelta(days=i)).isoformat() for i in range(1, n + 1))
+
+
+def _plan(items, timeline=None, days=1, **kwargs):
+    return plan_schedule(items, kwargs.pop('grade', _every_day()), timeline or StudyTimeline(),
+                         REVISIONS, START, days, **kwargs)
+
+
+def _tipos(rows, day=START):
+    return [r.TIPO for r in rows if r.DATA == day.isoformat()]
+
+
+@pytest.mark.parametrize('idx, expected', [
+    (0, (0, 0, 0)),      # first study day: nothing to revise
+    (1, (15, 0, 0)),
+    (7, (0, 60, 0)),     # 7d suppresses 24h
+    (14, (0, 60, 0)),
+    (30, (0, 0, 120)),   # 30d suppresses 7d and 24h
+    (210, (0, 0, 120)),  # multiple of 7 and 30: only 30d
+])
+def test_revision_suppression(idx, expected):
+    assert revision_minutes_for(idx, REVISIONS) == expected
+
+
+@pytest.mark.parametrize('past, tipos', [
+    (1, [TIPO_REVISAO_24H, TIPO_ESTUDO_CICLO, TIPO_ESTUDO_CICLO]),
+    (7, [TIPO_REVISAO_7D, TIPO_ESTUDO_CICLO]),
+    (30, [TIPO_REVISAO_30D]),  # the 2h slot is all 30d revision
+])
+def test_plan_allocates_only_the_winning_revision(past, tipos):
+    result = _plan(_items(60, 60, 60), _past_days(past), revision_materia=REVISION_MATERIA)
+    assert _tipos(result.rows) == tipos
+
+
+def test_skip_dates_are_left_untouched():
+    skipped = (START + timedelta(days=1)).isoformat()
+    result = _plan(_items(60, 60), days=3, skip_dates=frozenset({skipped}))
+
+    assert skipped not in {r.DATA for r in result.rows}
+    assert skipped not in result.timeline
+    # The skipped day does not consume a study-day number
+    assert sorted({(r.DATA, r.DIA) for r in result.rows}) == [
+        (START.isoformat(), 1), ((START + timedelta(days=2)).isoformat(), 2)
+    ]
+
+
+def test_cycle_resumes_at_start_item():
+    items = _items(60, 60, 60)
+    result = _plan(items, start_item_idx=2, last_dia=10)
+
+    assert [r.COD_CICLO_ITEM for r in result.rows] == [102, 100]
+    assert result.next_item_idx == 1
+    assert {r.DIA for r in result.rows} == {11}
+
+    # Continuing from the returned state gives the same rows as one longer run
+    second = plan_schedule(items, _every_day(), result.timeline, REVISIONS, START + timedelta(days=1), 2,
+                           start_item_idx=result.next_item_idx, last_dia=result.last_dia)
+    full = _plan(items, days=3, start_item_idx=2, last_dia=10)
+    assert result.rows + second.rows == full.rows
+
+
+def test_revision_subject_is_skipped_in_the_cycle():
+    result = _plan(_items(60, 60, 60, revision_at={1}), revision_materia=REVISION_MATERIA)
+    assert [r.COD_CICLO_ITEM for r in result.rows] == [100, 102]
+
+
+def test_cycle_of_only_the_revision_subject_terminates():
+    items = _items(60, 60, revision_at={0, 1})
+    result = _plan(items, _past_days(3), days=5, revision_materia=REVISION_MATERIA, revision_ciclo_item=100)
+
+    assert result.rows
+    assert {r.TIPO for r in result.rows} <= {TIPO_REVISAO_24H, TIPO_REVISAO_7D, TIPO_REVISAO_30D}
+    assert {r.COD_MATERIA for r in result.rows} == {REVISION_MATERIA}
+
+
+def test_days_without_slots_are_not_study_days():
+    grade = WeeklyGrade({2: [(8 * 60, 60)]})  # Mondays only
+    result = _plan(_items(60), days=8, grade=grade)
+    assert sorted({(r.DATA, r.DIA) for r in result.rows}) == [
+        (START.isoformat(), 1), ((START + timedelta(days=7)).isoformat(), 2)
+    ]
+
+
+@pytest.mark.parametrize('value, minutes', [('08:30:00', 510), ('08:30', 510), ('23:59:30', 1439.5)])
+def test_time_to_minutes_accepts_seconds_or_not(value, minutes):
+    assert _time_to_minutes(value) == minutes
+
+
+@pytest.mark.parametrize('value', [None, '', '8h30', '25:00'])
+def test_time_to_minutes_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        _time_to_minutes(value)
+
+
+def test_weekly_grade_from_rows():
+    grade = WeeklyGrade.from_rows([
+        {'DIA_SEMANA': 2, 'HORA_INICIAL': '14:00', 'HORA_FINAL': '15:00:00', 'QTDE_MINUTOS': None},
+        {'DIA_SEMANA': 2, 'HORA_INICIAL': '08:00', 'HORA_FINAL': '09:30', 'QTDE_MINUTOS': None},
+        {'DIA_SEMANA': 3, 'HORA_INICIAL': 'manhã', 'HORA_FINAL': None, 'QTDE_MINUTOS': 45},
+    ])
+    assert grade.slots_for(START) == ((480, 90), (840, 60))        # Monday, ordered by start
+    assert grade.slots_for(START + timedelta(days=1)) == ((0, 45),)  # unparseable: QTDE_MINUTOS
+    assert not grade.has_slots(START - timedelta(days=1))            # Sunday
+
+
+def test_study_timeline_lookups():
+    timeline = StudyTimeline(['2026-03-04', '2026-03-02', '2026-03-02'])
+    assert len(timeline) == 2
+    assert timeline.index_of('2026-03-04') == 1
+    assert timeline.index_of('2026-03-03') == -1
+    assert timeline.position('2026-03-03') == 1
+
+    clone = timeline.copy()
+    clone.add('2026-03-03')
+    assert clone.index_of('2026-03-04') == 2
+    assert '2026-03-03' not in timeline
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from schedule_kernel import TIPO_ESTUDO_CICLO
+from study_engine import load_study_timeline
+
+
+def test_timer_timestamp_is_the_same_study_day(schedule_db):
+    conn, project_id, start = schedule_db
+    before = load_study_timeline(conn.cursor(), project_id)
+    last_day = conn.execute("SELECT MAX(DATA) FROM EST_ESTUDOS WHERE COD_PROJETO = ?", (project_id,)).fetchone()[0]
+
+    # A timer row saved with the full timestamp on a day that already has a study
+    conn.execute("""
+        INSERT INTO EST_ESTUDOS (COD_PROJETO, DATA, HL_REALIZADA, DESC_AULA, TIPO)
+        VALUES (?, ?, 1.0, 'Estudo extra', ?)
+    """, (project_id, f"{last_day}T21:15:03.123456", TIPO_ESTUDO_CICLO))
+    after = load_study_timeline(conn.cursor(), project_id)
+
+    assert len(after) == len(before)
+    assert after.position(start.isoformat()) == before.position(start.isoformat())
+
+
+def test_timer_timestamp_on_a_new_day_counts_once(schedule_db):
+    conn, project_id, start = schedule_db
+    before = load_study_timeline(conn.cursor(), project_id)
+    new_day = (start - timedelta(days=40)).isoformat()
+    assert new_day not in before
+    for stamp in ("T08:00:00", "T21:15:03.123456"):
+        conn.execute("""
+            INSERT INTO EST_ESTUDOS (COD_PROJETO, DATA, HL_REALIZADA, DESC_AULA, TIPO)
+            VALUES (?, ?, 1.0, 'Estudo extra', ?)
+        """, (project_id, new_day + stamp, TIPO_ESTUDO_CICLO))
+
+    timeline = load_study_timeline(conn.cursor(), project_id)
+
+    assert new_day in timeline
+    assert len(timeline) == len(before) + 1
@@ -0,0 +1,47 @@
+from subject_resolver import backfill_subjects, subject_from_description
+
+
+def _forget_subjects(conn, project_id):
+    # Rows as written before COD_MATERIA: cycle rows keep their item, a manual row has only text
+    conn.execute("UPDATE EST_ESTUDOS SET COD_MATERIA = NULL WHERE COD_PROJETO = ?", (project_id,))
+    subject = conn.execute("SELECT CODIGO, NOME FROM EST_MATERIA ORDER BY CODIGO").fetchone()
+    cursor = conn.execute("""
+        INSERT INTO EST_ESTUDOS (COD_PROJETO, DATA, HL_REALIZADA, DESC_AULA, TIPO)
+        VALUES (?, '2026-02-27', 1.0, ?, 4)
+    """, (project_id, f"Estudo de {subject['NOME']} - exercícios"))
+    return cursor.lastrowid, subject['CODIGO']
+
+
+def _subject_of(conn, codigo):
+    return conn.execute("SELECT COD_MATERIA FROM EST_ESTUDOS WHERE CODIGO = ?", (codigo,)).fetchone()[0]
+
+
+def test_default_backfill_uses_only_the_cycle_item(schedule_db):
+    conn, project_id, _ = schedule_db
+    manual_id, _ = _forget_subjects(conn, project_id)
+
+    estudos, _ = backfill_subjects(conn.cursor())
+
+    assert estudos.from_cycle > 0
+    assert estudos.from_description == 0 and estudos.matches == []
+    assert estudos.unresolved == 1
+    assert _subject_of(conn, manual_id) is None
+
+
+def test_description_match_is_opt_in_and_reported(schedule_db):
+    conn, project_id, _ = schedule_db
+    manual_id, subject_id = _forget_subjects(conn, project_id)
+
+    estudos, _ = backfill_subjects(conn.cursor(), from_description=True)
+
+    assert [(m.codigo, m.cod_materia) for m in estudos.matches] == [(manual_id, subject_id)]
+    assert estudos.from_description == 1 and estudos.unresolved == 0
+    assert _subject_of(conn, manual_id) == subject_id
+
+
+def test_subject_from_description():
+    subjects = [('direito constitucional', 2), ('direito', 1)]
+    assert subject_from_description("Estudo de Direito Constitucional - art. 5º", subjects) == 2
+    assert subject_from_description("Estudar direito", subjects) == 1
+    assert subject_from_description("Estudar Revisão 24h", subjects) is None
+    assert subject_from_description(None, subjects) is None
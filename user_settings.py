@@ -0,0 +1,121 @@
+"""
+Preferências do usuário (EST_CONFIGURACAO) com cache em memória.
+O gerador de programação, a página de Configurações e qualquer outro consumidor
+leem daqui sem ir ao banco; salvar pelo serviço invalida a entrada do usuário.
+"""
+
+import threading
+import time
+from db_manager import get_connection
+
+# Tempo máximo (segundos) que uma entrada fica no cache sem ser recarregada
+SETTINGS_TTL_SECONDS = 300
+
+# Valores padrão (revisões em HORAS, como gravado no banco)
+DEFAULT_SETTINGS = {
+    'TEMA_APP': 'light',
+    'TEMA_WEB': 'light',
+    'REV_24H': 0.25,  # 15 min
+    'REV_7D': 1.0,    # 1 hora
+    'REV_30D': 2.0,   # 2 horas
+}
+
+_cache = {}  # user_id -> (expira_em, settings)
+_lock = threading.Lock()
+
+
+def _load_settings(cursor, user_id):
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        row = cursor.execute(
+            "SELECT TEMA_APP, TEMA_WEB, REV_24H, REV_7D, REV_30D FROM EST_CONFIGURACAO WHERE COD_USUARIO = ?",
+            (user_id,)
+        ).fetchone()
+    except Exception:
+        return settings # Fallback to defaults (e.g. table not created yet)
+
+    if row:
+        for key in DEFAULT_SETTINGS:
+            if row[key] is not None:
+                settings[key] = row[key]
+    return settings
+
+
+def get_user_settings(user_id: int, cursor=None) -> dict:
+    """
+    Retorna as preferências do usuário, usando o cache enquanto a entrada for válida.
+
+    Args:
+        user_id: Código do usuário
+        cursor: Cursor já aberto para usar em caso de cache miss (opcional)
+
+    Returns:
+        dict com TEMA_APP, TEMA_WEB, REV_24H, REV_7D e REV_30D (revisões em horas)
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry and entry[0] > now:
+            return dict(entry[1])
+
+    if cursor is not None:
+        settings = _load_settings(cursor, user_id)
+    else:
+        conn = get_connection()
+        try:
+            settings = _load_settings(conn.cursor(), user_id)
+        finally:
+            conn.close()
+
+    with _lock:
+        _cache[user_id] = (now + SETTINGS_TTL_SECONDS, settings)
+    return dict(settings)
+
+
+def get_revision_minutes(user_id: int, cursor=None) -> tuple:
+    """
+    Tempos de revisão do usuário em MINUTOS inteiros: (24h, 7d, 30d).
+    """
+    settings = get_user_settings(user_id, cursor=cursor)
+    return (
+        int(settings['REV_24H'] * 60),
+        int(settings['REV_7D'] * 60),
+        int(settings['REV_30D'] * 60),
+    )
+
+
+def save_revision_settings(user_id: int, rev_24h: float, rev_7d: float, rev_30d: float):
+    """
+    Grava os tempos de revisão (em horas) e invalida o cache do usuário.
+    Cria o registro de configuração se o usuário ainda não tiver um.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE EST_CONFIGURACAO
+            SET REV_24H = ?, REV_7D = ?, REV_30D = ?
+            WHERE COD_USUARIO = ?
+        """, (rev_24h, rev_7d, rev_30d, user_id))
+
+        if cursor.rowcount == 0:
+            cursor.execute("""
+                INSERT INTO EST_CONFIGURACAO (COD_USUARIO, TEMA_APP, TEMA_WEB, REV_24H, REV_7D, REV_30D)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (user_id, DEFAULT_SETTINGS['TEMA_APP'], DEFAULT_SETTINGS['TEMA_WEB'], rev_24h, rev_7d, rev_30d))
+
+        conn.commit()
+    finally:
+        conn.close()
+        invalidate_user_settings(user_id)
+
+
+def invalidate_user_settings(user_id: int = None):
+    """
+    Remove a entrada do usuário do cache (ou todas, se user_id for None).
+    """
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)